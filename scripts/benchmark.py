@@ -0,0 +1,258 @@
+"""
+Benchmark the consume -> route -> dispatch pipeline.
+
+Starts local stub HTTP servers standing in for ntfy, Gotify and Pushover (with
+configurable latency and error rate), points notifiq at them and measures:
+
+- decode: JSON decoding and validation of a message body
+- routing: channel selection (get_target_notifiers, routing rules) and
+  channel -> notifier resolution
+- endpoints: per-message Apprise URL overrides (ntfy_topic, gotify_app, priority)
+- dispatch: dispatch_notification fan-out to every stub provider
+- end_to_end: process_message throughput with concurrent consumer threads
+
+Results are printed (or written with --output) as JSON, so runs can be compared:
+
+    python scripts/benchmark.py --latency-ms 20 --error-rate 0.01 --output bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubProvider(BaseHTTPRequestHandler):
+    """
+    Accepts any POST after `latency` seconds, failing with a 500 at `error_rate`.
+    """
+
+    latency = 0.0
+    error_rate = 0.0
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, delayed ACKs add ~40ms
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.latency:
+            time.sleep(self.latency)
+        failed = random.random() < self.error_rate
+        body = b'{"status": 0}' if failed else b'{"status": 1, "id": "bench"}'
+        self.send_response(500 if failed else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        pass
+
+
+def start_stub(latency: float, error_rate: float) -> ThreadingHTTPServer:
+    """
+    Start a stub provider on a free local port.
+    """
+    handler = type(
+        "Stub", (StubProvider,), {"latency": latency, "error_rate": error_rate}
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(fn: Callable[[], Any], iterations: int) -> dict[str, float]:
+    """
+    Time `iterations` calls of fn.
+    Returns:
+        Throughput and latency percentiles (microseconds).
+    """
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - t0) / 1000)
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / elapsed, 1),
+        "mean_us": round(statistics.fmean(samples), 2),
+        "p50_us": round(samples[len(samples) // 2], 2),
+        "p99_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+        "max_us": round(samples[-1], 2),
+    }
+
+
+def configure_environment(ntfy: str, gotify: str, workers: int) -> None:
+    """
+    Point notifiq's configuration at the stubs. Must run before importing src.main.
+    """
+    os.environ.update(
+        {
+            "APPRISE_NTFY_URL": f"ntfy://{ntfy}/bench",
+            "APPRISE_GOTIFY_URL": f"gotify://{gotify}/benchtoken",
+            "APPRISE_PUSHOVER_URL": "pover://benchuser@benchtoken",
+            "DISPATCH_MAX_WORKERS": str(max(8, workers * 3)),
+            "HTTP_MAX_CONNECTIONS": str(max(20, workers * 3)),
+            "HTTP2": "0",
+            # Measure the pipeline, not the protections around it
+            "CIRCUIT_BREAKER_ENABLED": "0",
+            "DEDUP_TTL": "0",
+            "COALESCE_WINDOW": "0",
+        }
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the notifiq pipeline against stub providers."
+    )
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument(
+        "--dispatch-iterations",
+        type=int,
+        default=200,
+        help="Iterations of the dispatch benchmarks, which make HTTP requests",
+    )
+    parser.add_argument(
+        "--messages", type=int, default=2000, help="Messages for end_to_end"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8, help="Consumer threads for end_to_end"
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=0, help="Stub provider latency"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0, help="Stub provider 500 rate (0-1)"
+    )
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    stubs = {
+        name: start_stub(args.latency_ms / 1000, args.error_rate)
+        for name in ("ntfy", "gotify", "pushover")
+    }
+    address = {name: "127.0.0.1:%d" % stub.server_port for name, stub in stubs.items()}
+    configure_environment(address["ntfy"], address["gotify"], args.workers)
+
+    # pylint: disable=import-outside-toplevel
+    from src import main as notifiq
+    from src.notification import decode_notification
+    from src.notifiers.endpoints import create_endpoint
+    from src.routing import get_target_notifiers
+    from src.rules import RoutingRules
+
+    # Per-message logs would dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    notifiq.init()
+    for pushover in notifiq.pushover_notifiers.values():
+        pushover.api_url = f"http://{address['pushover']}/1/messages.json"
+
+    body = json.dumps(
+        {
+            "title": "Disk full",
+            "message": "/var is at 99% on db-1",
+            "channels": ["ntfy-direct", "gotify", "pushover-direct"],
+            "ntfy_topic": "ops",
+            "gotify_app": "benchapp",
+            "priority": "high",
+            "X-Tags": "warning",
+        }
+    ).encode()
+    notification = decode_notification(body)
+    rules = RoutingRules.from_pairs(
+        [("source", f"service-{i}", ["ntfy"]) for i in range(1000)]
+        + [("priority", "high", ["pushover-direct"])]
+    )
+    unrouted = {"title": "x", "message": "y", "source": "service-500"}
+    gotify = create_endpoint("gotify", os.environ["APPRISE_GOTIFY_URL"])
+    ntfy = create_endpoint("ntfy", os.environ["APPRISE_NTFY_URL"])
+
+    n = args.iterations
+    results: dict[str, Any] = {
+        "decode": measure(lambda: decode_notification(body), n),
+        "routing.get_target_notifiers": measure(
+            lambda: get_target_notifiers({"channels": "ntfy,gotify"}), n
+        ),
+        "routing.rules_match": measure(lambda: rules.match(unrouted), n),
+        "routing.resolve": measure(
+            lambda: notifiq.routing_table.resolve(
+                notification.channels, notification.extra
+            ),
+            n,
+        ),
+        "endpoints.for_message": measure(
+            lambda: (
+                ntfy.for_message(notification.extra).url,
+                gotify.for_message(notification.extra).url,
+            ),
+            n,
+        ),
+    }
+
+    d = args.dispatch_iterations
+    for channel in ("ntfy-direct", "gotify", "pushover-direct"):
+        single = notification.replace(channels=[channel])
+        results[f"dispatch.{channel}"] = measure(
+            lambda single=single: notifiq.dispatch_notification(single), d
+        )
+    results["dispatch.fan_out"] = measure(
+        lambda: notifiq.dispatch_notification(notification), d
+    )
+
+    delivered = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for result in pool.map(
+            lambda _: notifiq.process_message(body), range(args.messages)
+        ):
+            delivered += result.delivered
+    elapsed = time.perf_counter() - started
+    results["end_to_end"] = {
+        "messages": args.messages,
+        "workers": args.workers,
+        "messages_per_sec": round(args.messages / elapsed, 1),
+        "delivered_ratio": round(delivered / args.messages, 4),
+    }
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "iterations": n,
+            "dispatch_iterations": d,
+            "latency_ms": args.latency_ms,
+            "error_rate": args.error_rate,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    notifiq.rate_limiter.close()
+    notifiq.dispatch_executor.shutdown(wait=False)
+    notifiq.close_notifiers()
+    for stub in stubs.values():
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,724 @@
+import asyncio
+import functools
+import logging
+import signal
+import time
+from datetime import timezone
+from typing import Any, Callable, Optional
+
+import httpx
+
+from src.circuit_breaker import (
+    create_circuit_breakers,
+    endpoint_keys,
+    is_endpoint_failure,
+)
+from src.coalesce import Coalescer
+from src.config import Config
+from src.dedup import Deduplicator, create_deduplicator
+from src.delivery import DeliveryResult
+from src.health import report_consumer_state
+from src.http_client import create_async_http_client
+from src.lag import observe_delivery, observe_pickup
+from src.lanes import create_priority_lanes, observe_lane_latency
+from src.logging_config import message_logger, setup_logging
+from src.metrics import (
+    LANE_DEPTH,
+    LANE_MESSAGES,
+    MESSAGE_PROCESSING_TIME,
+    MESSAGES_DEDUPLICATED,
+    MESSAGES_DELIVERED,
+    MESSAGES_ERRORS,
+    MESSAGES_PICKED_UP,
+    NOTIFIER_SEND_TIME,
+    RABBITMQ_CONNECTION_FAILURES,
+    RABBITMQ_DOWNTIME,
+    RABBITMQ_RECONNECTS,
+    SHARD_DEPTH,
+    SHARD_MESSAGES,
+)
+from src.notification import InvalidMessage, Notification, decode_notification
+from src.notifiers.apprise_cache import AppriseCache
+from src.notifiers.apprise_notifier import AsyncAppriseNotifier
+from src.notifiers.base import AsyncBaseNotifier, NotificationError
+from src.notifiers.mattermost_notifier import AsyncMattermostNotifier
+from src.notifiers.ntfy_direct_notifier import AsyncNtfyDirectNotifier
+from src.notifiers.pushover_direct_notifier import AsyncPushoverDirectNotifier
+from src.rate_limit import RateLimiter, rate_limit_keys
+from src.retry import (
+    ENQUEUED_AT_HEADER,
+    RetryPlanner,
+    RetryPolicy,
+    enqueued_at,
+    record_republish,
+    retry_attempts,
+)
+from src.routing import RoutingTable
+from src.rules import RulesLoader
+from src.shards import create_channel_shards
+from src.spool import create_spool
+
+try:
+    import aio_pika
+    from aio_pika.abc import AbstractIncomingMessage
+except ImportError:  # aio-pika is only needed for NOTIFIQ_RUNTIME=async
+    aio_pika = None  # type: ignore
+
+setup_logging()
+
+
+class AsyncRuntime:
+    """
+    asyncio consumer and notifier stack.
+
+    Mirrors the threaded runtime in src.main (same routing, metrics and ack
+    semantics) but holds every in-flight delivery as a coroutine on one event
+    loop, so thousands of deliveries can be pending without a thread each.
+    """
+
+    def __init__(self, config: Config, http_client: Optional[httpx.AsyncClient] = None):
+        """
+        Args:
+            config: Application configuration.
+            http_client: Async HTTP client for the direct notifiers. If omitted, one is created from config.
+        """
+        self.config = config
+        self.http_client = http_client or create_async_http_client(config)
+        self.rate_limiter = RateLimiter(config.rate_limits)
+        self.circuit_breakers = create_circuit_breakers(config)
+        self.deduplicator = create_deduplicator(config)
+        self.priority_lanes = create_priority_lanes(config)
+        self.channel_shards = create_channel_shards(config)
+        self.spool = create_spool(config)
+        self.apprise_cache = AppriseCache(
+            max_size=config.apprise_cache_size, ttl=config.apprise_cache_ttl
+        )
+
+        self.notifiers: dict[str, AsyncBaseNotifier] = {}
+        self.notifiers["apprise"] = AsyncAppriseNotifier(
+            config.apprise_urls, cache=self.apprise_cache
+        )
+        if ntfy_url := config.apprise_urls.get("ntfy"):
+            self.notifiers["ntfy-direct"] = AsyncNtfyDirectNotifier(
+                ntfy_url, client=self.http_client
+            )
+        if mattermost_url := config.apprise_urls.get("mattermost"):
+            self.notifiers["mattermost"] = AsyncMattermostNotifier(
+                mattermost_url, cache=self.apprise_cache
+            )
+        self.pushover_notifiers: dict[str, AsyncBaseNotifier] = {
+            app_id: AsyncPushoverDirectNotifier(pushover_url, client=self.http_client)
+            for app_id, pushover_url in config.pushover_apps.items()
+        }
+        # For backward compatibility: a single Pushover app is also "pushover-direct"
+        if len(self.pushover_notifiers) == 1:
+            self.notifiers["pushover-direct"] = next(
+                iter(self.pushover_notifiers.values())
+            )
+        self.routing_table = RoutingTable(
+            self.notifiers, self.pushover_notifiers, config.apprise_urls
+        )
+        self.rules_loader = RulesLoader(
+            config.rules_file, config.routing_rules, config.rules_reload_interval
+        )
+        self.retry_planner = RetryPlanner(config, self.rules_loader)
+
+        self._in_flight: set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.coalescer = (
+            Coalescer(
+                self._dispatch_threadsafe,
+                window=config.coalesce_window,
+                max_batch=config.coalesce_max_batch,
+                max_lines=config.coalesce_max_lines,
+            )
+            if config.coalesce_window > 0
+            else None
+        )
+        self._channel: Optional["aio_pika.abc.AbstractChannel"] = None
+        self._declared: set[str] = set()
+
+    async def dispatch(
+        self, notification: Notification, start_time: Optional[float] = None
+    ) -> DeliveryResult:
+        """
+        Deliver a notification, through the spool if SPOOL_PATH is set.
+        Args:
+            notification: The notification
+            start_time: When processing of the message started, for timing metrics
+        Returns:
+            The delivery result. Channels kept in the spool count as delivered.
+        """
+        if self.spool is None:
+            return await self.deliver(notification, start_time)
+        # SQLite writes are blocking, so keep them off the event loop
+        entry_id = await asyncio.to_thread(self.spool.add, notification)
+        result = await self.deliver(notification, start_time)
+        return await asyncio.to_thread(
+            self.spool.settle, entry_id, notification, result
+        )
+
+    async def deliver(
+        self, notification: Notification, start_time: Optional[float] = None
+    ) -> DeliveryResult:
+        """
+        Send a notification to all of its target notifiers concurrently.
+        Args:
+            notification: The notification
+            start_time: When processing of the message started, for timing metrics
+        Returns:
+            The delivery result, with the channels that could not be delivered.
+        """
+        channels = notification.channels
+        try:
+            targets, failed = self.routing_table.resolve(channels, notification.extra)
+        except Exception:
+            for channel in channels:
+                MESSAGES_ERRORS.labels(channel=channel).inc()
+            logging.exception("Error routing notification")
+            return DeliveryResult(channels, failed=list(channels))
+        for channel in failed:
+            logging.warning("No notifier configured for channel '%s'", channel)
+
+        retry_after = None
+        deadline = time.monotonic() + self.config.dispatch_timeout
+        tasks = {
+            asyncio.create_task(
+                self._send_timed(notifier, notification, target_channels, deadline)
+            ): target_channels
+            for notifier, target_channels in targets
+        }
+        done, pending = (
+            await asyncio.wait(tasks, timeout=self.config.dispatch_timeout)
+            if tasks
+            else (set(), set())
+        )
+        for task in pending:
+            task.cancel()
+            failed.extend(tasks[task])
+            logging.error(
+                "Delivery to %s did not finish within %ss",
+                tasks[task],
+                self.config.dispatch_timeout,
+            )
+        for task in done:
+            target_channels = tasks[task]
+            if exc := task.exception():
+                failed.extend(target_channels)
+                if isinstance(exc, NotificationError) and exc.retry_after:
+                    retry_after = max(retry_after or 0, exc.retry_after)
+                logging.error(
+                    "Error delivering notification to %s", target_channels, exc_info=exc
+                )
+                continue
+            for channel in target_channels:
+                MESSAGES_DELIVERED.labels(channel=channel).inc()
+                observe_delivery(notification, channel, task.result())
+                if start_time is not None:
+                    MESSAGE_PROCESSING_TIME.labels(channel=channel).observe(
+                        task.result() - start_time
+                    )
+        for channel in failed:
+            MESSAGES_ERRORS.labels(channel=channel).inc()
+        return DeliveryResult(channels, failed=failed, retry_after=retry_after)
+
+    def _dispatch_threadsafe(
+        self, notification: Notification, start_time: float
+    ) -> DeliveryResult:
+        """
+        Run dispatch on the event loop from another thread (used by the coalescer).
+        """
+        if self._loop is None:
+            raise RuntimeError("The async runtime is not running")
+        return asyncio.run_coroutine_threadsafe(
+            self.dispatch(notification, start_time), self._loop
+        ).result()
+
+    def _deliver_threadsafe(self, notification: Notification) -> DeliveryResult:
+        """
+        Run deliver on the event loop from another thread (used by the spool drainer).
+        """
+        if self._loop is None:
+            raise RuntimeError("The async runtime is not running")
+        return asyncio.run_coroutine_threadsafe(
+            self.deliver(notification), self._loop
+        ).result()
+
+    async def _send_timed(
+        self,
+        notifier: AsyncBaseNotifier,
+        notification: Notification,
+        channels: list[str],
+        deadline: float,
+    ) -> float:
+        """
+        Run a single notifier send and return the wall clock time it finished at.
+        Fails fast if an endpoint's circuit is open, then waits for rate limit
+        tokens, up to the message deadline.
+        """
+        pushover_app = self.routing_table.pushover_app(notification.extra)
+        keys = rate_limit_keys(channels, notification.extra, pushover_app)
+        breakers = self.circuit_breakers.allow(endpoint_keys(channels, pushover_app))
+        try:
+            await self.rate_limiter.acquire_async(
+                keys, timeout=deadline - time.monotonic()
+            )
+        except BaseException:
+            self.circuit_breakers.record(breakers, None)
+            raise
+        started = time.perf_counter()
+        try:
+            await notifier.send(notification, channels)
+        except asyncio.CancelledError:
+            self.circuit_breakers.record(breakers, False)
+            raise
+        except Exception as e:
+            self.circuit_breakers.record(breakers, not is_endpoint_failure(e))
+            raise
+        finally:
+            for channel in channels:
+                NOTIFIER_SEND_TIME.labels(channel=channel).observe(
+                    time.perf_counter() - started
+                )
+        self.circuit_breakers.record(breakers, True)
+        return time.time()
+
+    async def handle(
+        self,
+        body: bytes,
+        timestamp: Optional[float] = None,
+        headers: Optional[dict[str, Any]] = None,
+    ) -> DeliveryResult:
+        """
+        Decode a RabbitMQ message body and dispatch it.
+        Args:
+            body: Message body
+            timestamp: The message's AMQP timestamp property, for lag metrics
+            headers: The message's AMQP headers (retry attempts and first publish time)
+        Returns:
+            The delivery result. Messages that cannot be decoded are marked invalid.
+        """
+        start_time = time.time()
+        channels = ["unknown"]
+        try:
+            notification = decode_notification(
+                body, self.rules_loader.current, enqueued_at(headers, timestamp)
+            )
+        except InvalidMessage as e:
+            MESSAGES_ERRORS.labels(channel="unknown").inc()
+            logging.warning("Rejected invalid message: %s", e)
+            return DeliveryResult(channels, invalid=True)
+        try:
+            channels = notification.channels
+            title = notification.title
+            for channel in channels:
+                MESSAGES_PICKED_UP.labels(channel=channel).inc()
+            observe_pickup(
+                notification, start_time, retried=retry_attempts(headers) > 0
+            )
+            dedup_key = None
+            if self.deduplicator is not None:
+                dedup_key = Deduplicator.key(notification)
+                # The store may be Redis, so keep it off the event loop
+                if await asyncio.to_thread(self.deduplicator.is_duplicate, dedup_key):
+                    for channel in channels:
+                        MESSAGES_DEDUPLICATED.labels(channel=channel).inc()
+                    message_logger.info(
+                        "Suppressed duplicate '%s' for %s", title, channels
+                    )
+                    return DeliveryResult(channels)
+            message_logger.info(
+                "Dispatching '%s' to %s: %s", title, channels, notification.message
+            )
+            if self.coalescer is not None:
+                result = await asyncio.wrap_future(
+                    self.coalescer.add(notification, start_time)
+                )
+            else:
+                result = await self.dispatch(notification, start_time)
+            if self.deduplicator is not None and not result.delivered:
+                await asyncio.to_thread(self.deduplicator.forget, dedup_key)
+            return result
+        except Exception:
+            for channel in channels:
+                MESSAGES_ERRORS.labels(channel=channel).inc()
+            logging.exception("Failed to process message")
+            return DeliveryResult(channels, invalid=True)
+
+    async def on_message(
+        self, message: "AbstractIncomingMessage", source: Optional[str] = None
+    ) -> None:
+        """
+        aio-pika consumer callback: process a message, then ack or nack it.
+        Args:
+            message: The message.
+            source: Queue failed deliveries are retried through (default: the main queue).
+        """
+        task = asyncio.current_task()
+        if task is not None:
+            self._in_flight.add(task)
+        try:
+            result = await self.handle(
+                message.body, amqp_timestamp(message), dict(message.headers)
+            )
+            if result.delivered:
+                await message.ack()
+            elif self.retry_planner.enabled:
+                try:
+                    await self.republish(message, result, source)
+                except Exception:
+                    logging.exception("Failed to schedule retry, requeueing message")
+                    await message.nack(requeue=True)
+                    return
+                await message.ack()
+            else:
+                await message.nack(requeue=self.config.rabbitmq_requeue_on_failure)
+            observe_lane_latency(message.headers)
+        finally:
+            if task is not None:
+                self._in_flight.discard(task)
+
+    async def on_lane_ingress(self, message: "AbstractIncomingMessage") -> None:
+        """
+        aio-pika consumer callback for the main queue when priority lanes are
+        enabled: move the message to its lane.
+        """
+        lane = self.priority_lanes.classify(message.body, self.rules_loader.current)
+        if await self._move(
+            message,
+            [
+                (
+                    lane.queue,
+                    message.body,
+                    self.priority_lanes.lane_headers(lane, dict(message.headers)),
+                )
+            ],
+        ):
+            LANE_MESSAGES.labels(lane=lane.level).inc()
+
+    async def on_shard_ingress(self, message: "AbstractIncomingMessage") -> None:
+        """
+        aio-pika consumer callback for the main queue when channel shards are
+        enabled: move the message to its shards.
+        """
+        parts = self.channel_shards.split(message.body, self.rules_loader.current)
+        if await self._move(
+            message,
+            [(shard.queue, part, dict(message.headers)) for shard, part in parts],
+        ):
+            for shard, _ in parts:
+                SHARD_MESSAGES.labels(shard=shard.name).inc()
+
+    async def _move(
+        self,
+        message: "AbstractIncomingMessage",
+        parts: list[tuple[str, bytes, dict[str, Any]]],
+    ) -> bool:
+        """
+        Publish the parts of an ingress message to their queues, then ack it
+        once the broker has confirmed them all (or requeue it on failure).
+        Args:
+            message: The ingress message.
+            parts: (queue, body, headers) triples.
+        Returns:
+            Whether the message was moved.
+        """
+        try:
+            if self._channel is None:
+                raise RuntimeError("Not connected to RabbitMQ")
+            for queue, body, headers in parts:
+                await self._channel.default_exchange.publish(
+                    aio_pika.Message(
+                        body,
+                        content_type="application/json",
+                        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                        headers=headers,
+                        timestamp=message.timestamp,
+                    ),
+                    routing_key=queue,
+                )
+        except Exception:
+            logging.exception("Failed to move message to %s", [p[0] for p in parts])
+            await message.nack(requeue=True)
+            return False
+        await message.ack()
+        return True
+
+    def _ingress(
+        self,
+    ) -> tuple[Optional[Callable[..., Any]], list[tuple[str, str, int, str]]]:
+        """
+        Get the ingress callback and the queues it feeds, if lanes or shards are enabled.
+        Returns:
+            The callback (None if disabled) and (label, queue, prefetch, retry source) tuples.
+        """
+        if self.channel_shards.enabled:
+            if self.priority_lanes.enabled:
+                logging.warning(
+                    "PRIORITY_LANES cannot be combined with CHANNEL_SHARDS, ignoring it"
+                )
+            return self.on_shard_ingress, [
+                (shard.name, shard.queue, shard.prefetch, shard.queue)
+                for shard in self.channel_shards.shards
+            ]
+        if self.priority_lanes.enabled:
+            return self.on_lane_ingress, [
+                (lane.level, lane.queue, lane.prefetch, self.config.rabbitmq_queue)
+                for lane in self.priority_lanes.lanes
+            ]
+        return None, []
+
+    async def _consume_queues(
+        self,
+        connection: "aio_pika.abc.AbstractConnection",
+        queues: list[tuple[str, str, int, str]],
+    ) -> list[tuple["aio_pika.abc.AbstractQueue", str]]:
+        """
+        Start a consumer per lane or shard, each on its own channel with its
+        own prefetch window.
+        Args:
+            connection: The RabbitMQ connection.
+            queues: (label, queue, prefetch, retry source) tuples.
+        Returns:
+            The queues and their consumer tags.
+        """
+        consumers = []
+        for _, name, prefetch, source in queues:
+            queue_channel = await connection.channel()
+            await queue_channel.set_qos(prefetch_count=prefetch)
+            queue = await queue_channel.declare_queue(name, durable=True)
+            consumers.append(
+                (
+                    queue,
+                    await queue.consume(
+                        functools.partial(self.on_message, source=source)
+                    ),
+                )
+            )
+        return consumers
+
+    async def _record_depths(self, queues: list[tuple[str, str, int, str]]) -> None:
+        """
+        Export the number of messages waiting in each lane or shard.
+        """
+        if self._channel is None:
+            return
+        gauge = SHARD_DEPTH if self.channel_shards.enabled else LANE_DEPTH
+        for label, name, _, _ in queues:
+            declared = await self._channel.declare_queue(name, passive=True)
+            gauge.labels(label).set(declared.declaration_result.message_count)
+
+    async def republish(
+        self,
+        message: "AbstractIncomingMessage",
+        result: DeliveryResult,
+        source: Optional[str] = None,
+    ) -> None:
+        """
+        Publish the retries and dead letters for a failed delivery.
+        Args:
+            message: The failed message.
+            result: Its delivery result.
+            source: Queue retries return to (default: the main queue).
+        """
+        if self._channel is None:
+            raise RuntimeError("Not connected to RabbitMQ")
+        plan = self.retry_planner.plan(
+            source or self.config.rabbitmq_queue,
+            message.body,
+            dict(message.headers),
+            result,
+            amqp_timestamp(message),
+        )
+        for republish in plan:
+            if republish.arguments and republish.queue not in self._declared:
+                await self._channel.declare_queue(
+                    republish.queue, durable=True, arguments=republish.arguments
+                )
+                self._declared.add(republish.queue)
+            await self._channel.default_exchange.publish(
+                aio_pika.Message(
+                    republish.body,
+                    content_type="application/json",
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                    headers=republish.headers,
+                    timestamp=republish.headers[ENQUEUED_AT_HEADER],
+                    expiration=republish.expiration,
+                ),
+                routing_key=republish.queue,
+            )
+            record_republish(republish)
+
+    async def consume(self, stop: asyncio.Event) -> None:
+        """
+        Consume from the configured queue until stop is set, then drain in-flight
+        messages. A lost connection is re-established in-process, with backoff
+        and failover across the RABBITMQ_HOST list.
+        Args:
+            stop: Event signalling shutdown.
+        """
+        if aio_pika is None:
+            raise RuntimeError(
+                "NOTIFIQ_RUNTIME=async requires the 'aio-pika' package (pip install aio-pika)"
+            )
+        self._loop = asyncio.get_running_loop()
+        if self.spool is not None:
+            self.spool.start(self._deliver_threadsafe)
+        backoff = RetryPolicy(
+            0,
+            self.config.rabbitmq_reconnect_delay,
+            self.config.rabbitmq_reconnect_max_delay,
+        )
+        failures = 0
+        disconnected_at = None
+        while not stop.is_set():
+            try:
+                connection = await self._connect()
+            except (aio_pika.exceptions.AMQPConnectionError, OSError) as e:
+                failures += 1
+                RABBITMQ_CONNECTION_FAILURES.inc()
+                delay = backoff.delay(failures)
+                logging.warning(
+                    f"Could not connect to RabbitMQ ({e!r}), retrying in {delay:.1f}s"
+                )
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if disconnected_at is not None:
+                downtime = time.monotonic() - disconnected_at
+                RABBITMQ_RECONNECTS.inc()
+                RABBITMQ_DOWNTIME.inc(downtime)
+                logging.info(f"Reconnected to RabbitMQ after {downtime:.1f}s")
+            failures = 0
+            disconnected_at = None
+            try:
+                async with connection:
+                    await self._consume_on(connection, stop)
+            except (aio_pika.exceptions.AMQPError, ConnectionError) as e:
+                disconnected_at = time.monotonic()
+                logging.error(f"Lost connection to RabbitMQ: {e!r}")
+            finally:
+                report_consumer_state(False)
+        if self.coalescer is not None:
+            # Stopped while disconnected: still send the held digests
+            await asyncio.to_thread(self.coalescer.close)
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        if self.spool is not None:
+            # The drainer may be waiting on the loop, so join it from a thread
+            await asyncio.to_thread(self.spool.close)
+
+    async def _connect(self) -> "aio_pika.abc.AbstractConnection":
+        """
+        Connect to the first reachable RabbitMQ host, in RABBITMQ_HOST order.
+        """
+        error: Optional[Exception] = None
+        for host, port in self.config.rabbitmq_hosts:
+            try:
+                return await aio_pika.connect(
+                    host=host,
+                    port=port,
+                    login=self.config.rabbitmq_user,
+                    password=self.config.rabbitmq_pass,
+                    virtualhost=self.config.rabbitmq_vhost,
+                )
+            except (aio_pika.exceptions.AMQPConnectionError, OSError) as e:
+                logging.warning(
+                    f"Could not connect to RabbitMQ at {host}:{port}: {e!r}"
+                )
+                error = e
+        raise error or ConnectionError("No RabbitMQ hosts configured")
+
+    async def _consume_on(
+        self, connection: "aio_pika.abc.AbstractConnection", stop: asyncio.Event
+    ) -> None:
+        """
+        Declare the topology and consume on a connection until stop is set.
+        Raises:
+            ConnectionError: If the connection or channel closes.
+        """
+        # Publisher confirms (the default) make republish wait for the broker
+        channel = await connection.channel()
+        self._channel = channel
+        if self.retry_planner.dead_letter_queue:
+            await channel.declare_queue(
+                self.retry_planner.dead_letter_queue, durable=True
+            )
+        await channel.set_qos(prefetch_count=self.config.rabbitmq_prefetch_count)
+        queue = await channel.declare_queue(self.config.rabbitmq_queue, durable=True)
+        ingress, queues = self._ingress()
+        consumers = await self._consume_queues(connection, queues)
+        consumer_tag = await queue.consume(ingress or self.on_message)
+        logging.info(
+            f"Listening for messages on queue '{self.config.rabbitmq_queue}' (async runtime, prefetch {self.config.rabbitmq_prefetch_count})..."
+        )
+        depths_recorded = 0.0
+        while not stop.is_set():
+            if connection.is_closed or channel.is_closed:
+                raise ConnectionError("RabbitMQ connection closed")
+            report_consumer_state(True)
+            if (
+                queues
+                and time.monotonic() - depths_recorded
+                >= self.config.lane_depth_interval
+            ):
+                await self._record_depths(queues)
+                depths_recorded = time.monotonic()
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+        report_consumer_state(False)
+        await queue.cancel(consumer_tag)
+        for consumer_queue, consumer_queue_tag in consumers:
+            await consumer_queue.cancel(consumer_queue_tag)
+        if self.coalescer is not None:
+            # Send held digests while their acks can still be sent
+            await asyncio.to_thread(self.coalescer.close)
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def close(self) -> None:
+        """
+        Close all notifiers and the shared HTTP client.
+        """
+        for notifier in {*self.notifiers.values(), *self.pushover_notifiers.values()}:
+            try:
+                await notifier.close()
+            except Exception as e:
+                logging.warning(f"Error closing notifier {notifier!r}: {e}")
+        await self.http_client.aclose()
+
+
+def amqp_timestamp(message: "AbstractIncomingMessage") -> Optional[float]:
+    """
+    Get the AMQP timestamp property of a message as Unix time.
+    """
+    timestamp = message.timestamp
+    if timestamp is None:
+        return None
+    if timestamp.tzinfo is None:
+        # AMQP timestamps are UTC
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+async def run_async(config: Config) -> None:
+    """
+    Run the asyncio runtime until SIGTERM/SIGINT.
+    Args:
+        config: Application configuration.
+    """
+    runtime = AsyncRuntime(config)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    runtime.rules_loader.start()
+    try:
+        await runtime.consume(stop)
+    finally:
+        runtime.rules_loader.stop()
+        await runtime.close()
@@ -0,0 +1,257 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from src.config import Config
+from src.logging_config import setup_logging
+from src.metrics import CIRCUIT_OPENED, CIRCUIT_REJECTED, CIRCUIT_STATE
+from src.notifiers.base import NotificationError
+
+setup_logging()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Values of the notifiq_circuit_state gauge
+STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+
+class CircuitOpenError(NotificationError):
+    """
+    Raised instead of sending to an endpoint whose circuit is open.
+    """
+
+
+def is_endpoint_failure(exc: BaseException) -> bool:
+    """
+    Decide whether a send error says something about the endpoint's health.
+
+    Timeouts, connection errors, 5xx and 429 responses count against the
+    circuit; other 4xx responses are problems with the notification itself.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, NotificationError) and exc.status_code is not None:
+        return exc.status_code >= 500 or exc.status_code in (408, 429)
+    return True
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker for one endpoint.
+
+    Closed: sends go through and their outcomes are kept for a rolling window.
+    Once at least min_calls outcomes are in the window and the failure rate
+    reaches failure_rate, the circuit opens. Open: sends fail immediately with
+    CircuitOpenError until open_duration has passed. Half-open: up to
+    half_open_probes sends are let through as probes; a successful probe
+    closes the circuit and a failed one opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float,
+        min_calls: int,
+        window: float,
+        open_duration: float,
+        half_open_probes: int = 1,
+    ):
+        """
+        Args:
+            name: Endpoint name, used as the metrics label.
+            failure_rate: Fraction of failed sends (0-1) that opens the circuit.
+            min_calls: Minimum number of sends in the window before the circuit can open.
+            window: Length of the rolling window (seconds).
+            open_duration: Time the circuit stays open before probing (seconds).
+            half_open_probes: Number of concurrent probe sends in the half-open state.
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_duration = open_duration
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(endpoint=name).set(STATE_VALUES[CLOSED])
+
+    def _transition(self, state: str, now: float) -> None:
+        if state == OPEN:
+            self._opened_at = now
+            CIRCUIT_OPENED.labels(endpoint=self.name).inc()
+        self._outcomes.clear()
+        self._probes = 0
+        logging.warning("Circuit for '%s' is now %s", self.name, state)
+        self.state = state
+        CIRCUIT_STATE.labels(endpoint=self.name).set(STATE_VALUES[state])
+
+    def allow(self) -> None:
+        """
+        Check whether a send may go through. Every allowed send must be followed by record().
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with all probes in flight.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.open_duration:
+                self._transition(HALF_OPEN, now)
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return
+            retry_after = max(self._opened_at + self.open_duration - now, 1.0)
+        CIRCUIT_REJECTED.labels(endpoint=self.name).inc()
+        raise CircuitOpenError(
+            f"Circuit for '{self.name}' is open", retry_after=retry_after
+        )
+
+    def record(self, success: Optional[bool]) -> None:
+        """
+        Record the outcome of an allowed send.
+        Args:
+            success: Whether the endpoint handled the send, or None if it was never attempted.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+                if success is not None:
+                    self._transition(CLOSED if success else OPEN, now)
+                return
+            if self.state != CLOSED or success is None:
+                return
+            self._outcomes.append((now, not success))
+            while self._outcomes and self._outcomes[0][0] < now - self.window:
+                self._outcomes.popleft()
+            failures = sum(failed for _, failed in self._outcomes)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._transition(OPEN, now)
+
+
+class CircuitBreakers:
+    """
+    Registry of circuit breakers, one per endpoint.
+
+    Endpoints are the configured notifier URLs (see endpoint_keys): one per
+    channel, and one per Pushover app. Message fields such as ntfy_topic never
+    create a breaker, so the registry is bounded by the configuration.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        failure_rate: float,
+        min_calls: int,
+        window: float,
+        open_duration: float,
+        half_open_probes: int = 1,
+    ):
+        """
+        Args:
+            enabled: If False, every send is allowed and nothing is tracked.
+            failure_rate: See CircuitBreaker.
+            min_calls: See CircuitBreaker.
+            window: See CircuitBreaker.
+            open_duration: See CircuitBreaker.
+            half_open_probes: See CircuitBreaker.
+        """
+        self.enabled = enabled
+        self._settings = (failure_rate, min_calls, window, open_duration)
+        self._half_open_probes = half_open_probes
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, provider: str, instance: Optional[str] = None) -> CircuitBreaker:
+        """
+        Get the breaker for an endpoint, creating it on first use.
+        """
+        key = f"{provider}:{instance}" if instance else provider
+        if key not in self._breakers:
+            with self._lock:
+                if key not in self._breakers:
+                    self._breakers[key] = CircuitBreaker(
+                        key, *self._settings, half_open_probes=self._half_open_probes
+                    )
+        return self._breakers[key]
+
+    def allow(self, keys: list[tuple[str, Optional[str]]]) -> list[CircuitBreaker]:
+        """
+        Check every endpoint a send touches.
+        Args:
+            keys: (channel, instance) pairs for the send, from endpoint_keys().
+        Returns:
+            The breakers that allowed the send, to pass to record().
+        Raises:
+            CircuitOpenError: If any endpoint's circuit is open.
+        """
+        if not self.enabled:
+            return []
+        allowed: list[CircuitBreaker] = []
+        try:
+            for provider, instance in keys:
+                breaker = self.breaker(provider, instance)
+                breaker.allow()
+                allowed.append(breaker)
+        except CircuitOpenError:
+            for breaker in allowed:
+                breaker.record(None)
+            raise
+        return allowed
+
+    @staticmethod
+    def record(breakers: list[CircuitBreaker], success: Optional[bool]) -> None:
+        """
+        Record the outcome of a send on the breakers returned by allow().
+        """
+        for breaker in breakers:
+            breaker.record(success)
+
+    def states(self) -> dict[str, str]:
+        """
+        Get the state of every known endpoint.
+        """
+        return {name: breaker.state for name, breaker in list(self._breakers.items())}
+
+
+def endpoint_keys(
+    channels: list[str], pushover_app: Optional[str] = None
+) -> list[tuple[str, Optional[str]]]:
+    """
+    Map the channels of one send to the endpoints it reaches.
+    Args:
+        channels: Channels delivered by the send.
+        pushover_app: The Pushover app the send goes through, as resolved by
+            RoutingTable.pushover_app.
+    Returns:
+        List of (channel, instance) pairs; the instance is the Pushover app
+        for pushover-direct and None for every other channel.
+    """
+    return [
+        (channel, pushover_app if channel == "pushover-direct" else None)
+        for channel in channels
+    ]
+
+
+def create_circuit_breakers(config: Config) -> CircuitBreakers:
+    """
+    Create the circuit breaker registry from configuration.
+    """
+    return CircuitBreakers(
+        enabled=config.circuit_breaker_enabled,
+        failure_rate=config.circuit_failure_rate,
+        min_calls=config.circuit_min_calls,
+        window=config.circuit_window,
+        open_duration=config.circuit_open_duration,
+        half_open_probes=config.circuit_half_open_probes,
+    )
@@ -0,0 +1,216 @@
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Hashable, Optional
+
+from src.delivery import DeliveryResult
+from src.logging_config import setup_logging
+from src.metrics import DIGESTS_SENT, MESSAGES_COALESCED
+from src.notification import Notification
+
+setup_logging()
+
+# Sends one notification: (notification, start_time) -> result
+DispatchFn = Callable[[Notification, float], DeliveryResult]
+
+
+def coalesce_key(notification: Notification) -> Hashable:
+    """
+    Get the grouping key of a notification.
+
+    Notifications only coalesce if everything but their body matches: title,
+    channels and every routing field (ntfy_topic, pushover_app, priority, ...).
+    """
+    return (
+        notification.title,
+        tuple(notification.channels),
+        json.dumps(notification.extra, sort_keys=True, default=str),
+    )
+
+
+def build_digest(title: str, messages: list[str], max_lines: int) -> tuple[str, str]:
+    """
+    Merge the bodies of a burst of notifications into one digest.
+    Args:
+        title: Shared title of the notifications.
+        messages: Their bodies, in arrival order.
+        max_lines: Maximum number of distinct bodies to list.
+    Returns:
+        The digest's (title, message).
+    """
+    if len(messages) == 1:
+        return title, messages[0]
+    counts = Counter(messages)
+    lines = [
+        f"{count}× {message}" if count > 1 else message
+        for message, count in counts.most_common(max_lines)
+    ]
+    if len(counts) > max_lines:
+        lines.append(f"… and {len(counts) - max_lines} more")
+    return f"{title} (×{len(messages)})", "\n".join(lines)
+
+
+class _Item:
+    __slots__ = ("message", "start_time", "future")
+
+    def __init__(self, message: str, start_time: float):
+        self.message = message
+        self.start_time = start_time
+        self.future: Future[DeliveryResult] = Future()
+
+
+class _Batch:
+    __slots__ = ("notification", "deadline", "items")
+
+    def __init__(self, notification: Notification, deadline: float):
+        self.notification = notification
+        self.deadline = deadline
+        self.items: list[_Item] = []
+
+
+class Coalescer:
+    """
+    Merges bursts of similar notifications into digest notifications.
+
+    The first notification of a quiet group is sent straight away and opens a
+    window. Everything that arrives for the group within the window is held
+    and sent as one digest when the window closes, or as soon as max_batch
+    notifications are held. A group stays in coalescing mode for as long as
+    each window sees new notifications, so a storm costs one provider request
+    per window instead of one per message.
+
+    add() returns a future that resolves once the notification has been
+    delivered as part of its digest, so callers can ack after delivery.
+    """
+
+    def __init__(
+        self,
+        dispatch: DispatchFn,
+        window: float,
+        max_batch: int = 100,
+        max_lines: int = 20,
+        flush_workers: int = 4,
+    ):
+        """
+        Args:
+            dispatch: Sends one (digest) notification.
+            window: Seconds to collect notifications before sending a digest.
+            max_batch: Send a digest as soon as this many notifications are held.
+            max_lines: Maximum number of distinct messages listed in a digest.
+            flush_workers: Number of threads sending digests.
+        """
+        self.dispatch = dispatch
+        self.window = window
+        self.max_batch = max_batch
+        self.max_lines = max_lines
+        self.executor = ThreadPoolExecutor(
+            max_workers=flush_workers, thread_name_prefix="notifiq-coalesce"
+        )
+        self._batches: dict[Hashable, _Batch] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._timer = threading.Thread(
+            target=self._run, name="notifiq-coalesce-timer", daemon=True
+        )
+        self._timer.start()
+
+    def add(
+        self, notification: Notification, start_time: Optional[float] = None
+    ) -> "Future[DeliveryResult]":
+        """
+        Queue a notification for delivery.
+        Args:
+            notification: The notification.
+            start_time: When processing of the message started, for timing metrics
+        Returns:
+            A future resolving to the delivery result of the notification's digest.
+        """
+        item = _Item(notification.message, start_time or time.time())
+        key = coalesce_key(notification)
+        with self._condition:
+            if not self._closed:
+                batch = self._batches.get(key)
+                if batch is None:
+                    # Quiet group: send now, coalesce what follows within the window
+                    self._batches[key] = _Batch(
+                        notification, time.monotonic() + self.window
+                    )
+                    self._condition.notify()
+                    self._submit(notification, [item])
+                else:
+                    batch.items.append(item)
+                    if len(batch.items) >= self.max_batch:
+                        self._submit(batch.notification, batch.items)
+                        batch.items = []
+                return item.future
+        # Shutting down: deliver on the caller's thread
+        self._flush(notification, [item])
+        return item.future
+
+    def _submit(self, notification: Notification, items: list[_Item]) -> None:
+        self.executor.submit(self._flush, notification, items)
+
+    def _flush(self, notification: Notification, items: list[_Item]) -> None:
+        """
+        Send a digest and resolve the futures of the notifications it contains.
+        """
+        channels = notification.channels
+        digest_title, digest_message = build_digest(
+            notification.title, [item.message for item in items], self.max_lines
+        )
+        if len(items) > 1:
+            logging.info(
+                "Sending digest of %s notifications to %s", len(items), channels
+            )
+            for channel in channels:
+                DIGESTS_SENT.labels(channel=channel).inc()
+                MESSAGES_COALESCED.labels(channel=channel).inc(len(items))
+        try:
+            result = self.dispatch(
+                notification.replace(title=digest_title, message=digest_message),
+                min(item.start_time for item in items),
+            )
+        except Exception:
+            logging.exception("Error sending digest to %s", channels)
+            result = DeliveryResult(channels, failed=list(channels))
+        for item in items:
+            item.future.set_result(result)
+
+    def _run(self) -> None:
+        """
+        Timer thread: send the digests of groups whose window has closed.
+        """
+        with self._condition:
+            while not self._closed:
+                now = time.monotonic()
+                for key, batch in list(self._batches.items()):
+                    if batch.deadline > now:
+                        continue
+                    if batch.items:
+                        # Still busy: send what was collected and keep coalescing
+                        self._submit(batch.notification, batch.items)
+                        batch.items = []
+                        batch.deadline = now + self.window
+                    else:
+                        del self._batches[key]
+                deadlines = [batch.deadline for batch in self._batches.values()]
+                self._condition.wait(
+                    timeout=max(min(deadlines) - now, 0.01) if deadlines else None
+                )
+
+    def close(self) -> None:
+        """
+        Send every pending digest immediately and wait for them to be delivered.
+        """
+        with self._condition:
+            self._closed = True
+            for batch in self._batches.values():
+                if batch.items:
+                    self._submit(batch.notification, batch.items)
+            self._batches.clear()
+            self._condition.notify()
+        self._timer.join()
+        self.executor.shutdown(wait=True)
@@ -8,18 +8,146 @@ class Config:
     """
 
     def __init__(self):
-        # RabbitMQ
-        self.rabbitmq_host = os.environ.get("RABBITMQ_HOST", "rabbitmq")
+        # RabbitMQ. RABBITMQ_HOST may list several brokers to fail over between,
+        # e.g. "rabbit-0,rabbit-1:5673" (RABBITMQ_PORT is the default port)
         self.rabbitmq_port = int(os.environ.get("RABBITMQ_PORT", 5672))
+        self.rabbitmq_hosts = self.parse_hosts(
+            os.environ.get("RABBITMQ_HOST", "rabbitmq"), self.rabbitmq_port
+        )
+        self.rabbitmq_host, self.rabbitmq_port = self.rabbitmq_hosts[0]
         self.rabbitmq_user = os.environ.get("RABBITMQ_USER", "guest")
         self.rabbitmq_pass = os.environ.get("RABBITMQ_PASS", "guest")
         self.rabbitmq_queue = os.environ.get("RABBITMQ_QUEUE", "alerts")
         self.rabbitmq_vhost = os.environ.get("RABBITMQ_VHOST", "/")
+        # Backoff between reconnection attempts after losing the broker
+        self.rabbitmq_reconnect_delay = float(
+            os.environ.get("RABBITMQ_RECONNECT_DELAY", 1)
+        )
+        self.rabbitmq_reconnect_max_delay = float(
+            os.environ.get("RABBITMQ_RECONNECT_MAX_DELAY", 30)
+        )
+
+        # Runtime: "sync" (pika + threads) or "async" (aio-pika + asyncio)
+        self.runtime = os.environ.get("NOTIFIQ_RUNTIME", "sync").lower()
+
+        # Number of consumer processes (overridden by --workers)
+        self.workers = int(os.environ.get("NOTIFIQ_WORKERS", 1))
+        self.worker_shutdown_timeout = float(
+            os.environ.get("WORKER_SHUTDOWN_TIMEOUT", 30)
+        )
+
+        # Consumer: 0 workers keeps the legacy inline, auto-ack consumer
+        self.consumer_workers = int(os.environ.get("CONSUMER_WORKERS", 0))
+        default_prefetch = (
+            100 if self.runtime == "async" else max(1, 2 * self.consumer_workers)
+        )
+        self.rabbitmq_prefetch_count = int(
+            os.environ.get("RABBITMQ_PREFETCH_COUNT", default_prefetch)
+        )
+        self.rabbitmq_requeue_on_failure = os.environ.get(
+            "RABBITMQ_REQUEUE_ON_FAILURE", "0"
+        ) in ("1", "true", "True")
+
+        # Priority lanes, e.g. PRIORITY_LANES="emergency:16,high:8,normal:2": messages
+        # are split by priority into one queue per lane, each with its own prefetch
+        self.priority_lanes = self.parse_priority_lanes(
+            os.environ.get("PRIORITY_LANES", "")
+        )
+        self.lane_depth_interval = float(os.environ.get("LANE_DEPTH_INTERVAL", 5))
+
+        # Channel shards, e.g. CHANNEL_SHARDS="mattermost:2,ntfy-direct:4:16": messages
+        # are split by channel into one queue per shard, each with its own consumer pool
+        self.channel_shards = self.parse_channel_shards(
+            os.environ.get("CHANNEL_SHARDS", "")
+        )
+
+        # Delayed retries and dead-lettering of failed deliveries
+        self.retry_max_attempts = int(os.environ.get("RETRY_MAX_ATTEMPTS", 1))
+        self.retry_base_delay = float(os.environ.get("RETRY_BASE_DELAY", 5))
+        self.retry_max_delay = float(os.environ.get("RETRY_MAX_DELAY", 600))
+        self.rabbitmq_dead_letter_queue = os.environ.get(
+            "RABBITMQ_DEAD_LETTER_QUEUE", ""
+        )
+
+        # Rules for messages without a "channels" field, e.g.
+        # ROUTING_RULES="priority=high:pushover-direct,ntfy;source=grafana:mattermost"
+        self.routing_rules = self.parse_routing_rules(
+            os.environ.get("ROUTING_RULES", "")
+        )
+        # YAML/JSON rules file, reloaded when it changes
+        self.rules_file = os.environ.get("RULES_FILE") or None
+        self.rules_reload_interval = float(os.environ.get("RULES_RELOAD_INTERVAL", 5))
+
+        # Health/readiness server, and an optional separate port for /metrics
+        self.health_port = int(os.environ.get("HEALTH_PORT", 8080))
+        self.metrics_port = int(os.environ.get("METRICS_PORT", 0)) or None
+        self.readiness_cache_ttl = float(os.environ.get("READINESS_CACHE_TTL", 2))
+        self.readiness_max_staleness = float(
+            os.environ.get("READINESS_MAX_STALENESS", 30)
+        )
+
+        # Dispatch (fan-out to notifiers)
+        self.dispatch_max_workers = int(os.environ.get("DISPATCH_MAX_WORKERS", 8))
+        self.dispatch_timeout = float(os.environ.get("DISPATCH_TIMEOUT", 30))
+
+        # On-disk spool of failed deliveries, replayed in the background ("" = disabled)
+        self.spool_path = os.environ.get("SPOOL_PATH", "")
+        self.spool_max_bytes = int(os.environ.get("SPOOL_MAX_BYTES", 100 * 1024 * 1024))
+        self.spool_replay_rate = float(os.environ.get("SPOOL_REPLAY_RATE", 5))
+        self.spool_max_age = float(os.environ.get("SPOOL_MAX_AGE", 86400))
+
+        # Suppression of duplicate notifications (0 = disabled)
+        self.dedup_ttl = float(os.environ.get("DEDUP_TTL", 0))
+        self.dedup_cache_size = int(os.environ.get("DEDUP_CACHE_SIZE", 10000))
+        self.dedup_redis_url = os.environ.get("DEDUP_REDIS_URL", "")
+
+        # Coalescing of similar notifications into digests (0 = disabled)
+        self.coalesce_window = float(os.environ.get("COALESCE_WINDOW", 0))
+        self.coalesce_max_batch = int(os.environ.get("COALESCE_MAX_BATCH", 100))
+        self.coalesce_max_lines = int(os.environ.get("COALESCE_MAX_LINES", 20))
+
+        # Circuit breakers per endpoint (Pushover app, ntfy topic, Gotify app, ...)
+        self.circuit_breaker_enabled = os.environ.get(
+            "CIRCUIT_BREAKER_ENABLED", "1"
+        ) in ("1", "true", "True")
+        self.circuit_failure_rate = float(os.environ.get("CIRCUIT_FAILURE_RATE", 0.5))
+        self.circuit_min_calls = int(os.environ.get("CIRCUIT_MIN_CALLS", 5))
+        self.circuit_window = float(os.environ.get("CIRCUIT_WINDOW", 60))
+        self.circuit_open_duration = float(os.environ.get("CIRCUIT_OPEN_DURATION", 30))
+        self.circuit_half_open_probes = int(
+            os.environ.get("CIRCUIT_HALF_OPEN_PROBES", 1)
+        )
+
+        # HTTP client used by the direct notifiers. Capped at DISPATCH_TIMEOUT:
+        # a send that outlives the deadline still holds a dispatch worker
+        self.http_timeout = min(
+            float(os.environ.get("HTTP_TIMEOUT", 5.0)), self.dispatch_timeout
+        )
+        self.http_connect_timeout = min(
+            float(os.environ.get("HTTP_CONNECT_TIMEOUT", self.http_timeout)),
+            self.dispatch_timeout,
+        )
+        self.http_max_connections = int(os.environ.get("HTTP_MAX_CONNECTIONS", 20))
+        self.http_max_keepalive_connections = int(
+            os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", 10)
+        )
+        self.http_keepalive_expiry = float(
+            os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30.0)
+        )
+        self.http2 = os.environ.get("HTTP2", "1") in ("1", "true", "True")
+
+        # Cache of instantiated Apprise plugins, keyed by final URL
+        self.apprise_cache_size = int(os.environ.get("APPRISE_CACHE_SIZE", 512))
+        self.apprise_cache_ttl = float(os.environ.get("APPRISE_CACHE_TTL", 3600))
 
         # Dynamically build Apprise notifier URLs (channels)
         self.apprise_urls: dict[str, Optional[str]] = {}
         # Support multiple Pushover applications with identifiers
         self.pushover_apps: dict[str, str] = {}
+        # Token bucket limits, e.g. RATE_LIMIT_PUSHOVER_INFRA=1:5 -> {"pushover_infra": (1.0, 5.0)}
+        self.rate_limits: dict[str, tuple[float, float]] = {}
+        # Per-channel retry settings, e.g. RETRY_PUSHOVER_DIRECT_MAX_ATTEMPTS=5
+        self.retry_overrides: dict[str, dict[str, float]] = {}
 
         for key, value in os.environ.items():
             if key.startswith("APPRISE_") and key.endswith("_URL") and value:
@@ -34,8 +162,129 @@ class Config:
                     # Regular provider (ntfy, mattermost, etc.)
                     provider = middle_part.lower()
                     self.apprise_urls[provider] = value
+            elif key.startswith("RETRY_") and value:
+                for setting in ("MAX_ATTEMPTS", "BASE_DELAY", "MAX_DELAY"):
+                    channel = key[len("RETRY_") : -len(setting) - 1]
+                    if key.endswith(f"_{setting}") and channel:
+                        channel = channel.lower().replace("_", "-")
+                        self.retry_overrides.setdefault(channel, {})[
+                            setting.lower()
+                        ] = float(value)
+            elif key.startswith("RATE_LIMIT_") and value:
+                self.rate_limits[key[len("RATE_LIMIT_") :].lower()] = (
+                    self.parse_rate_limit(value)
+                )
 
         # For backward compatibility: if APPRISE_PUSHOVER_URL exists (no app identifier),
         # add it as "default" app
         if "APPRISE_PUSHOVER_URL" in os.environ and os.environ["APPRISE_PUSHOVER_URL"]:
             self.pushover_apps["default"] = os.environ["APPRISE_PUSHOVER_URL"]
+
+    @staticmethod
+    def parse_hosts(value: str, default_port: int) -> list[tuple[str, int]]:
+        """
+        Parse a comma-separated list of "<host>[:<port>]" brokers.
+        Args:
+            value: The setting value, e.g. "rabbit-0,rabbit-1:5673".
+            default_port: Port for hosts without one.
+        Returns:
+            A list of (host, port) pairs, in failover order.
+        """
+        hosts = []
+        for entry in filter(None, (h.strip() for h in value.split(","))):
+            host, _, port = entry.rpartition(":") if ":" in entry else (entry, "", "")
+            hosts.append((host, int(port) if port else default_port))
+        if not hosts:
+            raise ValueError(f"Invalid RabbitMQ host list '{value}'")
+        return hosts
+
+    @staticmethod
+    def parse_priority_lanes(value: str) -> list[tuple[str, int]]:
+        """
+        Parse priority lanes of the form "<level>:<prefetch>", separated by ",".
+        Args:
+            value: The setting value, e.g. "emergency:16,high:8,normal:2".
+        Returns:
+            A list of (level, prefetch) pairs, highest priority first.
+        """
+        levels = ("min", "low", "normal", "high", "emergency")
+        lanes = []
+        for lane in filter(None, (item.strip() for item in value.split(","))):
+            level, _, prefetch = lane.partition(":")
+            level = level.strip().lower()
+            if level not in levels or not prefetch.strip().isdigit():
+                raise ValueError(f"Invalid priority lane '{lane}'")
+            lanes.append((level, max(1, int(prefetch))))
+        return sorted(lanes, key=lambda lane: levels.index(lane[0]), reverse=True)
+
+    @staticmethod
+    def parse_channel_shards(value: str) -> list[tuple[str, int, int]]:
+        """
+        Parse channel shards of the form "<channel>:<workers>[:<prefetch>]", separated by ",".
+        Args:
+            value: The setting value, e.g. "mattermost:2,ntfy-direct:4:16".
+        Returns:
+            A list of (channel, workers, prefetch) triples. Prefetch defaults to twice the workers.
+        Raises:
+            ValueError: If a shard is malformed, or is named "default", which
+                would share its queue with the default shard.
+        """
+        shards = []
+        for shard in filter(None, (item.strip() for item in value.split(","))):
+            channel, _, rest = shard.partition(":")
+            workers, _, prefetch = rest.partition(":")
+            if (
+                not channel.strip()
+                or not workers.strip().isdigit()
+                or prefetch
+                and not prefetch.strip().isdigit()
+            ):
+                raise ValueError(f"Invalid channel shard '{shard}'")
+            if channel.strip() == "default":
+                raise ValueError(
+                    "Channel shard 'default' is reserved for channels without a shard"
+                )
+            workers_count = max(1, int(workers))
+            shards.append(
+                (
+                    channel.strip(),
+                    workers_count,
+                    max(1, int(prefetch)) if prefetch else 2 * workers_count,
+                )
+            )
+        return shards
+
+    @staticmethod
+    def parse_routing_rules(value: str) -> list[tuple[str, str, list[str]]]:
+        """
+        Parse routing rules of the form "<field>=<value>:<channel>[,<channel>...]", separated by ";".
+        Args:
+            value: The setting value.
+        Returns:
+            A list of (field, value, channels) triples.
+        """
+        rules = []
+        for rule in filter(None, (r.strip() for r in value.split(";"))):
+            condition, _, channels = rule.partition(":")
+            field, _, field_value = condition.partition("=")
+            targets = [c.strip() for c in channels.split(",") if c.strip()]
+            if not field.strip() or not field_value.strip() or not targets:
+                raise ValueError(f"Invalid routing rule '{rule}'")
+            rules.append((field.strip(), field_value.strip(), targets))
+        return rules
+
+    @staticmethod
+    def parse_rate_limit(value: str) -> tuple[float, float]:
+        """
+        Parse a rate limit of the form "<per_second>[:<burst>]".
+        Args:
+            value: The setting value, e.g. "0.5" or "2:10".
+        Returns:
+            A (rate, burst) tuple. Burst defaults to the rate (at least 1).
+        """
+        rate_str, _, burst_str = value.partition(":")
+        rate = float(rate_str)
+        burst = float(burst_str) if burst_str else max(1.0, rate)
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Invalid rate limit '{value}'")
+        return rate, burst
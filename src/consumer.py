@@ -0,0 +1,182 @@
+import functools
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
+
+from pika.adapters.blocking_connection import BlockingChannel, BlockingConnection
+from pika.spec import Basic, BasicProperties
+
+from src.delivery import DeliveryResult
+from src.logging_config import setup_logging
+
+if TYPE_CHECKING:
+    from src.retry import RetryPublisher
+
+setup_logging()
+
+
+class WindowedConsumer:
+    """
+    RabbitMQ consumer that keeps a window of unacknowledged messages in flight.
+
+    Messages are handed to a pool of worker threads and acknowledged only after
+    they have been processed. pika connections are not thread-safe, so workers
+    never touch the channel directly: acks and nacks are scheduled back onto the
+    connection thread with add_callback_threadsafe. Failed messages are handed
+    to the retry publisher (if any) on that thread too and acked once the retry
+    or dead letter has been confirmed by the broker.
+    """
+
+    def __init__(
+        self,
+        connection: BlockingConnection,
+        channel: BlockingChannel,
+        handler: Callable[
+            [bytes, Optional[int], Optional[dict[str, Any]]],
+            Union[DeliveryResult, "Future[DeliveryResult]"],
+        ],
+        workers: int,
+        requeue_on_failure: bool = False,
+        retry_publisher: Optional["RetryPublisher"] = None,
+        on_settled: Optional[Callable[[BasicProperties], None]] = None,
+    ):
+        """
+        Args:
+            connection: The RabbitMQ connection the channel belongs to.
+            channel: The channel to consume from.
+            handler: Processes a message body, its AMQP timestamp and headers, and returns the delivery result or a future of it.
+            workers: Number of worker threads processing messages.
+            requeue_on_failure: Requeue messages that failed delivery instead of rejecting them.
+            retry_publisher: Schedules retries and dead letters for failed messages.
+            on_settled: Called with a message's properties once it has been acked or nacked.
+        """
+        self.connection = connection
+        self.channel = channel
+        self.handler = handler
+        self.requeue_on_failure = requeue_on_failure
+        self.retry_publisher = retry_publisher
+        self.on_settled = on_settled
+        self.queue = ""
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="notifiq-worker"
+        )
+        self.consumer_tags: list[str] = []
+
+    def start(
+        self,
+        queue: str,
+        prefetch_count: int,
+        lanes: Optional[list[tuple[str, int]]] = None,
+    ) -> None:
+        """
+        Start consuming from a queue with manual acknowledgements.
+        Args:
+            queue: Queue name. Failed messages are retried through this queue.
+            prefetch_count: Maximum number of unacknowledged messages in flight.
+            lanes: (queue, prefetch_count) pairs to consume instead of `queue`.
+                Each lane gets its own prefetch window, so the windows act as
+                scheduling weights and a full lane cannot starve the others.
+        """
+        self.queue = queue
+        for source, prefetch in lanes or [(queue, prefetch_count)]:
+            # Without global=True, basic_qos limits each consumer started after it
+            self.channel.basic_qos(prefetch_count=prefetch)
+            self.consumer_tags.append(
+                self.channel.basic_consume(
+                    queue=source, on_message_callback=self.on_message, auto_ack=False
+                )
+            )
+
+    def on_message(
+        self,
+        ch: BlockingChannel,
+        method: Basic.Deliver,
+        properties: BasicProperties,
+        body: bytes,
+    ) -> None:
+        """
+        pika callback: hand the message to a worker thread.
+        """
+        self.executor.submit(self._process, method.delivery_tag, properties, body)
+
+    def _process(
+        self, delivery_tag: int, properties: BasicProperties, body: bytes
+    ) -> None:
+        """
+        Run the handler on a worker thread and schedule the ack/nack.
+        """
+        try:
+            result = self.handler(body, properties.timestamp, properties.headers)
+        except Exception:
+            logging.exception("Unhandled error processing message")
+            result = DeliveryResult(["unknown"], invalid=True)
+        if isinstance(result, Future):
+            # Settled when the future resolves, without holding this worker
+            result.add_done_callback(
+                lambda done: self.connection.add_callback_threadsafe(
+                    functools.partial(
+                        self._settle, delivery_tag, properties, body, done.result()
+                    )
+                )
+            )
+            return
+        self.connection.add_callback_threadsafe(
+            functools.partial(self._settle, delivery_tag, properties, body, result)
+        )
+
+    def _settle(
+        self,
+        delivery_tag: int,
+        properties: BasicProperties,
+        body: bytes,
+        result: DeliveryResult,
+    ) -> None:
+        """
+        Ack or nack a message. Runs on the connection thread.
+        """
+        if not self.channel.is_open:
+            logging.warning(
+                "Channel closed before message %s could be acknowledged", delivery_tag
+            )
+            return
+        self._ack_or_nack(delivery_tag, properties, body, result)
+        if self.on_settled is not None:
+            self.on_settled(properties)
+
+    def _ack_or_nack(
+        self,
+        delivery_tag: int,
+        properties: BasicProperties,
+        body: bytes,
+        result: DeliveryResult,
+    ) -> None:
+        if not result.delivered and self.retry_publisher is not None:
+            try:
+                self.retry_publisher.publish(
+                    self.channel, self.queue, body, properties, result
+                )
+            except Exception:
+                logging.exception(
+                    "Failed to schedule retry for message %s, requeueing it",
+                    delivery_tag,
+                )
+                self.channel.basic_nack(delivery_tag=delivery_tag, requeue=True)
+                return
+            self.channel.basic_ack(delivery_tag=delivery_tag)
+        elif result.delivered:
+            self.channel.basic_ack(delivery_tag=delivery_tag)
+        else:
+            self.channel.basic_nack(
+                delivery_tag=delivery_tag, requeue=self.requeue_on_failure
+            )
+
+    def stop(self) -> None:
+        """
+        Stop consuming, wait for in-flight messages and flush their acks.
+        """
+        if self.channel.is_open:
+            for consumer_tag in self.consumer_tags:
+                self.channel.basic_cancel(consumer_tag)
+        self.executor.shutdown(wait=True)
+        if self.connection.is_open:
+            self.connection.process_data_events(time_limit=0)
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Protocol
+
+from src.config import Config
+from src.delivery import DeliveryResult
+from src.logging_config import setup_logging
+from src.notification import Notification
+
+try:
+    import redis
+except ImportError:  # redis is only needed for DEDUP_REDIS_URL
+    redis = None  # type: ignore
+
+setup_logging()
+
+
+class DedupStore(Protocol):
+    """
+    Storage for the keys of recently seen notifications.
+    """
+
+    def add(self, key: str) -> bool:
+        """
+        Record a key, atomically.
+        Returns:
+            True if the key was new, False if it was already recorded and not expired.
+        """
+        ...
+
+    def discard(self, key: str) -> None:
+        """
+        Forget a key, so the next notification with it is not suppressed.
+        """
+        ...
+
+
+class MemoryDedupStore:
+    """
+    Thread-safe, bounded in-memory TTL store. Oldest keys are evicted first.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        """
+        Args:
+            max_size: Maximum number of keys to remember.
+            ttl: Seconds a key is remembered for.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._keys: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            expires = self._keys.get(key)
+            if expires is not None and expires > now:
+                return False
+            self._keys[key] = now + self.ttl
+            self._keys.move_to_end(key)
+            # Keys are ordered by expiry, so expired and excess keys are at the front
+            while self._keys and (
+                len(self._keys) > self.max_size
+                or next(iter(self._keys.values())) <= now
+            ):
+                self._keys.popitem(last=False)
+            return True
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._keys.pop(key, None)
+
+
+class RedisDedupStore:
+    """
+    Redis-backed store, so several notifiq replicas suppress duplicates together.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        url: Optional[str] = None,
+        prefix: str = "notifiq:dedup:",
+        client: Any = None,
+    ):
+        """
+        Args:
+            ttl: Seconds a key is remembered for.
+            url: Redis URL (e.g. redis://redis:6379/0). Ignored if client is given.
+            prefix: Prefix for the Redis keys.
+            client: An existing Redis client.
+        """
+        if client is None:
+            if redis is None:
+                raise RuntimeError(
+                    "DEDUP_REDIS_URL requires the 'redis' package (pip install redis)"
+                )
+            client = redis.Redis.from_url(url, socket_timeout=1)
+        self.client = client
+        self.ttl = max(math.ceil(ttl), 1)
+        self.prefix = prefix
+
+    def add(self, key: str) -> bool:
+        return bool(self.client.set(self.prefix + key, 1, nx=True, ex=self.ttl))
+
+    def discard(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+
+class Deduplicator:
+    """
+    Suppresses notifications that were already seen within the TTL.
+
+    A notification is identified by its dedup_key field if it has one, and by
+    a hash of its title, message, channels and routing fields otherwise. If a
+    shared store fails, the local fallback store is used so that notifications
+    are never dropped because the store is down.
+    """
+
+    def __init__(self, store: DedupStore, fallback: Optional[DedupStore] = None):
+        """
+        Args:
+            store: Where seen keys are recorded.
+            fallback: Used while the store raises errors.
+        """
+        self.store = store
+        self.fallback = fallback
+
+    @staticmethod
+    def key(notification: Notification) -> str:
+        """
+        Get the deduplication key of a notification: its dedup_key field if
+        set, otherwise a hash of its content.
+        Args:
+            notification: The notification.
+        """
+        if notification.dedup_key:
+            return notification.dedup_key
+        content = json.dumps(
+            [
+                notification.title,
+                notification.message,
+                notification.channels,
+                notification.extra,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def is_duplicate(self, key: str) -> bool:
+        """
+        Check a key and record it as seen.
+        """
+        try:
+            return not self.store.add(key)
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            logging.warning("Deduplication store unavailable, using local cache: %s", e)
+            return not self.fallback.add(key)
+
+    def forget_if_failed(self, key: str, result: DeliveryResult) -> None:
+        """
+        Forget a key if its delivery failed, so a retry or redelivery is not suppressed.
+        """
+        if not result.delivered:
+            self.forget(key)
+
+    def forget(self, key: str) -> None:
+        """
+        Forget a key, e.g. because its delivery failed and will be retried.
+        """
+        for store in (self.store, self.fallback):
+            if store is None:
+                continue
+            try:
+                store.discard(key)
+            except Exception as e:
+                logging.warning("Could not remove deduplication key %s: %s", key, e)
+
+
+def create_deduplicator(config: Config) -> Optional[Deduplicator]:
+    """
+    Create the deduplicator from configuration.
+    Returns:
+        The deduplicator, or None if DEDUP_TTL is 0.
+    """
+    if config.dedup_ttl <= 0:
+        return None
+    memory = MemoryDedupStore(config.dedup_cache_size, config.dedup_ttl)
+    if config.dedup_redis_url:
+        return Deduplicator(
+            RedisDedupStore(config.dedup_ttl, url=config.dedup_redis_url),
+            fallback=memory,
+        )
+    return Deduplicator(memory)
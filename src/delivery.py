@@ -0,0 +1,39 @@
+from typing import Optional
+
+
+class DeliveryResult:
+    """
+    Outcome of processing one message.
+    """
+
+    def __init__(
+        self,
+        channels: list[str],
+        failed: Optional[list[str]] = None,
+        retry_after: Optional[float] = None,
+        invalid: bool = False,
+    ):
+        """
+        Args:
+            channels: Channels the message was addressed to.
+            failed: Channels that could not be delivered.
+            retry_after: Longest Retry-After requested by a failed provider (seconds).
+            invalid: The message could not be decoded or routed at all.
+        """
+        self.channels = channels
+        self.failed = failed or []
+        self.retry_after = retry_after
+        self.invalid = invalid
+
+    @property
+    def delivered(self) -> bool:
+        """
+        True if every channel was delivered.
+        """
+        return not self.invalid and not self.failed
+
+    def __repr__(self) -> str:
+        return (
+            f"DeliveryResult(channels={self.channels!r}, failed={self.failed!r}, "
+            f"retry_after={self.retry_after!r}, invalid={self.invalid!r})"
+        )
@@ -1,81 +1,205 @@
+import json
+import logging
 import os
 import threading
-from typing import Literal
-
-import pika
-from flask import Flask, Response, jsonify
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
 
 from src.logging_config import setup_logging
 
 setup_logging()
 
-from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
 
-app = Flask(__name__)
+from src.circuit_breaker import STATE_VALUES
+from src.metrics import CONSUMER_CONNECTED, CONSUMER_HEARTBEAT
 
 
-@app.route("/metrics")
-def metrics():
+def metrics_registry() -> CollectorRegistry:
     """
-    Prometheus metrics endpoint.
+    Get the registry to export: the default one, or an aggregate of every
+    worker process in --workers mode.
     """
-    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
 
+def circuit_states() -> dict[str, str]:
+    """
+    Get the circuit breaker state of every endpoint, from the exported metrics.
 
-@app.route("/healthz")
-def healthz() -> tuple[Response, Literal[200]]:
+    Reading the notifiq_circuit_state gauge works both in-process and across
+    worker processes. If workers disagree, the least healthy state wins.
+    """
+    names = {value: state for state, value in STATE_VALUES.items()}
+    states: dict[str, int] = {}
+    for family in metrics_registry().collect():
+        if family.name != "notifiq_circuit_state":
+            continue
+        for sample in family.samples:
+            endpoint = sample.labels["endpoint"]
+            states[endpoint] = max(states.get(endpoint, 0), int(sample.value))
+    return {endpoint: names.get(value, "unknown") for endpoint, value in states.items()}
+
+
+def healthz() -> tuple[int, dict[str, Any]]:
     """
     Health check endpoint.
     """
-    return jsonify(status="ok"), 200
+    return 200, {"status": "ok"}
+
+
+class ReadinessCheck:
+    """
+    Readiness from the consumer's own state rather than a probe connection.
 
+    The consumer loop reports whether it has an open channel consuming from
+    RabbitMQ and a heartbeat on every iteration (notifiq_consumer_* gauges,
+    shared by all workers in --workers mode). The result is cached for `ttl`
+    seconds, so probes from many sources cost one registry read.
+    """
+
+    def __init__(self, ttl: float = 2.0, max_staleness: float = 30.0):
+        """
+        Args:
+            ttl: Seconds to reuse a result for.
+            max_staleness: Seconds without a consumer heartbeat after which the
+                consumer is considered stuck.
+        """
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._result: Optional[tuple[int, dict[str, Any]]] = None
+        self._expires = 0.0
+
+    def __call__(self) -> tuple[int, dict[str, Any]]:
+        with self._lock:
+            now = time.monotonic()
+            if self._result is None or now >= self._expires:
+                self._result = self.evaluate()
+                self._expires = now + self.ttl
+            return self._result
+
+    def evaluate(self) -> tuple[int, dict[str, Any]]:
+        """
+        Compute readiness from the exported metrics.
+        Returns:
+            A (status code, payload) tuple.
+        """
+        connected = heartbeat = None
+        for family in metrics_registry().collect():
+            if family.name == "notifiq_consumer_connected" and family.samples:
+                connected = max(sample.value for sample in family.samples)
+            elif family.name == "notifiq_consumer_heartbeat_timestamp_seconds":
+                heartbeat = max((s.value for s in family.samples), default=None)
+        circuits = circuit_states()
+        age = time.time() - heartbeat if heartbeat else None
+        if connected is None or age is None:
+            reason = "consumer not started"
+        elif not connected:
+            reason = "consumer not connected to RabbitMQ"
+        elif age > self.max_staleness:
+            reason = f"no consumer heartbeat for {age:.0f}s"
+        else:
+            return 200, {
+                "status": "ready",
+                "heartbeat_age": round(age, 3),
+                "circuits": circuits,
+            }
+        return 503, {"status": "not ready", "reason": reason, "circuits": circuits}
+
+
+readiness = ReadinessCheck()
+
+
+def readyz() -> tuple[int, dict[str, Any]]:
+    """
+    Readiness check endpoint: only ready while the consumer is connected and
+    its loop is running.
 
-# @app.route("/readyz")
-# def readyz() -> tuple[Response, Literal[200]]:
-#     """
-#     Readiness check endpoint.
-#     """
-#     return jsonify(status="ready"), 200
+    Open circuits are reported but do not make the service unready: a provider
+    outage is not fixed by restarting or rerouting traffic away from notifiq.
+    """
+    return readiness()
 
 
-@app.route("/readyz")
-def readyz() -> tuple[Response, int]:
+def report_consumer_state(connected: bool) -> None:
     """
-    Readiness check endpoint: only ready if RabbitMQ is reachable.
+    Record the consumer's connection state and a heartbeat, for /readyz.
+    Called from the consumer loop, so it must stay cheap.
     """
-    rabbitmq_host = os.environ.get("RABBITMQ_HOST", "localhost")
-    rabbitmq_port = int(os.environ.get("RABBITMQ_PORT", 5672))
-    rabbitmq_user = os.environ.get("RABBITMQ_USER", "guest")
-    rabbitmq_pass = os.environ.get("RABBITMQ_PASS", "guest")
-    rabbitmq_vhost = os.environ.get("RABBITMQ_VHOST", "/")
+    CONSUMER_CONNECTED.set(1 if connected else 0)
+    CONSUMER_HEARTBEAT.set(time.time())
 
-    try:
-        credentials = pika.PlainCredentials(rabbitmq_user, rabbitmq_pass)
-        params = pika.ConnectionParameters(
-            host=rabbitmq_host,
-            port=rabbitmq_port,
-            virtual_host=rabbitmq_vhost,
-            credentials=credentials,
-            connection_attempts=1,
-            socket_timeout=2,
-        )
-        conn = pika.BlockingConnection(params)
-        conn.close()
-        return jsonify(status="ready"), 200
-    except Exception as e:
-        return jsonify(status="not ready", reason=str(e)), 503
 
+class HealthRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves /metrics, /healthz and /readyz.
+
+    Each request runs on its own short-lived thread (ThreadingHTTPServer), so
+    a slow readiness probe or a large scrape never holds up the others.
+    """
 
-def start_health_server(port: int = 8080) -> threading.Thread:
+    routes = {"/healthz": healthz, "/readyz": readyz}
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            self._respond(200, CONTENT_TYPE_LATEST, generate_latest(metrics_registry()))
+        elif route := self.routes.get(path):
+            status, payload = route()
+            self._respond(status, "application/json", json.dumps(payload).encode())
+        else:
+            self._respond(404, "application/json", b'{"status": "not found"}')
+
+    def _respond(self, status: int, content_type: str, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        # Probes and scrapes arrive every few seconds; keep them out of the logs
+        logging.debug("Health server: " + fmt, *args)
+
+
+def start_health_server(
+    port: int = 8080,
+    metrics_port: Optional[int] = None,
+    readiness_ttl: float = 2.0,
+    readiness_max_staleness: float = 30.0,
+) -> threading.Thread:
     """
     Start the health server.
     Args:
         port: Port to run the health server on.
+        metrics_port: Also serve /metrics on this port, from a separate
+            server, so scrapes and probes do not share a listener.
+        readiness_ttl: Seconds to cache the /readyz result for.
+        readiness_max_staleness: Seconds without a consumer heartbeat before /readyz fails.
     Returns:
         Thread: Thread running the health server.
     """
+    readiness.ttl = readiness_ttl
+    readiness.max_staleness = readiness_max_staleness
+    server = ThreadingHTTPServer(("0.0.0.0", port), HealthRequestHandler)
+    server.daemon_threads = True
     thread = threading.Thread(
-        target=app.run, kwargs={"host": "0.0.0.0", "port": port}, daemon=True
+        target=server.serve_forever, name="notifiq-health", daemon=True
     )
     thread.start()
+    if metrics_port and metrics_port != port:
+        start_http_server(metrics_port, registry=metrics_registry())
     return thread
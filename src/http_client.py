@@ -0,0 +1,197 @@
+import contextlib
+import logging
+import time
+from typing import Any, Optional
+
+import httpx
+
+from src.config import Config
+from src.logging_config import setup_logging
+from src.metrics import (
+    HTTP_BYTES_SENT,
+    HTTP_CONNECT_TIME,
+    HTTP_REQUEST_TIME,
+    HTTP_RESPONSES,
+    HTTP_TTFB,
+)
+
+setup_logging()
+
+# Request extension holding the RequestTimer of a request
+TIMER_EXTENSION = "notifiq.timer"
+# Request extension naming the provider a notifier sends to (the metrics label)
+PROVIDER_EXTENSION = "notifiq.provider"
+
+
+class RequestTimer:
+    """
+    Times one provider request from httpcore trace events: connect (only for
+    new connections), time to first byte and total time.
+    """
+
+    __slots__ = (
+        "labels",
+        "connected_event",
+        "started",
+        "connecting",
+        "sent",
+        "failed",
+    )
+
+    def __init__(self, url: httpx.URL, provider: str):
+        """
+        Args:
+            url: The request URL.
+            provider: Provider the request is for, from the PROVIDER_EXTENSION.
+        """
+        self.labels = {"provider": provider, "host": url.host}
+        # A connection is ready after the TLS handshake for https, after TCP otherwise
+        self.connected_event = (
+            "connection.start_tls.complete"
+            if url.scheme == "https"
+            else "connection.connect_tcp.complete"
+        )
+        self.started = time.perf_counter()
+        self.connecting: Optional[float] = None
+        self.sent: Optional[float] = None
+        self.failed = False
+
+    def trace(self, name: str, info: dict[str, Any]) -> None:
+        """
+        httpcore trace callback.
+        """
+        now = time.perf_counter()
+        if name == "connection.connect_tcp.started":
+            self.connecting = now
+        elif name == self.connected_event and self.connecting is not None:
+            HTTP_CONNECT_TIME.labels(**self.labels).observe(now - self.connecting)
+        elif name.endswith(".send_request_headers.started"):
+            self.sent = now
+        elif name.endswith(".receive_response_headers.complete"):
+            if self.sent is not None:
+                HTTP_TTFB.labels(**self.labels).observe(now - self.sent)
+        elif name.endswith(".failed") and not self.failed:
+            self.failed = True
+            HTTP_RESPONSES.labels(**self.labels, status_class="error").inc()
+
+    async def atrace(self, name: str, info: dict[str, Any]) -> None:
+        """
+        httpcore trace callback for the async client.
+        """
+        self.trace(name, info)
+
+    def finish(self, response: httpx.Response) -> None:
+        """
+        Record the status class and total time once the body has been read.
+        """
+        HTTP_RESPONSES.labels(
+            **self.labels, status_class=f"{response.status_code // 100}xx"
+        ).inc()
+        HTTP_REQUEST_TIME.labels(**self.labels).observe(
+            time.perf_counter() - self.started
+        )
+
+
+def _start_timer(request: httpx.Request) -> RequestTimer:
+    timer = RequestTimer(
+        request.url, request.extensions.get(PROVIDER_EXTENSION, "unknown")
+    )
+    request.extensions[TIMER_EXTENSION] = timer
+    with contextlib.suppress(httpx.RequestNotRead):
+        # Streamed bodies are not counted
+        HTTP_BYTES_SENT.labels(**timer.labels).inc(len(request.content))
+    return timer
+
+
+def _on_request(request: httpx.Request) -> None:
+    request.extensions["trace"] = _start_timer(request).trace
+
+
+def _on_response(response: httpx.Response) -> None:
+    response.read()
+    if timer := response.request.extensions.get(TIMER_EXTENSION):
+        timer.finish(response)
+
+
+async def _on_request_async(request: httpx.Request) -> None:
+    request.extensions["trace"] = _start_timer(request).atrace
+
+
+async def _on_response_async(response: httpx.Response) -> None:
+    await response.aread()
+    if timer := response.request.extensions.get(TIMER_EXTENSION):
+        timer.finish(response)
+
+
+def http2_available() -> bool:
+    """
+    Check whether the 'h2' package needed for HTTP/2 is installed (it comes
+    with httpx[http2], but may be missing from a hand-built environment).
+    """
+    try:
+        import h2  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        return False
+    return True
+
+
+def _client_options(config: Config) -> dict[str, Any]:
+    """
+    Build the pooling and timeout options shared by the sync and async clients.
+    """
+    http2 = config.http2
+    if http2 and not http2_available():
+        logging.warning(
+            "HTTP2 is enabled but the 'h2' package is not installed, falling back to HTTP/1.1"
+        )
+        http2 = False
+    return {
+        "http2": http2,
+        "timeout": httpx.Timeout(
+            config.http_timeout, connect=config.http_connect_timeout
+        ),
+        "limits": httpx.Limits(
+            max_connections=config.http_max_connections,
+            max_keepalive_connections=config.http_max_keepalive_connections,
+            keepalive_expiry=config.http_keepalive_expiry,
+        ),
+    }
+
+
+def create_http_client(config: Config) -> httpx.Client:
+    """
+    Create a long-lived, pooled HTTP client for the direct notifiers.
+
+    Connections are kept alive between notifications so repeated sends to the
+    same provider skip the TCP and TLS handshakes. HTTP/2 is negotiated when
+    enabled (the default). Every request is timed (connect,
+    time to first byte, total) and counted by provider, host and status class;
+    notifiers name their provider with the PROVIDER_EXTENSION request extension.
+    Apprise-routed channels send through Apprise's own HTTP stack and are not
+    covered.
+    Args:
+        config: Application configuration.
+    Returns:
+        A configured httpx.Client. The caller is responsible for closing it.
+    """
+    return httpx.Client(
+        **_client_options(config),
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+    )
+
+
+def create_async_http_client(config: Config) -> httpx.AsyncClient:
+    """
+    Create the asyncio counterpart of create_http_client.
+    Args:
+        config: Application configuration.
+    Returns:
+        A configured httpx.AsyncClient. The caller is responsible for closing it.
+    """
+    return httpx.AsyncClient(
+        **_client_options(config),
+        event_hooks={
+            "request": [_on_request_async],
+            "response": [_on_response_async],
+        },
+    )
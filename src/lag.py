@@ -0,0 +1,41 @@
+from src.metrics import CONSUMER_LAG, DELIVERY_LAG, QUEUE_WAIT_TIME
+from src.notification import Notification
+from src.notifiers.priority_mappings import normalize_priority
+
+
+def observe_pickup(
+    notification: Notification, picked_at: float, retried: bool = False
+) -> None:
+    """
+    Record how long a message waited in RabbitMQ before it was picked up.
+    Retries are skipped: their wait includes the backoff in the delay queues.
+    Args:
+        notification: The notification, with the time it was published.
+        picked_at: When the message was picked up (Unix time).
+        retried: Whether this is a retry of an earlier delivery.
+    """
+    if notification.enqueued_at is None or retried:
+        return
+    # Clamped: producer clocks may be ahead of ours
+    wait = max(0.0, picked_at - notification.enqueued_at)
+    CONSUMER_LAG.set(wait)
+    priority = normalize_priority(notification.extra.get("priority"))
+    for channel in notification.channels:
+        QUEUE_WAIT_TIME.labels(channel=channel, priority=priority).observe(wait)
+
+
+def observe_delivery(
+    notification: Notification, channel: str, delivered_at: float
+) -> None:
+    """
+    Record the time from a message being published to a channel delivering it.
+    Args:
+        notification: The notification, with the time it was published.
+        channel: The channel that delivered it.
+        delivered_at: When the delivery finished (Unix time).
+    """
+    if notification.enqueued_at is None:
+        return
+    DELIVERY_LAG.labels(
+        channel=channel, priority=normalize_priority(notification.extra.get("priority"))
+    ).observe(max(0.0, delivered_at - notification.enqueued_at))
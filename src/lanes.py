@@ -0,0 +1,173 @@
+import logging
+import time
+from typing import Any, Optional
+
+from pika import BasicProperties
+from pika.adapters.blocking_connection import BlockingChannel
+from pika.spec import Basic
+
+from src.config import Config
+from src.logging_config import setup_logging
+from src.metrics import LANE_DEPTH, LANE_LATENCY, LANE_MESSAGES
+from src.notification import InvalidMessage, decode_notification
+from src.notifiers.priority_mappings import PRIORITY_LEVELS, normalize_priority
+from src.rules import RoutingRules
+
+setup_logging()
+
+# When the message entered its lane (Unix time), for the lane latency metric
+ENQUEUED_HEADER = "x-notifiq-enqueued"
+# Lane a message was routed to
+LANE_HEADER = "x-notifiq-lane"
+
+
+class Lane:
+    """
+    One priority lane: a queue and the prefetch window it is consumed with.
+    """
+
+    __slots__ = ("level", "queue", "prefetch")
+
+    def __init__(self, level: str, queue: str, prefetch: int):
+        """
+        Args:
+            level: Lowest normalized priority routed to this lane.
+            queue: The lane's queue.
+            prefetch: Unacknowledged messages in flight from this lane.
+        """
+        self.level = level
+        self.queue = queue
+        self.prefetch = prefetch
+
+
+class PriorityLanes:
+    """
+    Splits the ingress queue into one queue per priority lane.
+
+    Messages published to the main queue are classified by their normalized
+    priority (after routing rules) and republished to their lane's queue. Each lane is consumed
+    with its own prefetch window, so a backlog of routine messages holds at
+    most its own window of in-flight slots and critical messages are picked
+    up as soon as they reach their (short) queue.
+    """
+
+    def __init__(self, queue: str, lanes: list[tuple[str, int]]):
+        """
+        Args:
+            queue: The ingress queue; lane queues are named "<queue>.lane.<level>".
+            lanes: (level, prefetch) pairs, highest priority first.
+        """
+        self.queue = queue
+        self.lanes = [
+            Lane(level, f"{queue}.lane.{level}", prefetch) for level, prefetch in lanes
+        ]
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.lanes)
+
+    def lane_for(self, priority: Optional[str]) -> Lane:
+        """
+        Get the lane of a priority: the highest lane at or below it, or the
+        lowest lane.
+        """
+        rank = PRIORITY_LEVELS.index(normalize_priority(priority))
+        for lane in self.lanes:
+            if PRIORITY_LEVELS.index(lane.level) <= rank:
+                return lane
+        return self.lanes[-1]
+
+    def classify(self, body: bytes, rules: Optional[RoutingRules] = None) -> Lane:
+        """
+        Get the lane of a message body. Bodies that are not valid notifications
+        go to the lowest lane, where they are rejected as usual.
+        Args:
+            body: Message body (JSON).
+            rules: Routing rules, which may set the priority.
+        """
+        try:
+            notification = decode_notification(body, rules)
+        except InvalidMessage:
+            return self.lanes[-1]
+        return self.lane_for(notification.extra.get("priority"))
+
+    @staticmethod
+    def lane_headers(lane: Lane, headers: Optional[dict[str, Any]]) -> dict[str, Any]:
+        """
+        Get the headers of a message republished to a lane. Existing headers
+        (e.g. the retry attempt count) are kept.
+        """
+        return {
+            **(headers or {}),
+            LANE_HEADER: lane.level,
+            ENQUEUED_HEADER: time.time(),
+        }
+
+    def setup(self, channel: BlockingChannel) -> None:
+        """
+        Declare the lane queues.
+        """
+        for lane in self.lanes:
+            channel.queue_declare(queue=lane.queue, durable=True)
+
+    def on_ingress(
+        self,
+        ch: BlockingChannel,
+        method: Basic.Deliver,
+        properties: BasicProperties,
+        body: bytes,
+        rules: Optional[RoutingRules] = None,
+    ) -> None:
+        """
+        pika callback for the ingress queue: move a message to its lane.
+
+        The channel must be in confirm mode, so the message is only acked once
+        the broker holds it in its lane.
+        """
+        lane = self.classify(body, rules)
+        try:
+            ch.basic_publish(
+                exchange="",
+                routing_key=lane.queue,
+                body=body,
+                properties=BasicProperties(
+                    content_type=properties.content_type or "application/json",
+                    delivery_mode=2,
+                    headers=self.lane_headers(lane, properties.headers),
+                    timestamp=properties.timestamp,
+                ),
+            )
+        except Exception:
+            logging.exception("Failed to move message to lane '%s'", lane.level)
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            return
+        LANE_MESSAGES.labels(lane=lane.level).inc()
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+
+    def record_depths(self, channel: BlockingChannel) -> None:
+        """
+        Export the number of messages waiting in each lane.
+        """
+        for lane in self.lanes:
+            declared = channel.queue_declare(
+                queue=lane.queue, durable=True, passive=True
+            )
+            LANE_DEPTH.labels(lane=lane.level).set(declared.method.message_count)
+
+
+def observe_lane_latency(headers: Optional[dict[str, Any]]) -> None:
+    """
+    Record how long a message took from entering its lane to being settled.
+    """
+    if not headers or ENQUEUED_HEADER not in headers:
+        return
+    LANE_LATENCY.labels(lane=headers.get(LANE_HEADER, "unknown")).observe(
+        max(0.0, time.time() - float(headers[ENQUEUED_HEADER]))
+    )
+
+
+def create_priority_lanes(config: Config) -> PriorityLanes:
+    """
+    Create the priority lanes configured by PRIORITY_LANES (disabled if empty).
+    """
+    return PriorityLanes(config.rabbitmq_queue, config.priority_lanes)
@@ -1,13 +1,87 @@
+import atexit
+import copy
 import logging
 import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 
 from pythonjsonlogger import jsonlogger
 
+# Per-message logs (dispatching, delivered, duplicate suppressed), sampled by LOG_MESSAGE_RATE
+message_logger = logging.getLogger("notifiq.messages")
+
+_listener: Optional[QueueListener] = None
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket over log records: lets through up to `rate` records per
+    second (with bursts of `burst`) and drops the rest. The next record let
+    through carries the number dropped in its "suppressed" field.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Args:
+            rate: Records per second.
+            burst: Bucket size. Defaults to the rate (at least 1).
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                return False
+            self.tokens -= 1
+            if self.suppressed:
+                record.suppressed = self.suppressed
+                self.suppressed = 0
+        return True
+
+
+class _LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves all formatting to the listener thread.
+
+    The stock prepare() formats the record on the logging thread (and drops
+    exc_info so the record can be pickled); with an in-process queue only the
+    message arguments need resolving, since they may be mutated after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
 
 def setup_logging():
     """
     Setup logging configuration.
+
+    With LOG_ASYNC=1, log calls only enqueue the record and a background
+    thread does the JSON formatting and writing. LOG_MESSAGE_RATE limits the
+    per-message logs (records per second, 0 = unlimited).
     """
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        # Already routed through the queue; replacing the handlers would drop it
+        return
     log_level = os.environ.get("VERBOSE", "0")
     level = logging.DEBUG if log_level in ("1", "true", "True") else logging.INFO
 
@@ -18,4 +92,15 @@ def setup_logging():
         "%(asctime)s %(levelname)s %(name)s %(message)s"
     )
     logHandler.setFormatter(formatter)
-    logger.handlers = [logHandler]
+
+    message_rate = float(os.environ.get("LOG_MESSAGE_RATE", 0))
+    message_logger.filters = [RateLimitFilter(message_rate)] if message_rate > 0 else []
+
+    if os.environ.get("LOG_ASYNC", "0") in ("1", "true", "True"):
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, logHandler)
+        _listener.start()
+        atexit.register(_listener.stop)
+        logger.handlers = [_LazyQueueHandler(log_queue)]
+    else:
+        logger.handlers = [logHandler]
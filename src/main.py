@@ -1,159 +1,392 @@
 import argparse
-import json
+import asyncio
+import functools
 import logging
 import signal
 import sys
 import time
-from typing import Any
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Optional, Union
 
+import httpx
 import pika
+from pika.adapters.blocking_connection import BlockingChannel
 from pika.channel import Channel
 from pika.spec import Basic, BasicProperties
-from prometheus_client import Counter, Histogram
 
+from src.circuit_breaker import (
+    CircuitBreakers,
+    create_circuit_breakers,
+    endpoint_keys,
+    is_endpoint_failure,
+)
+from src.coalesce import Coalescer
 from src.config import Config
-from src.health import start_health_server
-from src.logging_config import setup_logging
+from src.consumer import WindowedConsumer
+from src.dedup import Deduplicator, create_deduplicator
+from src.delivery import DeliveryResult
+from src.health import report_consumer_state, start_health_server
+from src.http_client import create_http_client
+from src.lag import observe_delivery, observe_pickup
+from src.lanes import PriorityLanes, create_priority_lanes, observe_lane_latency
+from src.logging_config import message_logger, setup_logging
+from src.metrics import (
+    MESSAGE_PROCESSING_TIME,
+    MESSAGES_DEDUPLICATED,
+    MESSAGES_DELIVERED,
+    MESSAGES_ERRORS,
+    MESSAGES_PICKED_UP,
+    NOTIFIER_SEND_TIME,
+    RABBITMQ_CONNECTION_FAILURES,
+    RABBITMQ_DOWNTIME,
+    RABBITMQ_RECONNECTS,
+)
+from src.notification import InvalidMessage, Notification, decode_notification
+from src.notifiers.apprise_cache import AppriseCache
 from src.notifiers.apprise_notifier import AppriseNotifier
+from src.notifiers.base import BaseNotifier, NotificationError
 from src.notifiers.mattermost_notifier import MattermostNotifier
 from src.notifiers.ntfy_direct_notifier import NtfyDirectNotifier
 from src.notifiers.pushover_direct_notifier import PushoverDirectNotifier
-from src.routing import get_target_notifiers
-
-setup_logging()
-
-# Prometheus metrics
-MESSAGES_PICKED_UP = Counter(
-    "notifiq_messages_picked_total",
-    "Total number of messages picked up from RabbitMQ.",
-    labelnames=["channel"],
-)
-MESSAGES_DELIVERED = Counter(
-    "notifiq_messages_delivered_total",
-    "Total number of messages successfully delivered.",
-    labelnames=["channel"],
-)
-MESSAGES_ERRORS = Counter(
-    "notifiq_message_errors_total",
-    "Total number of message processing or delivery errors.",
-    labelnames=["channel"],
-)
-MESSAGE_PROCESSING_TIME = Histogram(
-    "notifiq_message_processing_seconds",
-    "Time spent processing and delivering a message (seconds).",
-    labelnames=["channel"],
+from src.rate_limit import RateLimiter, rate_limit_keys
+from src.retry import (
+    RetryPlanner,
+    RetryPolicy,
+    RetryPublisher,
+    enqueued_at,
+    retry_attempts,
 )
+from src.routing import RoutingTable
+from src.rules import RulesLoader
+from src.shards import ChannelShards, create_channel_shards
+from src.spool import Spool, create_spool
+from src.supervisor import Supervisor, prepare_multiprocess_metrics
 
-start_health_server()
+setup_logging()
 
 config = Config()
 
 shutdown_requested = False
 
-notifiers = {}
-notifiers["apprise"] = AppriseNotifier(config.apprise_urls)
-if ntfy_url := config.apprise_urls.get("ntfy"):
-    notifiers["ntfy-direct"] = NtfyDirectNotifier(ntfy_url)  # type: ignore
-if mattermost_url := config.apprise_urls.get("mattermost"):
-    notifiers["mattermost"] = MattermostNotifier(mattermost_url)  # type: ignore
-
-# Initialize multiple Pushover notifiers (one per application)
-pushover_notifiers = {}
-logging.info(
-    f"Found {len(config.pushover_apps)} Pushover app(s) in config: {list(config.pushover_apps.keys())}"
-)
-for app_id, pushover_url in config.pushover_apps.items():
-    pushover_notifiers[app_id] = PushoverDirectNotifier(pushover_url)
-    logging.info(f"Initialized Pushover notifier for app: {app_id}")
+# Delivery stack, built by init() in the process that consumes: not in the
+# supervisor parent, nor in async mode (AsyncRuntime builds its own)
+dispatch_executor: Optional[ThreadPoolExecutor] = None
+shard_executors: dict[str, ThreadPoolExecutor] = {}
+rate_limiter: Optional[RateLimiter] = None
+circuit_breakers: Optional[CircuitBreakers] = None
+retry_planner: Optional[RetryPlanner] = None
+retry_publisher: Optional[RetryPublisher] = None
+priority_lanes: Optional[PriorityLanes] = None
+channel_shards: Optional[ChannelShards] = None
+spool: Optional[Spool] = None
+deduplicator: Optional[Deduplicator] = None
+coalescer: Optional[Coalescer] = None
+http_client: Optional[httpx.Client] = None
+apprise_cache: Optional[AppriseCache] = None
+notifiers: dict[str, BaseNotifier] = {}
+pushover_notifiers: dict[str, BaseNotifier] = {}
+routing_table: Optional[RoutingTable[BaseNotifier]] = None
+rules_loader: Optional[RulesLoader] = None
+
+
+def init() -> None:
+    """
+    Build the delivery stack: thread pool, HTTP client, notifiers, routing,
+    spool and the optional retry, dedup and coalescing stages.
+    """
+    # pylint: disable=global-statement
+    global dispatch_executor, rate_limiter, circuit_breakers, retry_planner
+    global retry_publisher, priority_lanes, channel_shards, spool, deduplicator
+    global coalescer, http_client, apprise_cache, routing_table, rules_loader
+
+    # Shared pool used to fan a message out to all of its notifiers at once
+    dispatch_executor = ThreadPoolExecutor(
+        max_workers=config.dispatch_max_workers, thread_name_prefix="notifiq-dispatch"
+    )
+
+    # Token buckets per provider / Pushover app / ntfy topic
+    rate_limiter = RateLimiter(config.rate_limits)
+
+    # Circuit breakers per endpoint, so a dead provider fails fast
+    circuit_breakers = create_circuit_breakers(config)
+
+    # Per-priority lane queues, consumed with separate prefetch windows (disabled if empty)
+    priority_lanes = create_priority_lanes(config)
+
+    # Per-channel shard queues, each with its own consumer pool (disabled if empty)
+    channel_shards = create_channel_shards(config)
+
+    # Sharded channels also send on a pool of their own, so a slow shard
+    # cannot starve the others of dispatch workers
+    shard_executors.clear()
+    for shard in channel_shards.by_channel.values():
+        shard_executors[shard.name] = ThreadPoolExecutor(
+            max_workers=config.dispatch_max_workers,
+            thread_name_prefix=f"notifiq-dispatch-{shard.name}",
+        )
+
+    # Durable outbox for deliveries to unreachable providers (None when disabled)
+    spool = create_spool(config)
+
+    # Suppresses repeated notifications (None when disabled)
+    deduplicator = create_deduplicator(config)
 
-# For backward compatibility: if only one Pushover app exists, register it as "pushover-direct"
-if len(pushover_notifiers) == 1:
-    notifiers["pushover-direct"] = list(pushover_notifiers.values())[0]
+    # Merges bursts of similar notifications into digests (None when disabled)
+    coalescer = (
+        Coalescer(
+            lambda notification, start_time: dispatch_notification(
+                notification, start_time
+            ),
+            window=config.coalesce_window,
+            max_batch=config.coalesce_max_batch,
+            max_lines=config.coalesce_max_lines,
+        )
+        if config.coalesce_window > 0
+        else None
+    )
+
+    # Pooled keep-alive HTTP client shared by the direct notifiers
+    http_client = create_http_client(config)
+
+    # Instantiated Apprise plugins, shared by the Apprise-based notifiers
+    apprise_cache = AppriseCache(
+        max_size=config.apprise_cache_size, ttl=config.apprise_cache_ttl
+    )
+
+    notifiers.clear()
+    notifiers["apprise"] = AppriseNotifier(config.apprise_urls, cache=apprise_cache)
+    if ntfy_url := config.apprise_urls.get("ntfy"):
+        notifiers["ntfy-direct"] = NtfyDirectNotifier(ntfy_url, client=http_client)
+    if mattermost_url := config.apprise_urls.get("mattermost"):
+        notifiers["mattermost"] = MattermostNotifier(
+            mattermost_url, cache=apprise_cache
+        )
+
+    # Initialize multiple Pushover notifiers (one per application)
+    pushover_notifiers.clear()
     logging.info(
-        "Single Pushover app detected, registered as 'pushover-direct' for backward compatibility"
+        f"Found {len(config.pushover_apps)} Pushover app(s) in config: {list(config.pushover_apps.keys())}"
+    )
+    for app_id, pushover_url in config.pushover_apps.items():
+        pushover_notifiers[app_id] = PushoverDirectNotifier(
+            pushover_url, client=http_client
+        )
+        logging.info(f"Initialized Pushover notifier for app: {app_id}")
+
+    # For backward compatibility: if only one Pushover app exists, register it as "pushover-direct"
+    if len(pushover_notifiers) == 1:
+        notifiers["pushover-direct"] = list(pushover_notifiers.values())[0]
+        logging.info(
+            "Single Pushover app detected, registered as 'pushover-direct' for backward compatibility"
+        )
+
+    # Channel -> notifier routes, compiled once, and routing rules (hot reloaded)
+    routing_table = RoutingTable(notifiers, pushover_notifiers, config.apprise_urls)
+    rules_loader = RulesLoader(
+        config.rules_file, config.routing_rules, config.rules_reload_interval
     )
 
+    # Retries and dead-lettering of failed deliveries (None when disabled)
+    retry_planner = RetryPlanner(config, rules_loader)
+    retry_publisher = RetryPublisher(retry_planner) if retry_planner.enabled else None
+
 
-def dispatch_notification(title: str, message: str, channels: list[str], **kwargs):
+def _send_timed(
+    notifier: BaseNotifier,
+    notification: Notification,
+    channels: list[str],
+) -> float:
     """
-    Dispatch a notification to the appropriate notifier(s).
-    Args:
-        title: Notification title
-        message: Notification message
-        channels: List of channels to notify
-        kwargs: Extra arguments for dynamic routing (e.g., ntfy_topic, mattermost_channel, priority, pushover_app)
-    """
-    # For Prometheus timing
-    prom_start_time = kwargs.pop("_prom_start_time", None)
-    apprise_channels = []
-    ntfy_direct_needed = False
-    mattermost_needed = False
-    pushover_direct_needed = False
+    Run a single notifier send and return the wall clock time it finished at.
+    Fails fast if an endpoint's circuit is open. Rate limit tokens have
+    already been waited for (see RateLimiter.submit).
+    """
+    breakers = circuit_breakers.allow(
+        endpoint_keys(channels, routing_table.pushover_app(notification.extra))
+    )
+    started = time.perf_counter()
     try:
+        notifier.send(notification, channels)
+    except Exception as e:
+        circuit_breakers.record(breakers, not is_endpoint_failure(e))
+        raise
+    finally:
         for channel in channels:
-            if channel == "mattermost":
-                mattermost_needed = True
-            elif channel == "ntfy-direct":
-                ntfy_direct_needed = True
-            elif channel == "pushover-direct":
-                pushover_direct_needed = True
-            else:
-                apprise_channels.append(channel)
-        if apprise_channels:
-            notifiers["apprise"].send(title, message, apprise_channels, **kwargs)
-        if mattermost_needed and "mattermost" in notifiers:
-            notifiers["mattermost"].send(title, message, ["mattermost"], **kwargs)
-        if ntfy_direct_needed and "ntfy-direct" in notifiers:
-            notifiers["ntfy-direct"].send(title, message, ["ntfy-direct"], **kwargs)
-        if pushover_direct_needed:
-            # Route to specific Pushover app if pushover_app is specified
-            pushover_app = kwargs.get("pushover_app")
-            logging.info(
-                f"Pushover routing: pushover_app={pushover_app}, available_apps={list(pushover_notifiers.keys())}, has_default={'pushover-direct' in notifiers}"
+            NOTIFIER_SEND_TIME.labels(channel=channel).observe(
+                time.perf_counter() - started
             )
-            if pushover_app and pushover_app in pushover_notifiers:
-                # Use the specified Pushover app
-                pushover_notifiers[pushover_app].send(
-                    title, message, ["pushover-direct"], **kwargs
-                )
-                logging.info(f"Sent to Pushover app: {pushover_app}")
-            elif "pushover-direct" in notifiers:
-                # Fall back to single/default notifier for backward compatibility
-                logging.info("Using backward-compatible 'pushover-direct' notifier")
-                notifiers["pushover-direct"].send(
-                    title, message, ["pushover-direct"], **kwargs
-                )
-            elif pushover_notifiers:
-                # If multiple apps exist but no app specified, prefer "default" (from APPRISE_PUSHOVER_URL)
-                if "default" in pushover_notifiers:
-                    logging.warning(
-                        "No pushover_app specified, using 'default' app from APPRISE_PUSHOVER_URL"
-                    )
-                    pushover_notifiers["default"].send(
-                        title, message, ["pushover-direct"], **kwargs
-                    )
-                else:
-                    # Fall back to first app if no default exists
-                    default_app = next(iter(pushover_notifiers))
-                    pushover_notifiers[default_app].send(
-                        title, message, ["pushover-direct"], **kwargs
-                    )
-                    logging.warning(
-                        f"No pushover_app specified and no 'default' app found, using: {default_app}"
-                    )
-            else:
-                logging.error("Pushover requested but no Pushover notifiers configured")
+    circuit_breakers.record(breakers, True)
+    return time.time()
+
+
+def dispatch_pool(channel: str) -> ThreadPoolExecutor:
+    """
+    Get the pool a channel is sent on: its shard's, or the shared dispatch pool.
+    """
+    return shard_executors.get(channel, dispatch_executor)
+
+
+def dispatch_notification(
+    notification: Notification, start_time: Optional[float] = None
+) -> DeliveryResult:
+    """
+    Deliver a notification, through the spool if SPOOL_PATH is set: it is
+    recorded before the send and failed channels are left for the drainer.
+    Args:
+        notification: The notification.
+        start_time: When the message was picked up, for the processing time metric.
+    Returns:
+        The delivery result. Channels kept in the spool count as delivered.
+    """
+    if spool is None:
+        return deliver_notification(notification, start_time)
+    entry_id = spool.add(notification)
+    return spool.settle(
+        entry_id, notification, deliver_notification(notification, start_time)
+    )
+
+
+def deliver_notification(
+    notification: Notification, start_time: Optional[float] = None
+) -> DeliveryResult:
+    """
+    Send a notification to the appropriate notifier(s).
+
+    All target notifiers are sent to concurrently on the dispatch thread pool
+    (or their channel shard's pool, see dispatch_pool) and the call waits for
+    every result, bounded by DISPATCH_TIMEOUT. Channels that miss the deadline
+    are counted as failed, but a send that has started cannot be cancelled and
+    keeps its pool worker until it returns; the HTTP timeouts of the direct
+    notifiers (HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT) are capped at
+    DISPATCH_TIMEOUT so such sends are bounded too.
+    Args:
+        notification: The notification. Its extra fields drive dynamic routing
+            (e.g., ntfy_topic, mattermost_channel, priority, pushover_app)
+        start_time: When the message was picked up, for the processing time metric.
+    Returns:
+        The delivery result, with the channels that could not be delivered.
+    """
+    channels = notification.channels
+    try:
+        targets, failed = routing_table.resolve(channels, notification.extra)
+    except Exception:
         for channel in channels:
+            MESSAGES_ERRORS.labels(channel=channel).inc()
+        logging.exception("Error routing notification")
+        return DeliveryResult(channels, failed=list(channels))
+    for channel in failed:
+        logging.warning("No notifier configured for channel '%s'", channel)
+
+    retry_after = None
+    # Sends waiting for rate limit tokens do not hold a pool worker
+    futures = {
+        rate_limiter.submit(
+            dispatch_pool(target_channels[0]),
+            rate_limit_keys(
+                target_channels,
+                notification.extra,
+                routing_table.pushover_app(notification.extra),
+            ),
+            config.dispatch_timeout,
+            _send_timed,
+            notifier,
+            notification,
+            target_channels,
+        ): target_channels
+        for notifier, target_channels in targets
+    }
+    done, not_done = wait(futures, timeout=config.dispatch_timeout)
+    for future in not_done:
+        future.cancel()
+        failed.extend(futures[future])
+        logging.error(
+            "Delivery to %s did not finish within %ss",
+            futures[future],
+            config.dispatch_timeout,
+        )
+    for future in done:
+        target_channels = futures[future]
+        try:
+            finished_at = future.result()
+        except Exception as e:
+            failed.extend(target_channels)
+            if isinstance(e, NotificationError) and e.retry_after:
+                retry_after = max(retry_after or 0, e.retry_after)
+            logging.exception("Error delivering notification to %s", target_channels)
+            continue
+        for channel in target_channels:
             MESSAGES_DELIVERED.labels(channel=channel).inc()
-        if prom_start_time is not None:
-            for channel in channels:
+            observe_delivery(notification, channel, finished_at)
+            if start_time is not None:
                 MESSAGE_PROCESSING_TIME.labels(channel=channel).observe(
-                    time.time() - prom_start_time
+                    finished_at - start_time
+                )
+    for channel in failed:
+        MESSAGES_ERRORS.labels(channel=channel).inc()
+    return DeliveryResult(channels, failed=failed, retry_after=retry_after)
+
+
+def process_message(
+    body: bytes,
+    timestamp: Optional[float] = None,
+    headers: Optional[dict[str, Any]] = None,
+) -> Union[DeliveryResult, "Future[DeliveryResult]"]:
+    """
+    Decode a RabbitMQ message body and dispatch it.
+    Args:
+        body: Message body
+        timestamp: The message's AMQP timestamp property, for lag metrics
+        headers: The message's AMQP headers (retry attempts and first publish time)
+    Returns:
+        The delivery result. Messages that cannot be decoded are marked invalid.
+        With coalescing enabled, a future resolving to the result of the
+        digest the message was sent in.
+    """
+    start_time = time.time()
+    channels = ["unknown"]
+    try:
+        notification = decode_notification(
+            body, rules_loader.current, enqueued_at(headers, timestamp)
+        )
+    except InvalidMessage as e:
+        MESSAGES_ERRORS.labels(channel="unknown").inc()
+        logging.warning("Rejected invalid message: %s", e)
+        return DeliveryResult(channels, invalid=True)
+    try:
+        channels = notification.channels
+        title = notification.title
+        # Increment picked up for each channel
+        for channel in channels:
+            MESSAGES_PICKED_UP.labels(channel=channel).inc()
+        observe_pickup(notification, start_time, retried=retry_attempts(headers) > 0)
+        dedup_key = None
+        if deduplicator is not None:
+            dedup_key = Deduplicator.key(notification)
+            if deduplicator.is_duplicate(dedup_key):
+                for channel in channels:
+                    MESSAGES_DEDUPLICATED.labels(channel=channel).inc()
+                message_logger.info("Suppressed duplicate '%s' for %s", title, channels)
+                return DeliveryResult(channels)
+        message_logger.info(
+            "Dispatching '%s' to %s: %s", title, channels, notification.message
+        )
+        if coalescer is not None:
+            result = coalescer.add(notification, start_time)
+        else:
+            result = dispatch_notification(notification, start_time)
+        if deduplicator is not None:
+            if isinstance(result, Future):
+                result.add_done_callback(
+                    lambda done: deduplicator.forget_if_failed(dedup_key, done.result())
                 )
+            else:
+                deduplicator.forget_if_failed(dedup_key, result)
+        return result
     except Exception:
-        for channel in channels if "channels" in locals() else ["unknown"]:
+        for channel in channels:
             MESSAGES_ERRORS.labels(channel=channel).inc()
-        logging.exception("Error delivering notification")
+        logging.exception("Failed to process message")
+        return DeliveryResult(channels, invalid=True)
 
 
 # It is standard practice to include the unused arguments in the callback even if they are not used
@@ -162,7 +395,7 @@ def callback(
     method: Basic.Deliver,
     properties: BasicProperties,
     body: bytes,
-):  # sourcery skip: extract-method
+):
     """
     Callback function for RabbitMQ message processing.
     Args:
@@ -171,27 +404,42 @@ def callback(
         properties: RabbitMQ properties
         body: Message body
     """
-    start_time = time.time()
-    try:
-        msg = json.loads(body)
-        title = msg.get("title", "Notification")
-        message = msg.get("message", str(msg))
-        channels = get_target_notifiers(msg)
-        # Pass all extra fields for dynamic routing (e.g., ntfy_topic, mattermost_channel)
-        extra = {
-            k: v for k, v in msg.items() if k not in {"title", "message", "channels"}
-        }
-        logging.info(f"Dispatching '{title}' to {channels}: {message}")
-        # Increment picked up for each channel
-        for channel in channels:
-            MESSAGES_PICKED_UP.labels(channel=channel).inc()
-        dispatch_notification(
-            title, message, channels, **extra, _prom_start_time=start_time
+    result = process_message(body, properties.timestamp, properties.headers)
+    if isinstance(result, Future):
+        # Coalesced: finish on the connection thread once the digest is sent
+        connection = ch.connection
+        result.add_done_callback(
+            lambda done: connection.add_callback_threadsafe(
+                functools.partial(schedule_retry, ch, properties, body, done.result())
+            )
         )
-    except Exception:
-        for channel in channels if "channels" in locals() else ["unknown"]:
-            MESSAGES_ERRORS.labels(channel=channel).inc()
-        logging.exception("Failed to process message")
+    else:
+        schedule_retry(ch, properties, body, result)
+
+
+def schedule_retry(
+    ch: Channel, properties: BasicProperties, body: bytes, result: DeliveryResult
+) -> None:
+    """
+    Publish the retries and dead letters of a message consumed with auto-ack.
+    """
+    if not result.delivered and retry_publisher is not None and ch.is_open:
+        try:
+            retry_publisher.publish(ch, config.rabbitmq_queue, body, properties, result)
+        except Exception:
+            logging.exception("Failed to schedule retry, the delivery is lost")
+
+
+def close_notifiers() -> None:
+    """
+    Close all notifiers and the shared HTTP client.
+    """
+    for notifier in {*notifiers.values(), *pushover_notifiers.values()}:
+        try:
+            notifier.close()
+        except Exception as e:
+            logging.warning(f"Error closing notifier {notifier!r}: {e}")
+    http_client.close()
 
 
 def handle_shutdown(signum: int, frame: Any) -> None:
@@ -200,17 +448,29 @@ def handle_shutdown(signum: int, frame: Any) -> None:
     shutdown_requested = True
 
 
-def version():
+def parse_args() -> argparse.Namespace:
     """
-    Print the version of the application.
+    Parse command line arguments.
     """
     parser = argparse.ArgumentParser(
-        description="Print the version of the application."
+        description="Consume notifications from RabbitMQ and dispatch them."
     )
     parser.add_argument(
         "--version", action="store_true", help="Print the version of the application."
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=config.workers,
+        help="Number of consumer processes to run under a supervisor (default: NOTIFIQ_WORKERS or 1).",
+    )
+    return parser.parse_args()
+
+
+def version(args: argparse.Namespace):
+    """
+    Print the version of the application.
+    """
     if args.version:
         try:
             try:
@@ -234,47 +494,308 @@ def version():
         sys.exit(0)
 
 
-def main():
+def run_consumer() -> None:
     """
-    Main entry point for the application.
+    Consume and dispatch messages until a shutdown signal is received.
+
+    This is the body of a single notifiq process; in --workers mode the
+    supervisor runs it in each worker process.
     """
-    version()
-    credentials = pika.PlainCredentials(config.rabbitmq_user, config.rabbitmq_pass)
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters(
-            host=config.rabbitmq_host,
-            port=config.rabbitmq_port,
-            virtual_host=getattr(config, "rabbitmq_vhost", "/"),
-            credentials=credentials,
+    # Register signal handlers
+    signal.signal(signal.SIGTERM, handle_shutdown)
+    signal.signal(signal.SIGINT, handle_shutdown)
+
+    if config.runtime == "async":
+        # AsyncRuntime builds its own delivery stack; init() is not needed
+        from src.async_runtime import (  # pylint: disable=import-outside-toplevel
+            run_async,
         )
+
+        try:
+            asyncio.run(run_async(config))
+        except Exception as e:
+            logging.error(f"Error in async consumer loop: {e}")
+        finally:
+            logging.info("Shutdown complete.")
+        return
+    init()
+    rules_loader.start()
+    if spool is not None:
+        spool.start(deliver_notification)
+    # Delay between connection attempts: exponential backoff with jitter
+    backoff = RetryPolicy(
+        0, config.rabbitmq_reconnect_delay, config.rabbitmq_reconnect_max_delay
+    )
+    failures = 0
+    # Set while a connection that was up is lost, for the downtime metric
+    disconnected_at = None
+    try:
+        while not shutdown_requested:
+            try:
+                connection = connect_rabbitmq()
+            except (pika.exceptions.AMQPConnectionError, OSError) as e:
+                # OSError: e.g. socket.gaierror while the broker's DNS name is unresolvable
+                failures += 1
+                RABBITMQ_CONNECTION_FAILURES.inc()
+                delay = backoff.delay(failures)
+                logging.warning(
+                    f"Could not connect to RabbitMQ ({e!r}), retrying in {delay:.1f}s"
+                )
+                wait_unless_shutdown(delay)
+                continue
+            if disconnected_at is not None:
+                downtime = time.monotonic() - disconnected_at
+                RABBITMQ_RECONNECTS.inc()
+                RABBITMQ_DOWNTIME.inc(downtime)
+                logging.info(f"Reconnected to RabbitMQ after {downtime:.1f}s")
+            failures = 0
+            disconnected_at = None
+            try:
+                consume(connection)
+            except pika.exceptions.AMQPError as e:
+                # Broker restart, network blip, closed channel: reconnect in-process
+                disconnected_at = time.monotonic()
+                logging.error(f"Lost connection to RabbitMQ: {e!r}")
+    except Exception as e:
+        logging.error(f"Error in consumer loop: {e}")
+    finally:
+        report_consumer_state(False)
+        if coalescer is not None:
+            # Stopped while disconnected: still send the held digests
+            coalescer.close()
+        if spool is not None:
+            spool.close()
+        rules_loader.stop()
+        rate_limiter.close()
+        for executor in [*shard_executors.values(), dispatch_executor]:
+            executor.shutdown(wait=True, cancel_futures=True)
+        close_notifiers()
+        logging.info("Shutdown complete.")
+
+
+def connect_rabbitmq() -> pika.BlockingConnection:
+    """
+    Connect to the first reachable RabbitMQ host, in RABBITMQ_HOST order.
+    Raises:
+        pika.exceptions.AMQPConnectionError: If no host could be reached.
+        OSError: If a host name cannot be resolved.
+    """
+    credentials = pika.PlainCredentials(config.rabbitmq_user, config.rabbitmq_pass)
+    return pika.BlockingConnection(
+        [
+            pika.ConnectionParameters(
+                host=host,
+                port=port,
+                virtual_host=getattr(config, "rabbitmq_vhost", "/"),
+                credentials=credentials,
+                connection_attempts=1,
+            )
+            for host, port in config.rabbitmq_hosts
+        ]
     )
+
+
+def wait_unless_shutdown(seconds: float) -> None:
+    """
+    Sleep, returning early if a shutdown signal is received.
+    """
+    deadline = time.monotonic() + seconds
+    while not shutdown_requested and (remaining := deadline - time.monotonic()) > 0:
+        time.sleep(min(remaining, 0.5))
+
+
+def start_ingress(
+    connection: pika.BlockingConnection, callback: Any
+) -> BlockingChannel:
+    """
+    Consume the main queue on a channel of its own, to move messages to their
+    lane or shard queues. Publisher confirms make each ack wait until the
+    broker holds the republished message.
+    Args:
+        connection: The RabbitMQ connection.
+        callback: pika callback that republishes and acks a message.
+    Returns:
+        The ingress channel.
+    """
+    ingress_channel = connection.channel()
+    ingress_channel.confirm_delivery()
+    ingress_channel.basic_qos(prefetch_count=config.rabbitmq_prefetch_count)
+    ingress_channel.basic_consume(
+        queue=config.rabbitmq_queue, on_message_callback=callback, auto_ack=False
+    )
+    return ingress_channel
+
+
+def start_windowed_consumer(
+    connection: pika.BlockingConnection,
+    channel: BlockingChannel,
+    queue: str,
+    workers: int,
+    prefetch_count: int,
+    lanes: Optional[list[tuple[str, int]]] = None,
+) -> WindowedConsumer:
+    """
+    Start a windowed consumer: several messages in flight, acked after delivery.
+    """
+    windowed_consumer = WindowedConsumer(
+        connection,
+        channel,
+        process_message,
+        workers=workers,
+        requeue_on_failure=config.rabbitmq_requeue_on_failure,
+        retry_publisher=retry_publisher,
+        on_settled=lambda properties: observe_lane_latency(properties.headers),
+    )
+    windowed_consumer.start(queue, prefetch_count=prefetch_count, lanes=lanes)
+    logging.info(
+        "Using %d worker(s) with a prefetch window of %d on queue '%s'",
+        workers,
+        prefetch_count,
+        queue,
+    )
+    return windowed_consumer
+
+
+def consume(connection: pika.BlockingConnection) -> None:
+    """
+    Declare the topology and consume on a connection until shutdown.
+    Args:
+        connection: A new connection to RabbitMQ.
+    Raises:
+        pika.exceptions.AMQPError: If the connection or channel is lost.
+    """
     channel = connection.channel()
     channel.queue_declare(queue=config.rabbitmq_queue, durable=True)
-    channel.basic_qos(prefetch_count=1)
-    channel.basic_consume(
-        queue=config.rabbitmq_queue, on_message_callback=callback, auto_ack=True
-    )
+    if retry_publisher is not None:
+        retry_publisher.setup(channel)
+    windowed_consumers: list[WindowedConsumer] = []
+    ingress_channel = None
+    ingress: Optional[Union[PriorityLanes, ChannelShards]] = None
+    if channel_shards.enabled:
+        if priority_lanes.enabled:
+            logging.warning(
+                "PRIORITY_LANES cannot be combined with CHANNEL_SHARDS, ignoring it"
+            )
+        ingress = channel_shards
+        channel_shards.setup(channel)
+        ingress_channel = start_ingress(
+            connection,
+            lambda ch, method, properties, body: channel_shards.on_ingress(
+                ch, method, properties, body, rules_loader.current
+            ),
+        )
+        for shard in channel_shards.shards:
+            # A channel per shard, so each pool's acks and retries are independent
+            shard_channel = connection.channel()
+            if retry_publisher is not None:
+                retry_publisher.setup(shard_channel)
+            windowed_consumers.append(
+                start_windowed_consumer(
+                    connection,
+                    shard_channel,
+                    shard.queue,
+                    workers=shard.workers,
+                    prefetch_count=shard.prefetch,
+                )
+            )
+    elif config.consumer_workers > 0:
+        lanes = None
+        if priority_lanes.enabled:
+            ingress = priority_lanes
+            priority_lanes.setup(channel)
+            ingress_channel = start_ingress(
+                connection,
+                lambda ch, method, properties, body: priority_lanes.on_ingress(
+                    ch, method, properties, body, rules_loader.current
+                ),
+            )
+            lanes = [(lane.queue, lane.prefetch) for lane in priority_lanes.lanes]
+        windowed_consumers.append(
+            start_windowed_consumer(
+                connection,
+                channel,
+                config.rabbitmq_queue,
+                workers=config.consumer_workers,
+                prefetch_count=config.rabbitmq_prefetch_count,
+                lanes=lanes,
+            )
+        )
+    else:
+        if priority_lanes.enabled:
+            logging.warning("PRIORITY_LANES requires CONSUMER_WORKERS > 0, ignoring it")
+        channel.basic_qos(prefetch_count=1)
+        channel.basic_consume(
+            queue=config.rabbitmq_queue, on_message_callback=callback, auto_ack=True
+        )
     logging.info(f"Listening for messages on queue '{config.rabbitmq_queue}'...")
 
-    # Register signal handlers
-    signal.signal(signal.SIGTERM, handle_shutdown)
-    signal.signal(signal.SIGINT, handle_shutdown)
-
     try:
+        consuming_channel = ingress_channel or channel
+        depths_recorded = 0.0
         while not shutdown_requested:
+            report_consumer_state(
+                consuming_channel.is_open and bool(consuming_channel.consumer_tags)
+            )
+            if (
+                ingress is not None
+                and ingress_channel is not None
+                and time.monotonic() - depths_recorded >= config.lane_depth_interval
+            ):
+                ingress.record_depths(ingress_channel)
+                depths_recorded = time.monotonic()
             connection.process_data_events(time_limit=1)
-    except Exception as e:
-        logging.error(f"Error in consumer loop: {e}")
     finally:
+        report_consumer_state(False)
         try:
+            if ingress_channel is not None and ingress_channel.is_open:
+                # Stop taking new messages before draining the lanes or shards
+                ingress_channel.close()
+            for windowed_consumer in windowed_consumers:
+                # Unacked messages are redelivered by the broker if the connection is gone
+                windowed_consumer.stop()
+            if coalescer is not None and shutdown_requested:
+                # Send held digests, then flush the acks they complete
+                coalescer.close()
+                if connection.is_open:
+                    connection.process_data_events(time_limit=0)
+            for windowed_consumer in windowed_consumers:
+                if windowed_consumer.channel.is_open:
+                    windowed_consumer.channel.close()
             if channel.is_open:
                 channel.close()
             if connection.is_open:
                 connection.close()
         except Exception as e:
             logging.warning(f"Error closing RabbitMQ connection: {e}")
-        logging.info("Shutdown complete.")
-        sys.exit(0)
+
+
+def main():
+    """
+    Main entry point for the application.
+    """
+    args = parse_args()
+    version(args)
+    if args.workers > 1:
+        # Must be set before the workers import prometheus_client
+        prepare_multiprocess_metrics()
+    start_health_server(
+        config.health_port,
+        config.metrics_port,
+        readiness_ttl=config.readiness_cache_ttl,
+        readiness_max_staleness=config.readiness_max_staleness,
+    )
+    if args.workers > 1:
+        signal.signal(signal.SIGTERM, handle_shutdown)
+        signal.signal(signal.SIGINT, handle_shutdown)
+        Supervisor(
+            workers=args.workers,
+            target=run_consumer,
+            should_stop=lambda: shutdown_requested,
+            shutdown_timeout=config.worker_shutdown_timeout,
+        ).run()
+    else:
+        run_consumer()
+    sys.exit(0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,240 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+MESSAGES_PICKED_UP = Counter(
+    "notifiq_messages_picked_total",
+    "Total number of messages picked up from RabbitMQ.",
+    labelnames=["channel"],
+)
+MESSAGES_DELIVERED = Counter(
+    "notifiq_messages_delivered_total",
+    "Total number of messages successfully delivered.",
+    labelnames=["channel"],
+)
+MESSAGES_ERRORS = Counter(
+    "notifiq_message_errors_total",
+    "Total number of message processing or delivery errors.",
+    labelnames=["channel"],
+)
+MESSAGE_PROCESSING_TIME = Histogram(
+    "notifiq_message_processing_seconds",
+    "Time spent processing and delivering a message (seconds).",
+    labelnames=["channel"],
+)
+LAG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+QUEUE_WAIT_TIME = Histogram(
+    "notifiq_queue_wait_seconds",
+    "Time from a message being published to being picked up (seconds).",
+    labelnames=["channel", "priority"],
+    buckets=LAG_BUCKETS,
+)
+DELIVERY_LAG = Histogram(
+    "notifiq_delivery_lag_seconds",
+    "Time from a message being published to being delivered (seconds).",
+    labelnames=["channel", "priority"],
+    buckets=LAG_BUCKETS,
+)
+CONSUMER_LAG = Gauge(
+    "notifiq_consumer_lag_seconds",
+    "Queue wait of the last message picked up (seconds).",
+    multiprocess_mode="livemax",
+)
+NOTIFIER_SEND_TIME = Histogram(
+    "notifiq_notifier_send_seconds",
+    "Time spent in a single notifier send, excluding queueing and rate limiting (seconds).",
+    labelnames=["channel"],
+)
+
+HTTP_CONNECT_TIME = Histogram(
+    "notifiq_http_connect_seconds",
+    "Time to open a new connection to a provider, including TLS (seconds).",
+    labelnames=["provider", "host"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+HTTP_TTFB = Histogram(
+    "notifiq_http_ttfb_seconds",
+    "Time from sending a request to receiving the response headers (seconds).",
+    labelnames=["provider", "host"],
+)
+HTTP_REQUEST_TIME = Histogram(
+    "notifiq_http_request_seconds",
+    "Total time of a provider request, including connecting and reading the body (seconds).",
+    labelnames=["provider", "host"],
+)
+HTTP_RESPONSES = Counter(
+    "notifiq_http_responses_total",
+    "Provider responses by status class (2xx, 4xx, 5xx, ...; error = no response).",
+    labelnames=["provider", "host", "status_class"],
+)
+HTTP_BYTES_SENT = Counter(
+    "notifiq_http_bytes_sent_total",
+    "Request body bytes sent to providers.",
+    labelnames=["provider", "host"],
+)
+
+RETRIES_SCHEDULED = Counter(
+    "notifiq_retries_scheduled_total",
+    "Total number of deliveries scheduled for a delayed retry.",
+    labelnames=["channel"],
+)
+MESSAGES_DEAD_LETTERED = Counter(
+    "notifiq_messages_dead_lettered_total",
+    "Total number of deliveries published to the dead-letter queue.",
+    labelnames=["channel"],
+)
+MESSAGES_DEDUPLICATED = Counter(
+    "notifiq_messages_deduplicated_total",
+    "Total number of duplicate messages suppressed.",
+    labelnames=["channel"],
+)
+MESSAGES_COALESCED = Counter(
+    "notifiq_messages_coalesced_total",
+    "Total number of messages merged into digest notifications.",
+    labelnames=["channel"],
+)
+DIGESTS_SENT = Counter(
+    "notifiq_digests_sent_total",
+    "Total number of digest notifications sent.",
+    labelnames=["channel"],
+)
+
+CONSUMER_CONNECTED = Gauge(
+    "notifiq_consumer_connected",
+    "Whether the consumer has an open channel consuming from RabbitMQ (1) or not (0).",
+    multiprocess_mode="livemax",
+)
+CONSUMER_HEARTBEAT = Gauge(
+    "notifiq_consumer_heartbeat_timestamp_seconds",
+    "Unix time of the consumer loop's last iteration.",
+    multiprocess_mode="livemax",
+)
+LANE_MESSAGES = Counter(
+    "notifiq_lane_messages_total",
+    "Total number of messages routed to each priority lane.",
+    labelnames=["lane"],
+)
+LANE_DEPTH = Gauge(
+    "notifiq_lane_depth",
+    "Messages waiting in each priority lane's queue.",
+    labelnames=["lane"],
+    multiprocess_mode="livemax",
+)
+LANE_LATENCY = Histogram(
+    "notifiq_lane_latency_seconds",
+    "Time from a message entering its priority lane to being settled (seconds).",
+    labelnames=["lane"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+
+SHARD_MESSAGES = Counter(
+    "notifiq_shard_messages_total",
+    "Total number of messages routed to each channel shard.",
+    labelnames=["shard"],
+)
+SHARD_DEPTH = Gauge(
+    "notifiq_shard_depth",
+    "Messages waiting in each channel shard's queue.",
+    labelnames=["shard"],
+    multiprocess_mode="livemax",
+)
+
+SPOOLED = Counter(
+    "notifiq_spooled_total",
+    "Total number of failed deliveries written to the spool for replay.",
+    labelnames=["channel"],
+)
+SPOOL_REPLAYED = Counter(
+    "notifiq_spool_replayed_total",
+    "Total number of spooled deliveries replayed successfully.",
+    labelnames=["channel"],
+)
+SPOOL_DROPPED = Counter(
+    "notifiq_spool_dropped_total",
+    "Total number of spooled deliveries dropped after SPOOL_MAX_AGE.",
+    labelnames=["channel"],
+)
+SPOOL_REJECTED = Counter(
+    "notifiq_spool_rejected_total",
+    "Total number of deliveries that could not be spooled (e.g. spool full).",
+)
+SPOOL_DEPTH = Gauge(
+    "notifiq_spool_depth",
+    "Deliveries waiting in the spool.",
+    multiprocess_mode="livemax",
+)
+
+RABBITMQ_RECONNECTS = Counter(
+    "notifiq_rabbitmq_reconnects_total",
+    "Total number of times the consumer reconnected to RabbitMQ after losing it.",
+)
+RABBITMQ_CONNECTION_FAILURES = Counter(
+    "notifiq_rabbitmq_connection_failures_total",
+    "Total number of failed attempts to connect to RabbitMQ (all hosts tried).",
+)
+RABBITMQ_DOWNTIME = Counter(
+    "notifiq_rabbitmq_downtime_seconds_total",
+    "Total time spent disconnected from RabbitMQ before reconnecting (seconds).",
+)
+
+APPRISE_CACHE_HITS = Counter(
+    "notifiq_apprise_cache_hits_total",
+    "Total number of Apprise plugin lookups served from the cache.",
+)
+APPRISE_CACHE_MISSES = Counter(
+    "notifiq_apprise_cache_misses_total",
+    "Total number of Apprise plugin lookups that had to instantiate a plugin.",
+)
+APPRISE_CACHE_EVICTIONS = Counter(
+    "notifiq_apprise_cache_evictions_total",
+    "Total number of Apprise plugins evicted from the cache.",
+    labelnames=["reason"],
+)
+APPRISE_CACHE_SIZE = Gauge(
+    "notifiq_apprise_cache_size",
+    "Number of Apprise plugins currently cached.",
+    multiprocess_mode="livesum",
+)
+
+RATE_LIMIT_TOKENS = Gauge(
+    "notifiq_rate_limit_tokens",
+    "Tokens currently available in a rate limit bucket (negative while sends are queued).",
+    labelnames=["bucket"],
+    multiprocess_mode="liveall",
+)
+RATE_LIMIT_DELAYED = Counter(
+    "notifiq_rate_limit_delayed_total",
+    "Total number of sends delayed to stay within a rate limit.",
+    labelnames=["bucket"],
+)
+RATE_LIMIT_REJECTED = Counter(
+    "notifiq_rate_limit_rejected_total",
+    "Total number of sends that could not get a rate limit token before their deadline.",
+    labelnames=["bucket"],
+)
+
+CIRCUIT_STATE = Gauge(
+    "notifiq_circuit_state",
+    "Circuit breaker state per endpoint (0 = closed, 1 = open, 2 = half-open).",
+    labelnames=["endpoint"],
+    multiprocess_mode="liveall",
+)
+CIRCUIT_OPENED = Counter(
+    "notifiq_circuit_opened_total",
+    "Total number of times an endpoint's circuit opened.",
+    labelnames=["endpoint"],
+)
+CIRCUIT_REJECTED = Counter(
+    "notifiq_circuit_rejected_total",
+    "Total number of sends failed fast because an endpoint's circuit was open.",
+    labelnames=["endpoint"],
+)
+
+ROUTING_RULES_LOADED = Gauge(
+    "notifiq_routing_rules",
+    "Number of routing rules currently loaded.",
+    multiprocess_mode="livemax",
+)
+ROUTING_RULES_RELOADS = Counter(
+    "notifiq_routing_rules_reloads_total",
+    "Total number of routing rules file loads.",
+    labelnames=["result"],
+)
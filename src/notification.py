@@ -0,0 +1,214 @@
+import json
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from src.routing import get_target_notifiers
+from src.rules import RoutingRules
+
+# Fastest available JSON decoder: orjson, then msgspec, then the stdlib
+try:
+    import orjson
+
+    _loads: Callable[[bytes], Any] = orjson.loads
+    DECODE_ERRORS: tuple[type[Exception], ...] = (orjson.JSONDecodeError,)
+except ImportError:  # orjson is optional
+    try:
+        import msgspec
+
+        _loads = msgspec.json.decode
+        DECODE_ERRORS = (msgspec.DecodeError,)
+    except ImportError:  # msgspec is optional
+        _loads = json.loads
+        DECODE_ERRORS = (json.JSONDecodeError, UnicodeDecodeError)
+
+# Routing fields that must be strings when present
+STRING_FIELDS = ("ntfy_topic", "mattermost_channel", "gotify_app", "pushover_app")
+
+
+class InvalidMessage(ValueError):
+    """
+    Raised when a message body is not a valid notification.
+    """
+
+
+class Notification:
+    """
+    A decoded, validated notification.
+
+    Everything that is not title, message, channels, dedup_key or created_at
+    is kept in extra: routing fields (ntfy_topic, pushover_app, priority, ...) and
+    provider parameters (X-* headers for ntfy, sound or url for Pushover, ...).
+    """
+
+    __slots__ = ("title", "message", "channels", "extra", "dedup_key", "enqueued_at")
+
+    def __init__(
+        self,
+        title: str,
+        message: str,
+        channels: list[str],
+        extra: Optional[dict[str, Any]] = None,
+        dedup_key: Optional[str] = None,
+        enqueued_at: Optional[float] = None,
+    ):
+        """
+        Args:
+            title: Notification title
+            message: Notification message
+            channels: List of channels to notify
+            extra: Extra fields for dynamic routing and provider parameters
+            dedup_key: Producer-supplied key for deduplication
+            enqueued_at: When the message was published (Unix time), for lag metrics
+        """
+        self.title = title
+        self.message = message
+        self.channels = channels
+        self.extra = extra if extra is not None else {}
+        self.dedup_key = dedup_key
+        self.enqueued_at = enqueued_at
+
+    def __repr__(self) -> str:
+        return (
+            f"Notification(title={self.title!r}, channels={self.channels!r}, "
+            f"extra={self.extra!r})"
+        )
+
+    def replace(self, **changes: Any) -> "Notification":
+        """
+        Return a copy with some fields replaced (e.g. a digest's title and message).
+        """
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Notification(**fields)
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Encode the notification as a message for from_dict, with its channels resolved.
+        """
+        data = {
+            **self.extra,
+            "title": self.title,
+            "message": self.message,
+            "channels": self.channels,
+        }
+        if self.dedup_key is not None:
+            data["dedup_key"] = self.dedup_key
+        if self.enqueued_at is not None:
+            # Keeps the original publish time through shards and the spool
+            data["created_at"] = self.enqueued_at
+        return data
+
+    @classmethod
+    def from_dict(
+        cls, data: Any, rules: Optional[RoutingRules] = None
+    ) -> "Notification":
+        """
+        Validate a decoded message.
+        Args:
+            data: The decoded message (from RabbitMQ).
+            rules: Routing rules for messages that do not list their channels.
+        Returns:
+            The notification.
+        Raises:
+            InvalidMessage: If the message is not an object or a field has the wrong type.
+        """
+        if not isinstance(data, dict):
+            raise InvalidMessage(f"expected a JSON object, got {type(data).__name__}")
+        title = data.get("title", "Notification")
+        if not isinstance(title, str):
+            raise InvalidMessage("'title' must be a string")
+        message = data.get("message")
+        if message is None:
+            message = str(data)
+        elif isinstance(message, (int, float, bool)):
+            message = str(message)
+        elif not isinstance(message, str):
+            raise InvalidMessage("'message' must be a string")
+        channels = data.get("channels")
+        if channels and not (
+            isinstance(channels, str)
+            or isinstance(channels, list)
+            and all(isinstance(c, str) for c in channels)
+        ):
+            raise InvalidMessage("'channels' must be a list of strings or a string")
+
+        extra = {
+            k: v
+            for k, v in data.items()
+            if k not in {"title", "message", "channels", "dedup_key", "created_at"}
+        }
+        for field in STRING_FIELDS:
+            if field in extra and not isinstance(extra[field], str):
+                raise InvalidMessage(f"'{field}' must be a string")
+        if "priority" in extra:
+            priority = extra["priority"]
+            if isinstance(priority, bool) or not isinstance(priority, (str, int)):
+                raise InvalidMessage("'priority' must be a string or an integer")
+            extra["priority"] = str(extra["priority"])
+        dedup_key = data.get("dedup_key")
+        if dedup_key is not None and (
+            isinstance(dedup_key, bool) or not isinstance(dedup_key, (str, int))
+        ):
+            raise InvalidMessage("'dedup_key' must be a string or an integer")
+
+        targets: list[str] = []
+        if not channels and rules is not None:
+            targets, rule_extra = rules.match(data)
+            # Fields set by the message itself take precedence over the rules
+            extra = {**rule_extra, **extra}
+        return cls(
+            title,
+            message,
+            targets or get_target_notifiers(data),
+            extra,
+            str(dedup_key) if dedup_key is not None else None,
+            parse_timestamp(data.get("created_at")),
+        )
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """
+    Parse a created_at field: Unix time in seconds or milliseconds, or an
+    ISO 8601 string (UTC if it has no offset).
+    Returns:
+        Unix time, or None if the value is missing or not a timestamp.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+
+def decode_notification(
+    body: bytes,
+    rules: Optional[RoutingRules] = None,
+    timestamp: Optional[float] = None,
+) -> Notification:
+    """
+    Decode and validate a RabbitMQ message body.
+    Args:
+        body: Message body (JSON).
+        rules: Routing rules for messages that do not list their channels.
+        timestamp: The AMQP timestamp property, used when the body has no created_at.
+    Returns:
+        The notification.
+    Raises:
+        InvalidMessage: If the body is not valid JSON or not a valid notification.
+    """
+    try:
+        data = _loads(body)
+    except DECODE_ERRORS as e:
+        raise InvalidMessage(f"invalid JSON: {e}") from e
+    notification = Notification.from_dict(data, rules)
+    if notification.enqueued_at is None and timestamp:
+        notification.enqueued_at = float(timestamp)
+    return notification
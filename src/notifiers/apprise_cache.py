@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import apprise
+from apprise.plugins.base import NotifyBase
+
+from src.logging_config import setup_logging
+from src.metrics import (
+    APPRISE_CACHE_EVICTIONS,
+    APPRISE_CACHE_HITS,
+    APPRISE_CACHE_MISSES,
+    APPRISE_CACHE_SIZE,
+)
+
+setup_logging()
+
+
+class AppriseCache:
+    """
+    Thread-safe LRU cache of instantiated Apprise plugins keyed by their final URL.
+
+    Parsing an Apprise URL and instantiating its plugin is the expensive part of a
+    send, so plugins are built once per distinct URL and reused until they are
+    evicted by size or age.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 3600.0):
+        """
+        Args:
+            max_size: Maximum number of plugins to keep.
+            ttl: Seconds a plugin may be reused before it is rebuilt (0 disables expiry).
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._plugins: OrderedDict[str, tuple[float, NotifyBase]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[NotifyBase]:
+        """
+        Return the plugin for a URL, instantiating and caching it on a miss.
+        Args:
+            url: The fully transformed Apprise URL.
+        Returns:
+            The plugin instance, or None if Apprise could not parse the URL.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._plugins.get(url)
+            if entry is not None:
+                created, plugin = entry
+                if not self.ttl or now - created < self.ttl:
+                    self._plugins.move_to_end(url)
+                    APPRISE_CACHE_HITS.inc()
+                    return plugin
+                del self._plugins[url]
+                APPRISE_CACHE_EVICTIONS.labels(reason="expired").inc()
+                APPRISE_CACHE_SIZE.set(len(self._plugins))
+
+        APPRISE_CACHE_MISSES.inc()
+        plugin = apprise.Apprise.instantiate(url)
+        if plugin is None:
+            logging.error("Apprise could not load a plugin for the configured URL")
+            return None
+
+        with self._lock:
+            self._plugins[url] = (now, plugin)
+            self._plugins.move_to_end(url)
+            while len(self._plugins) > self.max_size:
+                self._plugins.popitem(last=False)
+                APPRISE_CACHE_EVICTIONS.labels(reason="size").inc()
+            APPRISE_CACHE_SIZE.set(len(self._plugins))
+        return plugin
+
+    def build(self, urls: list[str]) -> apprise.Apprise:
+        """
+        Build an Apprise object from cached plugins for the given URLs.
+        Args:
+            urls: The fully transformed Apprise URLs.
+        Returns:
+            An Apprise object ready to notify.
+        """
+        aps = apprise.Apprise()
+        for url in urls:
+            if plugin := self.get(url):
+                aps.add(plugin)
+        return aps
+
+    def clear(self) -> None:
+        """
+        Drop all cached plugins.
+        """
+        with self._lock:
+            self._plugins.clear()
+            APPRISE_CACHE_SIZE.set(0)
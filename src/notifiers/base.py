@@ -1,5 +1,51 @@
+import time
 from abc import ABC, abstractmethod
-from typing import Any
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from src.notification import Notification
+
+
+class NotificationError(Exception):
+    """
+    Raised by a notifier when a provider did not accept a notification.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ):
+        """
+        Args:
+            message: Description of the failure.
+            status_code: HTTP status returned by the provider, if any.
+            retry_after: Seconds the provider asked us to wait before retrying, if any.
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse an HTTP Retry-After header (delay in seconds or an HTTP date).
+    Args:
+        value: The header value.
+    Returns:
+        Seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
 
 
 class BaseNotifier(ABC):
@@ -8,15 +54,41 @@ class BaseNotifier(ABC):
     """
 
     @abstractmethod
-    def send(
-        self, title: str, message: str, channels: list[str], **kwargs: Any
-    ) -> None:
+    def send(self, notification: Notification, channels: list[str]) -> None:
         """
         Send a notification.
         Args:
-            title: The notification title.
-            message: The notification body.
-            channels: List of channel names (e.g., ["ntfy", "loki"])
-            kwargs: Extra arguments for the notifier.
+            notification: The notification (title, message and routing fields).
+            channels: The notification's channels this notifier delivers (e.g., ["ntfy", "loki"])
+        Raises:
+            NotificationError: If the provider did not accept the notification.
         """
         pass
+
+    def close(self) -> None:
+        """
+        Release any resources held by the notifier (e.g., pooled HTTP connections).
+        """
+
+
+class AsyncBaseNotifier(ABC):
+    """
+    Abstract base class for notifiers used by the asyncio runtime.
+    """
+
+    @abstractmethod
+    async def send(self, notification: Notification, channels: list[str]) -> None:
+        """
+        Send a notification.
+        Args:
+            notification: The notification (title, message and routing fields).
+            channels: The notification's channels this notifier delivers (e.g., ["ntfy", "loki"])
+        Raises:
+            NotificationError: If the provider did not accept the notification.
+        """
+        pass
+
+    async def close(self) -> None:
+        """
+        Release any resources held by the notifier (e.g., pooled HTTP connections).
+        """
@@ -0,0 +1,148 @@
+import re
+import urllib.parse
+from typing import Any
+
+from src.notifiers.priority_mappings import map_gotify_priority, map_ntfy_priority
+
+# Variants derived from one endpoint (topics, priorities, ...) that are kept;
+# topics come from messages, so the cache must not grow without bound
+MAX_DERIVED = 256
+
+
+class Endpoint:
+    """
+    An Apprise URL parsed once, with cached derived variants.
+
+    Endpoints are immutable: with_path_leaf() and with_param() return another
+    Endpoint, built the first time a variant is asked for and looked up in a
+    dict after that, so per-message URL overrides cost no parsing.
+    """
+
+    __slots__ = ("url", "_parsed", "_derived")
+
+    def __init__(self, url: str):
+        """
+        Args:
+            url: The Apprise URL.
+        """
+        self.url = url
+        self._parsed = urllib.parse.urlparse(url)
+        self._derived: dict[tuple[str, str, str], Endpoint] = {}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.url!r})"
+
+    def _derive(self, key: tuple[str, str, str], url: str) -> "Endpoint":
+        if len(self._derived) >= MAX_DERIVED:
+            self._derived.clear()
+        endpoint = self._derived[key] = type(self)(url)
+        return endpoint
+
+    def with_path_leaf(self, leaf: str) -> "Endpoint":
+        """
+        Replace the last path segment (e.g. the ntfy topic or Gotify app token).
+        """
+        key = ("leaf", leaf, "")
+        if (endpoint := self._derived.get(key)) is not None:
+            return endpoint
+        path_parts = str(self._parsed.path).rstrip("/").split("/")
+        path_parts[-1] = leaf
+        url = urllib.parse.urlunparse(self._parsed._replace(path="/".join(path_parts)))
+        return self._derive(key, url)
+
+    def with_param(self, name: str, value: str, replace: bool = False) -> "Endpoint":
+        """
+        Add a query parameter.
+        Args:
+            name: Parameter name.
+            value: Parameter value.
+            replace: Replace the parameter if the URL already has it, instead of appending another.
+        """
+        key = ("replace" if replace else "param", name, value)
+        if (endpoint := self._derived.get(key)) is not None:
+            return endpoint
+        if replace and re.search(rf"[?&]{re.escape(name)}=", self.url):
+            url = re.sub(
+                rf"([?&]){re.escape(name)}=[^&]*",
+                lambda m: f"{m.group(1)}{name}={value}",
+                self.url,
+            )
+        else:
+            url = (
+                f"{self.url}&{name}={value}"
+                if "?" in self.url
+                else f"{self.url}?{name}={value}"
+            )
+        return self._derive(key, url)
+
+    def for_message(self, kwargs: dict[str, Any]) -> "Endpoint":
+        """
+        Apply a message's routing overrides. Plain endpoints have none.
+        """
+        return self
+
+
+class NtfyEndpoint(Endpoint):
+    """
+    Apprise ntfy URL. Supports 'ntfy_topic' and 'priority' overrides.
+    """
+
+    __slots__ = ()
+
+    def for_message(self, kwargs: dict[str, Any]) -> Endpoint:
+        endpoint: Endpoint = self
+        if "ntfy_topic" in kwargs:
+            endpoint = endpoint.with_path_leaf(str(kwargs["ntfy_topic"]))
+        if "priority" in kwargs:
+            endpoint = endpoint.with_param(
+                "priority", map_ntfy_priority(kwargs["priority"])
+            )
+        return endpoint
+
+
+class GotifyEndpoint(Endpoint):
+    """
+    Apprise Gotify URL. Supports 'gotify_app' and 'priority' overrides and
+    always sets format=markdown.
+    """
+
+    __slots__ = ()
+
+    def for_message(self, kwargs: dict[str, Any]) -> Endpoint:
+        endpoint: Endpoint = self
+        if "gotify_app" in kwargs:
+            endpoint = endpoint.with_path_leaf(str(kwargs["gotify_app"]))
+        if "priority" in kwargs:
+            endpoint = endpoint.with_param(
+                "priority", map_gotify_priority(kwargs["priority"])
+            )
+        return endpoint.with_param("format", "markdown")
+
+
+class MattermostEndpoint(Endpoint):
+    """
+    Apprise Mattermost URL. Supports a 'mattermost_channel' override.
+    """
+
+    __slots__ = ()
+
+    def for_message(self, kwargs: dict[str, Any]) -> Endpoint:
+        if "mattermost_channel" in kwargs:
+            return self.with_param(
+                "channel", str(kwargs["mattermost_channel"]), replace=True
+            )
+        return self
+
+
+ENDPOINT_TYPES: dict[str, type[Endpoint]] = {
+    "ntfy": NtfyEndpoint,
+    "gotify": GotifyEndpoint,
+    "mattermost": MattermostEndpoint,
+}
+
+
+def create_endpoint(channel: str, url: str) -> Endpoint:
+    """
+    Build the endpoint for a configured channel URL.
+    """
+    return ENDPOINT_TYPES.get(channel, Endpoint)(url)
@@ -1,9 +1,9 @@
-from typing import Any
-
-import apprise
+from typing import Optional
 
 from src.logging_config import setup_logging
-from src.notifiers.base import BaseNotifier
+from src.notification import Notification
+from src.notifiers.apprise_cache import AppriseCache
+from src.notifiers.base import AsyncBaseNotifier, BaseNotifier, NotificationError
 
 setup_logging()
 
@@ -13,13 +13,30 @@ class MattermostNotifier(BaseNotifier):
     Notifier for Mattermost via Apprise, combining title and message into a single text field.
     """
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, cache: Optional[AppriseCache] = None):
+        self.url = url
+        self.cache = cache or AppriseCache()
+
+    def send(self, notification: Notification, channels: list[str]) -> None:
+        title, message = notification.title, notification.message
+        combined = f"{title}: {message}" if title else message
+        aps = self.cache.build([self.url])
+        if not aps.notify(body=combined):
+            raise NotificationError("Apprise failed to notify mattermost")
+
+
+class AsyncMattermostNotifier(AsyncBaseNotifier):
+    """
+    asyncio variant of MattermostNotifier, using Apprise's async_notify.
+    """
+
+    def __init__(self, url: str, cache: Optional[AppriseCache] = None):
         self.url = url
+        self.cache = cache or AppriseCache()
 
-    def send(
-        self, title: str, message: str, channels: list[str], **kwargs: Any
-    ) -> None:
+    async def send(self, notification: Notification, channels: list[str]) -> None:
+        title, message = notification.title, notification.message
         combined = f"{title}: {message}" if title else message
-        aps = apprise.Apprise()
-        aps.add(self.url)
-        aps.notify(body=combined)
+        aps = self.cache.build([self.url])
+        if not await aps.async_notify(body=combined):
+            raise NotificationError("Apprise failed to notify mattermost")
@@ -1,4 +1,5 @@
 import contextlib
+from typing import Optional
 
 GOTIFY_PRIORITY_MAP = {
     "min": "low",
@@ -80,3 +81,37 @@ def map_pushover_priority(priority: str) -> int:
         return int(priority)
     p = priority.strip().lower()
     return PUSHOVER_PRIORITY_MAP.get(p, 0)
+
+
+# Normalized priority levels, lowest first
+PRIORITY_LEVELS = ("min", "low", "normal", "high", "emergency")
+
+PRIORITY_LEVEL_MAP = {
+    "min": "min",
+    "lowest": "min",
+    "low": "low",
+    "moderate": "low",
+    "normal": "normal",
+    "default": "normal",
+    "medium": "normal",
+    "high": "high",
+    "critical": "emergency",
+    "emergency": "emergency",
+    "max": "emergency",
+}
+
+
+def normalize_priority(priority: Optional[str]) -> str:
+    """
+    Map a message priority to one of PRIORITY_LEVELS.
+    Args:
+        priority: The priority to map. Integers use the Pushover scale (-2 to 2).
+    Returns:
+        The normalized priority level ("normal" if unknown or missing).
+    """
+    if priority is None:
+        return "normal"
+    with contextlib.suppress(ValueError, TypeError):
+        value = max(-2, min(2, int(priority)))
+        return PRIORITY_LEVELS[value + 2]
+    return PRIORITY_LEVEL_MAP.get(str(priority).strip().lower(), "normal")
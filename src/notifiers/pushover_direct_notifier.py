@@ -4,16 +4,23 @@ from urllib.parse import unquote, urlparse
 
 import httpx
 
-from src.logging_config import setup_logging
-from src.notifiers.base import BaseNotifier
+from src.http_client import PROVIDER_EXTENSION
+from src.logging_config import message_logger, setup_logging
+from src.notification import Notification
+from src.notifiers.base import (
+    AsyncBaseNotifier,
+    BaseNotifier,
+    NotificationError,
+    parse_retry_after,
+)
 from src.notifiers.priority_mappings import map_pushover_priority
 
 setup_logging()
 
 
-class PushoverDirectNotifier(BaseNotifier):
+class PushoverDirectRequestBuilder:
     """
-    Notifier for sending messages directly to Pushover using HTTP requests, with support for all Pushover parameters (including html=1) and Apprise-style URL parsing.
+    Shared URL parsing and payload building for the sync and async pushover-direct notifiers.
     """
 
     def __init__(self, apprise_url: str):
@@ -46,36 +53,27 @@ class PushoverDirectNotifier(BaseNotifier):
             user = parsed.path.strip("/")
         return token, user
 
-    def send(
-        self,
-        title: str,
-        message: str,
-        channels: list[str],
-        **kwargs: Any,
-    ) -> None:  # sourcery skip: extract-method
+    def build_payload(
+        self, notification: Notification
+    ) -> tuple[dict[str, Any], Optional[dict[str, Any]]]:
         """
-        Send a notification directly to Pushover using HTTP POST.
+        Build the form data and files for a Pushover POST.
         Args:
-            title: The notification title (can include emojis).
-            message: The notification body.
-            channels: List of channel names (should include "pushover-direct" if using this notifier).
-            kwargs: Extra Pushover params (html, priority, sound, attachment, pushover_device, etc.)
+            notification: The notification. Its extra fields carry the Pushover params
+                   (html, priority, sound, attachment, pushover_device, etc.)
                    pushover_device: List of device names or single device name string.
                                   If a list is provided, it will be joined with commas.
+        Returns:
+            A (data, files) tuple.
         """
-        print("[PUSHOVER SEND CALLED]")
-        logging.info("[pushover-direct] send() called with title='%s'", title)
-
-        if "pushover-direct" not in channels:
-            return
-
+        kwargs = notification.extra
         data = {
             "token": self.token,
             "user": self.user,
-            "message": message,
+            "message": notification.message,
         }
-        if title:
-            data["title"] = title
+        if notification.title:
+            data["title"] = notification.title
 
         # Always set html=1 unless explicitly overridden
         data["html"] = kwargs.get("html", 1)
@@ -115,30 +113,141 @@ class PushoverDirectNotifier(BaseNotifier):
             }
             if "attachment_type" in kwargs:
                 data["attachment_type"] = kwargs["attachment_type"]
+        return data, files
+
+    def log_request(self, data: dict[str, Any], files: Optional[dict]) -> None:
+        """
+        Log an outgoing Pushover POST (field names only: the payload holds the
+        API token and user key).
+        """
+        logging.debug(
+            "[pushover-direct] Sending to URL: %s fields=%s files=%s",
+            self.api_url,
+            list(data),
+            list(files) if files else [],
+        )
+
+    @staticmethod
+    def check_response(resp: httpx.Response) -> None:
+        """
+        Log the outcome of a Pushover POST.
+        Raises:
+            NotificationError: If Pushover rejected the notification.
+        """
+        if resp.status_code >= 400:
+            logging.error(
+                "pushover-direct failed: status=%s response=%s",
+                resp.status_code,
+                resp.text,
+            )
+            raise NotificationError(
+                f"pushover-direct failed with status {resp.status_code}",
+                status_code=resp.status_code,
+                retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+            )
+        message_logger.info(
+            "[pushover-direct] Notification posted successfully: status=%s",
+            resp.status_code,
+        )
+
 
+class PushoverDirectNotifier(PushoverDirectRequestBuilder, BaseNotifier):
+    """
+    Notifier for sending messages directly to Pushover using HTTP requests, with support for all Pushover parameters (including html=1) and Apprise-style URL parsing.
+    """
+
+    def __init__(self, apprise_url: str, client: Optional[httpx.Client] = None):
+        """
+        Args:
+            apprise_url: Apprise-style pushover URL (e.g., pover://token@user)
+            client: Shared pooled HTTP client. If omitted, the notifier creates and owns one.
+        """
+        super().__init__(apprise_url)
+        self._owns_client = client is None
+        self.client = client or httpx.Client(timeout=5.0)
+
+    def send(self, notification: Notification, channels: list[str]) -> None:
+        """
+        Send a notification directly to Pushover using HTTP POST.
+        Args:
+            notification: The notification. Its extra fields carry the Pushover params, see build_payload.
+            channels: List of channel names (should include "pushover-direct" if using this notifier).
+        """
+        logging.debug(
+            "[pushover-direct] send() called with title='%s'", notification.title
+        )
+
+        if "pushover-direct" not in channels:
+            return
+
+        data, files = self.build_payload(notification)
         try:
-            logging.info("[pushover-direct] Sending to URL: %s", self.api_url)
-            logging.info("[pushover-direct] Payload: %s", data)
-            if files:
-                logging.info("[pushover-direct] Files: %s", list(files.keys()))
-            resp = httpx.post(
+            self.log_request(data, files)
+            resp = self.client.post(
                 url=self.api_url,
                 data=data,
                 files=files,
-                timeout=5.0,
+                extensions={PROVIDER_EXTENSION: "pushover"},
             )
-            logging.info("[pushover-direct] Response status: %s", resp.status_code)
-            logging.info("[pushover-direct] Response text: %s", resp.text)
-            if resp.status_code >= 400:
-                logging.error(
-                    "pushover-direct failed: status=%s response=%s",
-                    resp.status_code,
-                    resp.text,
-                )
-            else:
-                logging.info(
-                    "[pushover-direct] Notification posted successfully: status=%s",
-                    resp.status_code,
-                )
-        except Exception as e:
+        except httpx.HTTPError as e:
             logging.error("pushover-direct exception: error=%s", e)
+            raise NotificationError(f"pushover-direct request failed: {e}") from e
+        self.check_response(resp)
+
+    def close(self) -> None:
+        """
+        Close the HTTP client if this notifier created it.
+        """
+        if self._owns_client:
+            self.client.close()
+
+
+class AsyncPushoverDirectNotifier(PushoverDirectRequestBuilder, AsyncBaseNotifier):
+    """
+    asyncio variant of PushoverDirectNotifier, posting through an httpx.AsyncClient.
+    """
+
+    def __init__(self, apprise_url: str, client: Optional[httpx.AsyncClient] = None):
+        """
+        Args:
+            apprise_url: Apprise-style pushover URL (e.g., pover://token@user)
+            client: Shared pooled async HTTP client. If omitted, the notifier creates and owns one.
+        """
+        super().__init__(apprise_url)
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(timeout=5.0)
+
+    async def send(self, notification: Notification, channels: list[str]) -> None:
+        """
+        Send a notification directly to Pushover using HTTP POST.
+        Args:
+            notification: The notification. Its extra fields carry the Pushover params, see build_payload.
+            channels: List of channel names (should include "pushover-direct" if using this notifier).
+        """
+        logging.debug(
+            "[pushover-direct] send() called with title='%s'", notification.title
+        )
+
+        if "pushover-direct" not in channels:
+            return
+
+        data, files = self.build_payload(notification)
+        try:
+            self.log_request(data, files)
+            resp = await self.client.post(
+                url=self.api_url,
+                data=data,
+                files=files,
+                extensions={PROVIDER_EXTENSION: "pushover"},
+            )
+        except httpx.HTTPError as e:
+            logging.error("pushover-direct exception: error=%s", e)
+            raise NotificationError(f"pushover-direct request failed: {e}") from e
+        self.check_response(resp)
+
+    async def close(self) -> None:
+        """
+        Close the HTTP client if this notifier created it.
+        """
+        if self._owns_client:
+            await self.client.aclose()
@@ -0,0 +1,317 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import re
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Optional
+
+from src.logging_config import setup_logging
+from src.metrics import RATE_LIMIT_DELAYED, RATE_LIMIT_REJECTED, RATE_LIMIT_TOKENS
+
+setup_logging()
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a send would have to wait longer than its deadline for a token.
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Callers reserve a token and are told how long to wait for it, so requests
+    beyond the burst are delayed to the configured rate instead of being sent
+    straight into a provider's rate limit. The token count goes negative while
+    reservations are queued.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float):
+        """
+        Args:
+            name: Bucket name, used as the metrics label.
+            rate: Tokens added per second.
+            capacity: Maximum number of tokens (burst size).
+        """
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        RATE_LIMIT_TOKENS.labels(bucket=name).set(capacity)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def try_reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Reserve one token.
+        Args:
+            max_wait: Give up if the token would not be available within this many seconds.
+        Returns:
+            Seconds the caller must wait before sending, or None if max_wait would be exceeded.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return None
+            self.tokens -= 1
+            RATE_LIMIT_TOKENS.labels(bucket=self.name).set(self.tokens)
+            return wait
+
+    def refund(self) -> None:
+        """
+        Return a reserved token that will not be used.
+        """
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+            RATE_LIMIT_TOKENS.labels(bucket=self.name).set(self.tokens)
+
+
+class RateLimiter:
+    """
+    Registry of token buckets keyed per provider and per provider instance.
+
+    Limits come from RATE_LIMIT_<PROVIDER>[_<INSTANCE>] settings (see Config).
+    An instance (e.g. a Pushover app or an ntfy topic) with a limit of its own
+    gets its own bucket; every other instance of the provider shares the
+    provider-wide bucket, so the provider limit is a ceiling for all of them.
+    Only configured limits get a bucket, so instance names taken from messages
+    cannot grow the registry. Providers without a configured limit are not
+    throttled.
+
+    Sends that have to wait for a token are parked on a single timer thread
+    and handed to the pool when the token is due, so a throttled provider
+    never holds the pool workers other providers need.
+    """
+
+    def __init__(self, limits: dict[str, tuple[float, float]]):
+        """
+        Args:
+            limits: Map of limit name (e.g. "pushover", "pushover_infra") to (rate, burst).
+        """
+        self.limits = limits
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        # Deferred sends: (due, sequence, future, executor, fn, args), earliest first
+        self._deferred: list[tuple[float, int, Future, Executor, Callable, tuple]] = []
+        self._sequence = itertools.count()
+        self._wakeup = threading.Condition()
+        self._timer: Optional[threading.Thread] = None
+        self._closed = False
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+    def bucket(
+        self, provider: str, instance: Optional[str] = None
+    ) -> Optional[TokenBucket]:
+        """
+        Get the bucket for a provider instance, creating it on first use.
+        Args:
+            provider: Provider name (e.g. "pushover", "ntfy", "mattermost").
+            instance: Instance within the provider (e.g. Pushover app or ntfy topic).
+        Returns:
+            The instance's own bucket if it has a limit, the provider's bucket
+            otherwise, or None if neither is rate limited.
+        """
+        provider_name = self._normalize(provider)
+        name, label = provider_name, provider_name
+        if instance:
+            instance_name = self._normalize(str(instance))
+            if f"{provider_name}_{instance_name}" in self.limits:
+                name = f"{provider_name}_{instance_name}"
+                label = f"{provider_name}:{instance_name}"
+        if name not in self.limits:
+            return None
+        if (bucket := self._buckets.get(name)) is not None:
+            return bucket
+        with self._lock:
+            if name not in self._buckets:
+                self._buckets[name] = TokenBucket(label, *self.limits[name])
+            return self._buckets[name]
+
+    def reserve(
+        self, keys: list[tuple[str, Optional[str]]], max_wait: Optional[float] = None
+    ) -> Optional[float]:
+        """
+        Reserve a token from every bucket a send touches.
+        Args:
+            keys: (provider, instance) pairs for the send.
+            max_wait: Give up if any token would not be available within this many seconds.
+        Returns:
+            Seconds to wait before sending, or None if max_wait would be exceeded.
+        """
+        reserved: list[TokenBucket] = []
+        wait = 0.0
+        for provider, instance in keys:
+            bucket = self.bucket(provider, instance)
+            if bucket is None:
+                continue
+            bucket_wait = bucket.try_reserve(max_wait)
+            if bucket_wait is None:
+                for held in reserved:
+                    held.refund()
+                RATE_LIMIT_REJECTED.labels(bucket=bucket.name).inc()
+                return None
+            if bucket_wait > 0:
+                RATE_LIMIT_DELAYED.labels(bucket=bucket.name).inc()
+            reserved.append(bucket)
+            wait = max(wait, bucket_wait)
+        return wait
+
+    def submit(
+        self,
+        executor: Executor,
+        keys: list[tuple[str, Optional[str]]],
+        timeout: Optional[float],
+        fn: Callable[..., Any],
+        *args: Any,
+    ) -> Future:
+        """
+        Run a send on an executor once every bucket it touches has a token.
+        Args:
+            executor: Pool the send runs on.
+            keys: (provider, instance) pairs for the send.
+            timeout: Maximum seconds to wait for the tokens.
+            fn: The send.
+            args: Arguments for fn.
+        Returns:
+            A future for the send's result. It fails with RateLimitExceeded if
+            the tokens would not be available within timeout. Cancelling it
+            before the tokens are due drops the send.
+        """
+        wait = self.reserve(keys, timeout)
+        if wait is None:
+            future: Future = Future()
+            future.set_exception(
+                RateLimitExceeded(f"Rate limit for {keys} exceeds {timeout}s")
+            )
+            return future
+        if wait <= 0:
+            return executor.submit(fn, *args)
+        future = Future()
+        with self._wakeup:
+            if self._closed:
+                raise RuntimeError("cannot schedule new sends after close")
+            heapq.heappush(
+                self._deferred,
+                (
+                    time.monotonic() + wait,
+                    next(self._sequence),
+                    future,
+                    executor,
+                    fn,
+                    args,
+                ),
+            )
+            if self._timer is None:
+                self._timer = threading.Thread(
+                    target=self._run_deferred, name="notifiq-rate-limit", daemon=True
+                )
+                self._timer.start()
+            self._wakeup.notify()
+        return future
+
+    def close(self) -> None:
+        """
+        Stop the timer thread and cancel the sends still waiting for tokens.
+        """
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify()
+            deferred, self._deferred = self._deferred, []
+        for _, _, future, _, _, _ in deferred:
+            future.cancel()
+        if self._timer is not None:
+            self._timer.join()
+
+    def _run_deferred(self) -> None:
+        while True:
+            with self._wakeup:
+                while not self._closed and (
+                    not self._deferred or self._deferred[0][0] > time.monotonic()
+                ):
+                    self._wakeup.wait(
+                        self._deferred[0][0] - time.monotonic()
+                        if self._deferred
+                        else None
+                    )
+                if self._closed:
+                    return
+                _, _, future, executor, fn, args = heapq.heappop(self._deferred)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                started = executor.submit(fn, *args)
+            except RuntimeError as e:
+                # The pool is shutting down
+                future.set_exception(e)
+                continue
+            started.add_done_callback(functools.partial(_copy_outcome, future))
+
+    async def acquire_async(
+        self, keys: list[tuple[str, Optional[str]]], timeout: Optional[float] = None
+    ) -> None:
+        """
+        Wait on the event loop until every bucket for a send has a token.
+        Args:
+            keys: (provider, instance) pairs for the send.
+            timeout: Maximum seconds to wait.
+        Raises:
+            RateLimitExceeded: If the tokens would not be available within timeout.
+        """
+        wait = self.reserve(keys, timeout)
+        if wait is None:
+            raise RateLimitExceeded(f"Rate limit for {keys} exceeds {timeout}s")
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def _copy_outcome(target: Future, source: Future) -> None:
+    """
+    Resolve a deferred send's future with the outcome of the pool future it ran on.
+    """
+    if (exc := source.exception()) is not None:
+        target.set_exception(exc)
+    else:
+        target.set_result(source.result())
+
+
+def rate_limit_keys(
+    channels: list[str], kwargs: dict[str, Any], pushover_app: Optional[str] = None
+) -> list[tuple[str, Optional[str]]]:
+    """
+    Map the channels of one send to the (provider, instance) buckets it consumes.
+    Args:
+        channels: Channels delivered by the send.
+        kwargs: Extra arguments for dynamic routing (ntfy_topic, mattermost_channel, ...).
+        pushover_app: The Pushover app the send goes through, as resolved by
+            RoutingTable.pushover_app (not the message's pushover_app, which may
+            name an unknown app and fall back to the default one).
+    Returns:
+        List of (provider, instance) pairs.
+    """
+    keys: list[tuple[str, Optional[str]]] = []
+    for channel in channels:
+        if channel in ("ntfy", "ntfy-direct"):
+            keys.append(("ntfy", kwargs.get("ntfy_topic")))
+        elif channel == "pushover-direct":
+            keys.append(("pushover", pushover_app))
+        elif channel == "mattermost":
+            keys.append(("mattermost", kwargs.get("mattermost_channel")))
+        elif channel == "gotify":
+            keys.append(("gotify", kwargs.get("gotify_app")))
+        else:
+            keys.append((channel, None))
+    return keys
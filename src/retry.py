@@ -0,0 +1,366 @@
+import json
+import logging
+import math
+import random
+import time
+from typing import Any, Optional
+
+from pika import BasicProperties
+from pika.adapters.blocking_connection import BlockingChannel
+
+from src.config import Config
+from src.delivery import DeliveryResult
+from src.logging_config import setup_logging
+from src.metrics import MESSAGES_DEAD_LETTERED, RETRIES_SCHEDULED
+from src.notification import InvalidMessage, decode_notification
+from src.rules import RulesLoader
+
+setup_logging()
+
+# Number of delivery attempts already made for a message
+ATTEMPTS_HEADER = "x-notifiq-attempts"
+# Why a message was dead-lettered
+ERROR_HEADER = "x-notifiq-error"
+# When a message was first published (Unix time), kept across retries
+ENQUEUED_AT_HEADER = "x-notifiq-enqueued-at"
+
+
+class RetryPolicy:
+    """
+    Retry settings for one channel: attempt limit and exponential backoff with jitter.
+    """
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        """
+        Args:
+            max_attempts: Total delivery attempts, including the first one.
+            base_delay: Delay before the first retry (seconds), doubled on every attempt.
+            max_delay: Upper bound for the backoff (seconds).
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempts: int, retry_after: Optional[float] = None) -> float:
+        """
+        Compute the delay before the next attempt.
+        Args:
+            attempts: Delivery attempts made so far.
+            retry_after: Delay requested by the provider, which is always honored.
+        Returns:
+            Seconds to wait.
+        """
+        backoff = min(self.max_delay, self.base_delay * 2 ** max(attempts - 1, 0))
+        # "Equal jitter": spread retries out without ever retrying immediately
+        delay = random.uniform(backoff / 2, backoff)
+        if retry_after:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class Republish:
+    """
+    A message to publish as part of handling a failed delivery.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        queue: str,
+        body: bytes,
+        channels: list[str],
+        headers: dict[str, Any],
+        expiration: Optional[float] = None,
+        arguments: Optional[dict[str, Any]] = None,
+    ):
+        """
+        Args:
+            kind: "retry" or "dead".
+            queue: Queue to publish to (through the default exchange).
+            body: Message body.
+            channels: Channels the republished message is for.
+            headers: AMQP headers.
+            expiration: Per-message TTL in seconds, for delayed retries.
+            arguments: Arguments to declare the queue with.
+        """
+        self.kind = kind
+        self.queue = queue
+        self.body = body
+        self.channels = channels
+        self.headers = headers
+        self.expiration = expiration
+        self.arguments = arguments
+
+
+class RetryPlanner:
+    """
+    Decides what happens to a message that was not fully delivered.
+
+    Channels with attempts left are republished, with only those channels, to a
+    delay queue whose messages dead-letter back to the source queue once their
+    TTL expires, so retries never block a consumer thread. Delay queues are
+    bucketed by powers of two seconds so a long delay never holds up a short one
+    for more than its own bucket. Channels that are out of attempts, and
+    messages that cannot be decoded, go to the dead-letter queue.
+
+    Republished bodies are rebuilt from the resolved notification, so the
+    routing fields a rule supplied (ntfy_topic, pushover_app, priority, ...)
+    survive even though the retry lists its channels explicitly.
+    """
+
+    def __init__(self, config: Config, rules_loader: Optional[RulesLoader] = None):
+        """
+        Args:
+            config: Application configuration.
+            rules_loader: Routing rules the message was resolved with.
+        """
+        self.rules_loader = rules_loader
+        self.dead_letter_queue = config.rabbitmq_dead_letter_queue
+        self.default_policy = RetryPolicy(
+            config.retry_max_attempts, config.retry_base_delay, config.retry_max_delay
+        )
+        self.policies = {
+            channel: RetryPolicy(
+                int(overrides.get("max_attempts", config.retry_max_attempts)),
+                overrides.get("base_delay", config.retry_base_delay),
+                overrides.get("max_delay", config.retry_max_delay),
+            )
+            for channel, overrides in config.retry_overrides.items()
+        }
+
+    @property
+    def enabled(self) -> bool:
+        """
+        True if any channel is retried or a dead-letter queue is configured.
+        """
+        return bool(self.dead_letter_queue) or any(
+            policy.max_attempts > 1
+            for policy in (self.default_policy, *self.policies.values())
+        )
+
+    def policy(self, channel: str) -> RetryPolicy:
+        """
+        Get the retry policy for a channel.
+        """
+        return self.policies.get(channel, self.default_policy)
+
+    @staticmethod
+    def retry_queue(source_queue: str, delay: float) -> tuple[str, dict[str, Any]]:
+        """
+        Get the delay queue for a retry and the arguments to declare it with.
+        Args:
+            source_queue: Queue the message should return to.
+            delay: Retry delay in seconds.
+        Returns:
+            A (queue name, queue arguments) tuple.
+        """
+        bucket = 2 ** max(math.ceil(math.log2(max(delay, 1))), 0)
+        return f"{source_queue}.retry.{bucket}s", {
+            "x-dead-letter-exchange": "",
+            "x-dead-letter-routing-key": source_queue,
+            "x-message-ttl": bucket * 1000,
+        }
+
+    def plan(
+        self,
+        source_queue: str,
+        body: bytes,
+        headers: Optional[dict[str, Any]],
+        result: DeliveryResult,
+        timestamp: Optional[float] = None,
+    ) -> list[Republish]:
+        """
+        Plan the retry and dead-letter publishes for a failed delivery.
+        Args:
+            source_queue: Queue the message was consumed from.
+            body: Original message body.
+            headers: Original AMQP headers.
+            result: Outcome of processing the message.
+            timestamp: Original AMQP timestamp, kept as the first publish time.
+        Returns:
+            Messages to publish. Empty if the message was delivered.
+        """
+        headers = dict(headers or {})
+        attempts = int(headers.get(ATTEMPTS_HEADER, 0)) + 1
+        headers[ATTEMPTS_HEADER] = attempts
+        # Lag is measured from the first publish, not from the last retry
+        headers.setdefault(ENQUEUED_AT_HEADER, float(timestamp or time.time()))
+        if result.invalid:
+            return self._dead_letter(body, result.channels, headers, "invalid message")
+        if result.delivered:
+            return []
+
+        retry = [c for c in result.failed if attempts < self.policy(c).max_attempts]
+        exhausted = [c for c in result.failed if c not in retry]
+        republish: list[Republish] = []
+        if retry:
+            delay = max(
+                self.policy(c).delay(attempts, result.retry_after) for c in retry
+            )
+            queue, arguments = self.retry_queue(source_queue, delay)
+            republish.append(
+                Republish(
+                    "retry",
+                    queue,
+                    self._with_channels(body, retry),
+                    retry,
+                    headers,
+                    expiration=delay,
+                    arguments=arguments,
+                )
+            )
+        if exhausted:
+            republish.extend(
+                self._dead_letter(
+                    self._with_channels(body, exhausted),
+                    exhausted,
+                    headers,
+                    f"delivery failed after {attempts} attempt(s)",
+                )
+            )
+        return republish
+
+    def _dead_letter(
+        self, body: bytes, channels: list[str], headers: dict[str, Any], reason: str
+    ) -> list[Republish]:
+        if not self.dead_letter_queue:
+            logging.error(
+                "Dropping message for %s (%s); no dead-letter queue configured",
+                channels,
+                reason,
+            )
+            return []
+        return [
+            Republish(
+                "dead",
+                self.dead_letter_queue,
+                body,
+                channels,
+                {**headers, ERROR_HEADER: reason},
+            )
+        ]
+
+    def _with_channels(self, body: bytes, channels: list[str]) -> bytes:
+        """
+        Rewrite a message body so it only targets the given channels, keeping
+        the routing fields its rules supplied.
+        """
+        rules = self.rules_loader.current if self.rules_loader else None
+        try:
+            notification = decode_notification(body, rules)
+        except InvalidMessage:
+            msg = json.loads(body)
+            msg["channels"] = channels
+            return json.dumps(msg).encode("utf-8")
+        return json.dumps(notification.replace(channels=channels).to_dict()).encode(
+            "utf-8"
+        )
+
+
+class RetryPublisher:
+    """
+    Publishes retry plans on a pika channel. Must run on the connection thread.
+    """
+
+    def __init__(self, planner: RetryPlanner):
+        """
+        Args:
+            planner: Decides what to republish.
+        """
+        self.planner = planner
+        self._declared: set[str] = set()
+
+    def setup(self, channel: BlockingChannel) -> None:
+        """
+        Enable publisher confirms and declare the dead-letter queue.
+        """
+        channel.confirm_delivery()
+        if self.planner.dead_letter_queue:
+            channel.queue_declare(queue=self.planner.dead_letter_queue, durable=True)
+
+    def publish(
+        self,
+        channel: BlockingChannel,
+        source_queue: str,
+        body: bytes,
+        properties: Optional[BasicProperties],
+        result: DeliveryResult,
+    ) -> None:
+        """
+        Publish the retries and dead letters for a failed delivery.
+        Args:
+            channel: Channel to publish on.
+            source_queue: Queue the message was consumed from.
+            body: Original message body.
+            properties: Original message properties.
+            result: Outcome of processing the message.
+        """
+        headers = properties.headers if properties else None
+        timestamp = properties.timestamp if properties else None
+        for republish in self.planner.plan(
+            source_queue, body, headers, result, timestamp
+        ):
+            if republish.arguments and republish.queue not in self._declared:
+                channel.queue_declare(
+                    queue=republish.queue, durable=True, arguments=republish.arguments
+                )
+                self._declared.add(republish.queue)
+            channel.basic_publish(
+                exchange="",
+                routing_key=republish.queue,
+                body=republish.body,
+                properties=BasicProperties(
+                    content_type="application/json",
+                    delivery_mode=2,
+                    headers=republish.headers,
+                    timestamp=int(republish.headers[ENQUEUED_AT_HEADER]),
+                    expiration=(
+                        str(int(republish.expiration * 1000))
+                        if republish.expiration is not None
+                        else None
+                    ),
+                ),
+            )
+            record_republish(republish)
+
+
+def retry_attempts(headers: Optional[dict[str, Any]]) -> int:
+    """
+    Get the number of delivery attempts already made for a message (0 if it is not a retry).
+    """
+    return int((headers or {}).get(ATTEMPTS_HEADER, 0))
+
+
+def enqueued_at(
+    headers: Optional[dict[str, Any]], timestamp: Optional[float]
+) -> Optional[float]:
+    """
+    Get when a message was first published: the retry header if it has been
+    retried, its AMQP timestamp otherwise.
+    """
+    original = (headers or {}).get(ENQUEUED_AT_HEADER)
+    return float(original) if original is not None else timestamp
+
+
+def record_republish(republish: Republish) -> None:
+    """
+    Log and count a published retry or dead letter.
+    """
+    for channel in republish.channels:
+        if republish.kind == "retry":
+            RETRIES_SCHEDULED.labels(channel=channel).inc()
+        else:
+            MESSAGES_DEAD_LETTERED.labels(channel=channel).inc()
+    if republish.kind == "retry":
+        logging.warning(
+            "Retrying %s in %.1fs (attempt %s)",
+            republish.channels,
+            republish.expiration,
+            republish.headers[ATTEMPTS_HEADER] + 1,
+        )
+    else:
+        logging.error(
+            "Dead-lettered message for %s: %s",
+            republish.channels,
+            republish.headers.get(ERROR_HEADER),
+        )
@@ -1,9 +1,13 @@
-from typing import Any
+import logging
+from typing import Any, Generic, Optional, TypeVar
 
 from src.logging_config import setup_logging
 
 setup_logging()
 
+# Notifier type: the sync and async runtimes share the routing logic
+N = TypeVar("N")
+
 
 def get_target_notifiers(message: dict[str, Any]) -> list[str]:
     """
@@ -21,3 +25,110 @@ def get_target_notifiers(message: dict[str, Any]) -> list[str]:
         # Allow comma-separated string
         return [c.strip() for c in channels.split(",") if c.strip()]
     return channels if isinstance(channels, list) else ["ntfy"]
+
+
+class RoutingTable(Generic[N]):
+    """
+    Channel -> notifier routes, compiled once from the configured notifiers.
+
+    Every decision that does not depend on the message (which channels exist,
+    which Pushover app is the default) is made here at startup, so resolving a
+    message is a dict lookup per channel.
+    """
+
+    def __init__(
+        self,
+        notifiers: dict[str, N],
+        pushover_notifiers: dict[str, N],
+        apprise_urls: dict[str, Optional[str]],
+    ):
+        """
+        Args:
+            notifiers: Notifiers by name ("apprise", "mattermost", "ntfy-direct", "pushover-direct")
+            pushover_notifiers: Pushover notifiers by app identifier
+            apprise_urls: Configured Apprise URLs by channel
+        """
+        self.direct: dict[str, N] = {
+            channel: notifiers[channel]
+            for channel in ("mattermost", "ntfy-direct")
+            if channel in notifiers
+        }
+        self.apprise: Optional[N] = notifiers.get("apprise")
+        self.apprise_channels = frozenset(
+            channel for channel, url in apprise_urls.items() if url
+        )
+        self.pushover_apps = dict(pushover_notifiers)
+        self.pushover_default = self._default_pushover(notifiers, pushover_notifiers)
+        self.pushover_default_app = next(
+            (
+                app_id
+                for app_id, notifier in self.pushover_apps.items()
+                if notifier is self.pushover_default
+            ),
+            None,
+        )
+
+    @staticmethod
+    def _default_pushover(
+        notifiers: dict[str, N], pushover_notifiers: dict[str, N]
+    ) -> Optional[N]:
+        """
+        Pick the Pushover notifier used when a message does not name a known app.
+        """
+        if "pushover-direct" in notifiers:
+            # Single app, registered as "pushover-direct" for backward compatibility
+            return notifiers["pushover-direct"]
+        if "default" in pushover_notifiers:
+            # Several apps: prefer "default" (from APPRISE_PUSHOVER_URL)
+            logging.info("Messages without a known pushover_app use the 'default' app")
+            return pushover_notifiers["default"]
+        if pushover_notifiers:
+            default_app = next(iter(pushover_notifiers))
+            logging.warning(
+                f"No 'default' Pushover app, messages without a known pushover_app use: {default_app}"
+            )
+            return pushover_notifiers[default_app]
+        return None
+
+    def pushover_app(self, kwargs: dict[str, Any]) -> Optional[str]:
+        """
+        Get the Pushover app a message is delivered through: its pushover_app
+        if that app is configured, the default app otherwise.
+        """
+        app_id = kwargs.get("pushover_app")
+        return app_id if app_id in self.pushover_apps else self.pushover_default_app
+
+    def resolve(
+        self, channels: list[str], kwargs: dict[str, Any]
+    ) -> tuple[list[tuple[N, list[str]]], list[str]]:
+        """
+        Resolve the requested channels to the notifiers that will deliver them.
+
+        Every channel gets a target of its own, Apprise channels included, so
+        each one is rate limited, circuit broken and retried on its own.
+        Args:
+            channels: List of channels to notify
+            kwargs: Extra arguments for dynamic routing (e.g., pushover_app)
+        Returns:
+            A tuple of (targets, unroutable) where targets is a list of
+            (notifier, channels) pairs and unroutable lists channels with no notifier.
+        """
+        targets: list[tuple[N, list[str]]] = []
+        unroutable: list[str] = []
+        for channel in channels:
+            if (notifier := self.direct.get(channel)) is not None:
+                targets.append((notifier, [channel]))
+            elif channel == "pushover-direct":
+                pushover_notifier = (
+                    self.pushover_apps.get(self.pushover_app(kwargs))
+                    or self.pushover_default
+                )
+                if pushover_notifier is not None:
+                    targets.append((pushover_notifier, ["pushover-direct"]))
+                else:
+                    unroutable.append(channel)
+            elif channel in self.apprise_channels and self.apprise is not None:
+                targets.append((self.apprise, [channel]))
+            else:
+                unroutable.append(channel)
+        return targets, unroutable
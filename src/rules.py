@@ -0,0 +1,289 @@
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Optional
+
+import yaml
+
+from src.logging_config import setup_logging
+from src.metrics import ROUTING_RULES_LOADED, ROUTING_RULES_RELOADS
+
+setup_logging()
+
+
+class Rule:
+    """
+    One routing rule: conditions on message fields and the routing they select.
+    """
+
+    __slots__ = ("name", "exact", "regex", "channels", "extra", "stop")
+
+    def __init__(
+        self,
+        name: str,
+        exact: dict[str, frozenset[str]],
+        regex: dict[str, re.Pattern],
+        channels: list[str],
+        extra: dict[str, Any],
+        stop: bool = False,
+    ):
+        """
+        Args:
+            name: Rule name, for logs.
+            exact: Field -> accepted values (lowercase). List fields such as tags match if any element is accepted.
+            regex: Field -> pattern the field must match (re.search semantics).
+            channels: Channels the rule routes to.
+            extra: Routing fields (ntfy_topic, pushover_app, priority, ...) applied unless the message sets them.
+            stop: Do not evaluate later rules if this one matches.
+        """
+        self.name = name
+        self.exact = exact
+        self.regex = regex
+        self.channels = channels
+        self.extra = extra
+        self.stop = stop
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any], position: int) -> "Rule":
+        """
+        Build a rule from its file representation.
+
+        Keys of "match" ending in "_regex" are patterns for the field without
+        the suffix (e.g. title_regex); every other key is an exact value or a
+        list of alternatives.
+        """
+        name = str(data.get("name", f"rule-{position}"))
+        channels = data.get("channels") or []
+        if isinstance(channels, str):
+            channels = [c.strip() for c in channels.split(",") if c.strip()]
+        if not channels:
+            raise ValueError(f"Rule '{name}' has no channels")
+        exact: dict[str, frozenset[str]] = {}
+        regex: dict[str, re.Pattern] = {}
+        for field, value in (data.get("match") or {}).items():
+            if field.endswith("_regex"):
+                regex[field[: -len("_regex")]] = re.compile(str(value))
+            else:
+                values = value if isinstance(value, list) else [value]
+                exact[field] = frozenset(str(v).lower() for v in values)
+        return cls(
+            name,
+            exact,
+            regex,
+            list(channels),
+            dict(data.get("extra") or {}),
+            bool(data.get("stop", False)),
+        )
+
+
+def _field_values(value: Any) -> list[str]:
+    if isinstance(value, list):
+        return [str(v).lower() for v in value]
+    return [str(value).lower()]
+
+
+class RoutingRules:
+    """
+    Declarative routing rules compiled into an index.
+
+    Exact conditions are looked up in per-field hash maps, so thousands of
+    exact rules cost one lookup per indexed field. Regex conditions are
+    compiled once and grouped by field, and only run for fields the message
+    has. (One big alternation of every pattern was measured to be about 100x
+    slower than separate patterns with CPython's re, which cannot optimize
+    large alternations.) Only the rules found this way are checked in full.
+    """
+
+    def __init__(self, rules: list[Rule]):
+        """
+        Args:
+            rules: Rules in priority order.
+        """
+        self.rules = rules
+        self._exact: dict[str, dict[str, list[int]]] = {}
+        self._always: list[int] = []
+        self._regex: dict[str, list[tuple[int, re.Pattern]]] = {}
+        for i, rule in enumerate(rules):
+            for field, values in rule.exact.items():
+                index = self._exact.setdefault(field, {})
+                for value in values:
+                    index.setdefault(value, []).append(i)
+            for field, pattern in rule.regex.items():
+                self._regex.setdefault(field, []).append((i, pattern))
+            if not rule.exact and not rule.regex:
+                self._always.append(i)
+
+    @classmethod
+    def from_pairs(cls, pairs: list[tuple[str, str, list[str]]]) -> "RoutingRules":
+        """
+        Build rules from (field, value, channels) triples, as parsed from ROUTING_RULES.
+        """
+        return cls(
+            [
+                Rule(
+                    f"{field}={value}",
+                    {field: frozenset([value.lower()])},
+                    {},
+                    channels,
+                    {},
+                )
+                for field, value, channels in pairs
+            ]
+        )
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def candidates(self, message: dict[str, Any]) -> tuple[list[int], dict[int, int]]:
+        """
+        Find the rules that may match a message.
+        Returns:
+            The candidate rule positions, sorted, and the number of regex
+            conditions that matched for each position.
+        """
+        found = set(self._always)
+        for field, index in self._exact.items():
+            if (value := message.get(field)) is not None:
+                for v in _field_values(value):
+                    found.update(index.get(v, ()))
+        regex_hits: dict[int, int] = {}
+        for field, patterns in self._regex.items():
+            value = message.get(field)
+            if value is None:
+                continue
+            text = str(value)
+            for i, pattern in patterns:
+                if pattern.search(text):
+                    regex_hits[i] = regex_hits.get(i, 0) + 1
+        found.update(regex_hits)
+        return sorted(found), regex_hits
+
+    def match(self, message: dict[str, Any]) -> tuple[list[str], dict[str, Any]]:
+        """
+        Evaluate the rules for a message.
+        Returns:
+            The channels of every matching rule, and their merged routing extras
+            (earlier rules win).
+        """
+        channels: list[str] = []
+        extra: dict[str, Any] = {}
+        candidates, regex_hits = self.candidates(message)
+        for i in candidates:
+            rule = self.rules[i]
+            if not self._matches(rule, message, regex_hits.get(i, 0)):
+                continue
+            channels.extend(c for c in rule.channels if c not in channels)
+            for key, value in rule.extra.items():
+                extra.setdefault(key, value)
+            if rule.stop:
+                break
+        return channels, extra
+
+    @staticmethod
+    def _matches(rule: Rule, message: dict[str, Any], regex_hits: int) -> bool:
+        if regex_hits != len(rule.regex):
+            return False
+        for field, values in rule.exact.items():
+            value = message.get(field)
+            if value is None or values.isdisjoint(_field_values(value)):
+                return False
+        return True
+
+
+def load_rules_file(path: str) -> list[Rule]:
+    """
+    Load routing rules from a YAML or JSON file.
+    Args:
+        path: File path. Files ending in .json are parsed as JSON, anything else as YAML.
+    Returns:
+        The rules, in file order.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f) if path.endswith(".json") else yaml.safe_load(f)
+    if isinstance(data, dict):
+        data = data.get("rules")
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a list of rules or a 'rules' key")
+    return [Rule.from_dict(rule, i) for i, rule in enumerate(data)]
+
+
+class RulesLoader:
+    """
+    Holds the current routing rules and reloads the rules file when it changes.
+
+    Rules from ROUTING_RULES are evaluated after the file's rules. A file that
+    fails to load is logged and the previous rules are kept.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        pairs: list[tuple[str, str, list[str]]],
+        reload_interval: float = 5.0,
+    ):
+        """
+        Args:
+            path: Rules file, or None.
+            pairs: (field, value, channels) rules from ROUTING_RULES.
+            reload_interval: Seconds between checks for a changed file (0 disables reloading).
+        """
+        self.path = path
+        self.extra_rules = RoutingRules.from_pairs(pairs).rules
+        self.reload_interval = reload_interval
+        self._mtime: Optional[float] = None
+        self._stop = threading.Event()
+        self.current = RoutingRules(self.extra_rules)
+        if path:
+            self.reload(raise_errors=True)
+
+    def reload(self, raise_errors: bool = False) -> bool:
+        """
+        Load the rules file and swap in the compiled rules.
+        Args:
+            raise_errors: Raise load errors instead of logging them.
+        Returns:
+            True if new rules were loaded.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime
+            rules = RoutingRules(load_rules_file(self.path) + self.extra_rules)
+        except Exception as e:
+            ROUTING_RULES_RELOADS.labels(result="error").inc()
+            if raise_errors:
+                raise
+            logging.error(f"Failed to reload routing rules from {self.path}: {e}")
+            return False
+        self._mtime = mtime
+        self.current = rules
+        ROUTING_RULES_LOADED.set(len(rules))
+        ROUTING_RULES_RELOADS.labels(result="success").inc()
+        logging.info(f"Loaded {len(rules)} routing rules from {self.path}")
+        return True
+
+    def start(self) -> None:
+        """
+        Start watching the rules file for changes.
+        """
+        if not self.path or self.reload_interval <= 0:
+            return
+        threading.Thread(
+            target=self._watch, name="notifiq-rules-reload", daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        """
+        Stop watching the rules file.
+        """
+        self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.reload_interval):
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError as e:
+                logging.warning(f"Cannot stat routing rules file {self.path}: {e}")
+                continue
+            if mtime != self._mtime:
+                self.reload()
@@ -0,0 +1,177 @@
+import json
+import logging
+from typing import Optional
+
+from pika import BasicProperties
+from pika.adapters.blocking_connection import BlockingChannel
+from pika.spec import Basic
+
+from src.config import Config
+from src.logging_config import setup_logging
+from src.metrics import SHARD_DEPTH, SHARD_MESSAGES
+from src.notification import InvalidMessage, decode_notification
+from src.rules import RoutingRules
+
+setup_logging()
+
+
+class Shard:
+    """
+    One channel shard: a queue and the consumer pool it is delivered by.
+    """
+
+    __slots__ = ("name", "queue", "workers", "prefetch")
+
+    def __init__(self, name: str, queue: str, workers: int, prefetch: int):
+        """
+        Args:
+            name: The channel, or "default" for channels without a shard of their own.
+            queue: The shard's queue.
+            workers: Worker threads delivering from this shard.
+            prefetch: Unacknowledged messages in flight from this shard.
+        """
+        self.name = name
+        self.queue = queue
+        self.workers = workers
+        self.prefetch = prefetch
+
+
+class ChannelShards:
+    """
+    Splits the ingress queue into one queue per channel.
+
+    Messages published to the main queue are split by channel (after routing
+    rules) and republished to their shards' queues, with only that shard's
+    channels. Each shard is delivered by its own consumer pool, so a slow
+    provider only backs up its own queue. Channels without a shard of their
+    own share the default shard.
+    """
+
+    def __init__(
+        self,
+        queue: str,
+        shards: list[tuple[str, int, int]],
+        default_workers: int,
+        default_prefetch: int,
+    ):
+        """
+        Args:
+            queue: The ingress queue; shard queues are named "<queue>.channel.<channel>".
+            shards: (channel, workers, prefetch) triples.
+            default_workers: Workers of the default shard.
+            default_prefetch: Prefetch window of the default shard.
+        """
+        self.queue = queue
+        self.by_channel = {
+            channel: Shard(channel, f"{queue}.channel.{channel}", workers, prefetch)
+            for channel, workers, prefetch in shards
+        }
+        self.default = Shard(
+            "default", f"{queue}.channel.default", default_workers, default_prefetch
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.by_channel)
+
+    @property
+    def shards(self) -> list[Shard]:
+        return [*self.by_channel.values(), self.default]
+
+    def split(
+        self, body: bytes, rules: Optional[RoutingRules] = None
+    ) -> list[tuple[Shard, bytes]]:
+        """
+        Split a message body by shard.
+
+        When a message spans several shards, each part's dedup_key gets the
+        shard name appended, so deduplication does not drop the other parts.
+        Bodies that are not valid notifications go to the default shard
+        unchanged, where they are rejected as usual.
+        Args:
+            body: Message body (JSON).
+            rules: Routing rules for messages that do not list their channels.
+        Returns:
+            (shard, body) pairs.
+        """
+        try:
+            notification = decode_notification(body, rules)
+        except InvalidMessage:
+            return [(self.default, body)]
+        groups: dict[str, list[str]] = {}
+        for channel in notification.channels:
+            shard = self.by_channel.get(channel, self.default)
+            groups.setdefault(shard.name, []).append(channel)
+        parts = []
+        for name, channels in groups.items():
+            part = notification.replace(channels=channels)
+            if part.dedup_key is not None and len(groups) > 1:
+                part = part.replace(dedup_key=f"{part.dedup_key}#{name}")
+            shard = self.by_channel.get(name, self.default)
+            parts.append((shard, json.dumps(part.to_dict()).encode("utf-8")))
+        return parts
+
+    def setup(self, channel: BlockingChannel) -> None:
+        """
+        Declare the shard queues.
+        """
+        for shard in self.shards:
+            channel.queue_declare(queue=shard.queue, durable=True)
+
+    def on_ingress(
+        self,
+        ch: BlockingChannel,
+        method: Basic.Deliver,
+        properties: BasicProperties,
+        body: bytes,
+        rules: Optional[RoutingRules] = None,
+    ) -> None:
+        """
+        pika callback for the ingress queue: move a message to its shards.
+
+        The channel must be in confirm mode, so the message is only acked once
+        the broker holds every part. If a publish fails the message is
+        requeued, and parts already published may be delivered twice.
+        """
+        try:
+            for shard, part in self.split(body, rules):
+                ch.basic_publish(
+                    exchange="",
+                    routing_key=shard.queue,
+                    body=part,
+                    properties=BasicProperties(
+                        content_type="application/json",
+                        delivery_mode=2,
+                        headers=properties.headers,
+                        timestamp=properties.timestamp,
+                    ),
+                )
+                SHARD_MESSAGES.labels(shard=shard.name).inc()
+        except Exception:
+            logging.exception("Failed to split message into channel shards")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            return
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+
+    def record_depths(self, channel: BlockingChannel) -> None:
+        """
+        Export the number of messages waiting in each shard.
+        """
+        for shard in self.shards:
+            declared = channel.queue_declare(
+                queue=shard.queue, durable=True, passive=True
+            )
+            SHARD_DEPTH.labels(shard=shard.name).set(declared.method.message_count)
+
+
+def create_channel_shards(config: Config) -> ChannelShards:
+    """
+    Create the channel shards configured by CHANNEL_SHARDS (disabled if empty).
+    The default shard uses CONSUMER_WORKERS and RABBITMQ_PREFETCH_COUNT.
+    """
+    return ChannelShards(
+        config.rabbitmq_queue,
+        config.channel_shards,
+        default_workers=max(1, config.consumer_workers),
+        default_prefetch=config.rabbitmq_prefetch_count,
+    )
@@ -0,0 +1,282 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+from src.config import Config
+from src.delivery import DeliveryResult
+from src.logging_config import setup_logging
+from src.metrics import (
+    SPOOL_DEPTH,
+    SPOOL_DROPPED,
+    SPOOL_REJECTED,
+    SPOOL_REPLAYED,
+    SPOOLED,
+)
+from src.notification import Notification
+from src.retry import RetryPolicy
+
+setup_logging()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    next_attempt REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pending_next_attempt ON pending (next_attempt);
+"""
+
+# Delivers a notification without spooling it again
+DeliverFn = Callable[[Notification], DeliveryResult]
+
+
+class Spool:
+    """
+    Durable outbox of deliveries, in a SQLite database in WAL mode.
+
+    A notification is recorded before it is sent and cleared once every
+    channel has been delivered. Channels that failed stay in the spool and
+    are replayed by a background drainer, with backoff and at a bounded rate,
+    until they are delivered or older than max_age. Entries are leased while
+    they are being sent, so a notification interrupted by a crash is replayed
+    after a restart, and several processes can share one spool file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int,
+        replay_rate: float,
+        max_age: float,
+        lease: float,
+        backoff: RetryPolicy,
+        poll_interval: float = 1.0,
+    ):
+        """
+        Args:
+            path: Database file.
+            max_bytes: Maximum size of the database. Deliveries are not spooled once it is full.
+            replay_rate: Replays per second.
+            max_age: Seconds after which spooled deliveries are dropped.
+            lease: Seconds an entry being sent is hidden from the drainer.
+            backoff: Delay between replays of an entry.
+            poll_interval: Seconds between checks for due entries when idle.
+        """
+        self.path = path
+        self.replay_rate = replay_rate
+        self.max_age = max_age
+        self.lease = lease
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Autocommit: every statement is its own (small) transaction
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Durable across process crashes; only an OS crash can lose the last commits
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+        self._db.execute(f"PRAGMA max_page_count={max(16, max_bytes // page_size)}")
+        # Truncate the WAL after checkpoints so it does not keep its peak size
+        self._db.execute(f"PRAGMA journal_size_limit={min(max_bytes, 4 << 20)}")
+        self._db.executescript(SCHEMA)
+
+    def add(self, notification: Notification) -> Optional[int]:
+        """
+        Record a notification before it is sent.
+        Returns:
+            The entry id, or None if it could not be recorded (e.g. the spool is full).
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                cursor = self._db.execute(
+                    "INSERT INTO pending (created, next_attempt, body) VALUES (?, ?, ?)",
+                    (now, now + self.lease, json.dumps(notification.to_dict())),
+                )
+        except sqlite3.Error as e:
+            SPOOL_REJECTED.inc()
+            logging.warning("Could not spool notification: %s", e)
+            return None
+        return cursor.lastrowid
+
+    def settle(
+        self,
+        entry_id: Optional[int],
+        notification: Notification,
+        result: DeliveryResult,
+    ) -> DeliveryResult:
+        """
+        Clear an entry after its first send, or keep its failed channels for replay.
+        Args:
+            entry_id: The entry, as returned by add.
+            notification: The notification that was sent.
+            result: Its delivery result.
+        Returns:
+            The result to settle the message with: spooled channels count as delivered.
+        """
+        if entry_id is None:
+            return result
+        try:
+            if result.delivered or result.invalid:
+                self._delete(entry_id)
+                return result
+            self._defer(entry_id, notification, result, attempts=1)
+        except sqlite3.Error as e:
+            logging.warning("Could not update spool entry %s: %s", entry_id, e)
+            return result
+        for channel in result.failed:
+            SPOOLED.labels(channel=channel).inc()
+        logging.warning("Spooled delivery to %s for replay", result.failed)
+        return DeliveryResult(result.channels)
+
+    def replay_due(self, deliver: DeliverFn, limit: int = 100) -> int:
+        """
+        Replay the entries that are due, at most replay_rate per second.
+        Args:
+            deliver: Sends a notification (without spooling it again).
+            limit: Maximum number of entries to replay.
+        Returns:
+            The number of entries replayed.
+        """
+        now = time.time()
+        with self._lock:
+            due = self._db.execute(
+                "SELECT id, created, next_attempt, attempts, body FROM pending "
+                "WHERE next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+                (now, limit),
+            ).fetchall()
+        replayed = 0
+        for entry_id, created, next_attempt, attempts, body in due:
+            if self._stop.is_set():
+                break
+            notification = Notification.from_dict(json.loads(body))
+            if time.time() - created > self.max_age:
+                self._delete(entry_id)
+                for channel in notification.channels:
+                    SPOOL_DROPPED.labels(channel=channel).inc()
+                logging.error(
+                    "Dropped spooled delivery to %s after %ss",
+                    notification.channels,
+                    self.max_age,
+                )
+                continue
+            if not self._take(entry_id, next_attempt):
+                # Leased by another process
+                continue
+            try:
+                result = deliver(notification)
+            except Exception:
+                logging.exception("Error replaying spooled delivery")
+                result = DeliveryResult(
+                    notification.channels, failed=list(notification.channels)
+                )
+            if result.delivered or result.invalid:
+                self._delete(entry_id)
+                for channel in result.channels:
+                    SPOOL_REPLAYED.labels(channel=channel).inc()
+            else:
+                self._defer(entry_id, notification, result, attempts=attempts + 1)
+                for channel in set(result.channels) - set(result.failed):
+                    SPOOL_REPLAYED.labels(channel=channel).inc()
+            replayed += 1
+            if self.replay_rate > 0:
+                self._stop.wait(1 / self.replay_rate)
+        return replayed
+
+    def depth(self) -> int:
+        """
+        Get the number of deliveries waiting in the spool.
+        """
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def start(self, deliver: DeliverFn) -> None:
+        """
+        Start the drainer thread.
+        Args:
+            deliver: Sends a notification (without spooling it again).
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._drain, args=(deliver,), name="notifiq-spool", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Stop the drainer. Pending entries stay on disk for the next start.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _drain(self, deliver: DeliverFn) -> None:
+        while not self._stop.is_set():
+            try:
+                replayed = self.replay_due(deliver)
+                SPOOL_DEPTH.set(self.depth())
+            except Exception:
+                logging.exception("Error draining the spool")
+                replayed = 0
+            if not replayed:
+                self._stop.wait(self.poll_interval)
+
+    def _take(self, entry_id: int, next_attempt: float) -> bool:
+        """
+        Lease a due entry, unless another process has leased it first.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE pending SET next_attempt = ? WHERE id = ? AND next_attempt = ?",
+                (time.time() + self.lease, entry_id, next_attempt),
+            )
+        return cursor.rowcount == 1
+
+    def _defer(
+        self,
+        entry_id: int,
+        notification: Notification,
+        result: DeliveryResult,
+        attempts: int,
+    ) -> None:
+        """
+        Keep only the failed channels of an entry and schedule its next replay.
+        """
+        body = json.dumps(notification.replace(channels=result.failed).to_dict())
+        delay = self.backoff.delay(attempts, result.retry_after)
+        with self._lock:
+            self._db.execute(
+                "UPDATE pending SET body = ?, attempts = ?, next_attempt = ? WHERE id = ?",
+                (body, attempts, time.time() + delay, entry_id),
+            )
+
+    def _delete(self, entry_id: int) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM pending WHERE id = ?", (entry_id,))
+
+
+def create_spool(config: Config) -> Optional[Spool]:
+    """
+    Create the spool from configuration.
+    Returns:
+        The spool, or None if SPOOL_PATH is not set.
+    """
+    if not config.spool_path:
+        return None
+    return Spool(
+        config.spool_path,
+        max_bytes=config.spool_max_bytes,
+        replay_rate=config.spool_replay_rate,
+        max_age=config.spool_max_age,
+        lease=config.dispatch_timeout + 5,
+        backoff=RetryPolicy(0, config.retry_base_delay, config.retry_max_delay),
+    )
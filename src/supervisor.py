@@ -0,0 +1,146 @@
+import glob
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from multiprocessing.process import BaseProcess
+from typing import Callable, Optional
+
+from prometheus_client import multiprocess
+
+from src.logging_config import setup_logging
+
+setup_logging()
+
+
+def prepare_multiprocess_metrics() -> str:
+    """
+    Enable prometheus_client multiprocess mode for worker processes.
+
+    Uses PROMETHEUS_MULTIPROC_DIR if set, otherwise creates a temporary
+    directory and exports it so spawned workers inherit it. Metric files left
+    over from a previous run are removed.
+    Returns:
+        The multiprocess metrics directory.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        path = tempfile.mkdtemp(prefix="notifiq-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    logging.info(f"Prometheus multiprocess metrics directory: {path}")
+    return path
+
+
+class Supervisor:
+    """
+    Runs N consumer processes on the same queue and restarts any that exit unexpectedly.
+
+    Workers are started with the 'spawn' method so each one imports notifiq
+    from scratch (with multiprocess metrics enabled) instead of inheriting the
+    supervisor's threads and connections.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        target: Callable[[], None],
+        should_stop: Callable[[], bool],
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 30.0,
+        shutdown_timeout: float = 30.0,
+    ):
+        """
+        Args:
+            workers: Number of worker processes.
+            target: Module-level function each worker runs.
+            should_stop: Returns True once the supervisor has been asked to shut down.
+            restart_delay: Initial delay before restarting a crashed worker (seconds).
+            max_restart_delay: Upper bound for the restart delay of a crash-looping worker.
+            shutdown_timeout: Seconds to wait for workers to exit gracefully before killing them.
+        """
+        self.workers = workers
+        self.target = target
+        self.should_stop = should_stop
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.shutdown_timeout = shutdown_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: list[Optional[BaseProcess]] = [None] * workers
+        self._started_at: list[float] = [0.0] * workers
+        self._failures: list[int] = [0] * workers
+        self._restart_at: list[float] = [0.0] * workers
+
+    def run(self) -> None:
+        """
+        Start the workers and supervise them until should_stop() returns True.
+        """
+        logging.info(f"Starting {self.workers} worker processes")
+        for slot in range(self.workers):
+            self._start(slot)
+        while not self.should_stop():
+            now = time.monotonic()
+            for slot, process in enumerate(self._processes):
+                if process is not None and not process.is_alive():
+                    self._reap(slot, process, now)
+                elif process is None and now >= self._restart_at[slot]:
+                    self._start(slot)
+            time.sleep(0.5)
+        self._stop_all()
+
+    def _start(self, slot: int) -> None:
+        process = self._context.Process(
+            target=self.target, name=f"notifiq-worker-{slot}", daemon=False
+        )
+        process.start()
+        self._processes[slot] = process
+        self._started_at[slot] = time.monotonic()
+        logging.info(f"Started worker {slot} (pid {process.pid})")
+
+    def _reap(self, slot: int, process: BaseProcess, now: float) -> None:
+        """
+        Clean up after a worker that exited and schedule its restart.
+        """
+        process.join()
+        self._mark_dead(process)
+        # Workers that die shortly after starting back off exponentially
+        if now - self._started_at[slot] < self.max_restart_delay:
+            self._failures[slot] += 1
+        else:
+            self._failures[slot] = 0
+        delay = min(
+            self.restart_delay * 2 ** max(self._failures[slot] - 1, 0),
+            self.max_restart_delay,
+        )
+        logging.error(
+            f"Worker {slot} (pid {process.pid}) exited with code {process.exitcode}, restarting in {delay:.1f}s"
+        )
+        self._processes[slot] = None
+        self._restart_at[slot] = now + delay
+
+    def _stop_all(self) -> None:
+        """
+        Ask every worker to shut down gracefully, killing any that do not exit in time.
+        """
+        alive = [p for p in self._processes if p is not None and p.is_alive()]
+        logging.info(f"Stopping {len(alive)} worker processes")
+        for process in alive:
+            process.terminate()  # SIGTERM -> handle_shutdown in the worker
+        deadline = time.monotonic() + self.shutdown_timeout
+        for process in alive:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logging.warning(
+                    f"Worker pid {process.pid} did not exit in time, killing it"
+                )
+                process.kill()
+                process.join()
+            self._mark_dead(process)
+
+    @staticmethod
+    def _mark_dead(process: BaseProcess) -> None:
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR") and process.pid is not None:
+            multiprocess.mark_process_dead(process.pid)
@@ -0,0 +1,105 @@
+import itertools
+import threading
+import time
+
+import pytest
+from pika.spec import Basic, BasicProperties
+
+
+class FakeConnection:
+    """
+    Stands in for pika's BlockingConnection: threadsafe callbacks run in
+    process_data_events, on the thread that calls it.
+    """
+
+    def __init__(self):
+        self.is_open = True
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add_callback_threadsafe(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def process_data_events(self, time_limit=0):
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class FakeChannel:
+    """
+    Stands in for a BlockingChannel and the broker behind it: messages are
+    delivered to consumers up to the prefetch window set before basic_consume,
+    and acks/nacks are recorded with the thread they were made on.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.is_open = True
+        self.prefetch = 0
+        self.consumers = {}
+        self.queues = {}
+        self.unacked = {}
+        self.settled = []
+        self._tags = itertools.count(1)
+
+    def basic_qos(self, prefetch_count):
+        self.prefetch = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback, auto_ack):
+        tag = f"ctag-{queue}"
+        self.consumers[tag] = (queue, on_message_callback, self.prefetch)
+        return tag
+
+    def basic_cancel(self, consumer_tag):
+        self.consumers.pop(consumer_tag, None)
+
+    def publish(self, queue, body, headers=None):
+        self.queues.setdefault(queue, []).append((body, headers))
+
+    def deliver(self):
+        """
+        Push queued messages to consumers with room in their prefetch window.
+        """
+        for tag, (queue, callback, prefetch) in list(self.consumers.items()):
+            pending = self.queues.get(queue, [])
+            in_flight = sum(1 for owner, _ in self.unacked.values() if owner == tag)
+            while pending and in_flight < prefetch:
+                body, headers = pending.pop(0)
+                delivery_tag = next(self._tags)
+                self.unacked[delivery_tag] = (tag, (queue, body, headers))
+                in_flight += 1
+                callback(
+                    self,
+                    Basic.Deliver(consumer_tag=tag, delivery_tag=delivery_tag),
+                    BasicProperties(headers=headers, timestamp=int(time.time())),
+                    body,
+                )
+
+    def basic_ack(self, delivery_tag):
+        self.unacked.pop(delivery_tag)
+        self.settled.append(("ack", delivery_tag, threading.current_thread()))
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        _, (queue, body, headers) = self.unacked.pop(delivery_tag)
+        if requeue:
+            self.queues[queue].insert(0, (body, headers))
+        self.settled.append(("nack", delivery_tag, threading.current_thread(), requeue))
+
+    def run_until(self, done, timeout=5):
+        """
+        Drive the connection on the calling thread until done() or the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            self.deliver()
+            self.connection.process_data_events()
+            time.sleep(0.005)
+        return done()
+
+
+@pytest.fixture
+def fake_channel():
+    return FakeChannel(FakeConnection())
@@ -0,0 +1,59 @@
+from prometheus_client import REGISTRY
+
+from src.notifiers import apprise_cache
+from src.notifiers.apprise_cache import AppriseCache
+from src.notifiers.apprise_notifier import AppriseNotifier
+
+NTFY = "ntfys://ntfy.example.com/{}"
+
+
+def test_plugins_are_reused_and_evicted_least_recently_used_first():
+    cache = AppriseCache(max_size=2, ttl=0)
+    ops = cache.get(NTFY.format("ops"))
+    dev = cache.get(NTFY.format("dev"))
+
+    assert cache.get(NTFY.format("ops")) is ops
+    # "dev" is now the least recently used
+    cache.get(NTFY.format("infra"))
+
+    assert cache.get(NTFY.format("ops")) is ops
+    assert cache.get(NTFY.format("dev")) is not dev
+
+
+def test_expired_plugins_are_rebuilt():
+    cache = AppriseCache(max_size=2, ttl=-1)
+    ops = cache.get(NTFY.format("ops"))
+
+    assert cache.get(NTFY.format("ops")) is not ops
+
+
+def test_size_gauge_follows_expiry(monkeypatch):
+    """
+    The size gauge drops as soon as an expired plugin is removed, even if it
+    cannot be rebuilt.
+    """
+    now = [1000.0]
+    monkeypatch.setattr(apprise_cache.time, "monotonic", lambda: now[0])
+    cache = AppriseCache(max_size=2, ttl=60)
+    cache.get(NTFY.format("ops"))
+    assert REGISTRY.get_sample_value("notifiq_apprise_cache_size") == 1
+
+    now[0] += 60
+    monkeypatch.setattr(apprise_cache.apprise.Apprise, "instantiate", lambda url: None)
+
+    assert cache.get(NTFY.format("ops")) is None
+    assert REGISTRY.get_sample_value("notifiq_apprise_cache_size") == 0
+
+
+def test_per_message_overrides_get_their_own_plugin():
+    """
+    A topic override never reuses the plugin built for another topic.
+    """
+    notifier = AppriseNotifier({"ntfy": NTFY.format("alerts")}, cache=AppriseCache())
+
+    (ops,) = notifier.build(["ntfy"], {"ntfy_topic": "ops"})
+    (dev,) = notifier.build(["ntfy"], {"ntfy_topic": "dev"})
+    (default,) = notifier.build(["ntfy"], {})
+
+    assert (ops.topics, dev.topics, default.topics) == (["ops"], ["dev"], ["alerts"])
+    assert notifier.build(["ntfy"], {"ntfy_topic": "ops"})[0] is ops
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+
+import httpx
+
+from src.async_runtime import AsyncRuntime
+from src.config import Config
+
+
+def make_runtime(monkeypatch, handler):
+    """
+    Build an AsyncRuntime whose direct notifiers talk to an in-memory transport.
+    """
+    for key in list(os.environ):
+        if key.startswith("APPRISE_"):
+            monkeypatch.delenv(key)
+    monkeypatch.setenv("APPRISE_NTFY_URL", "ntfys://ntfy.example.com/alerts")
+    monkeypatch.setenv("APPRISE_PUSHOVER_INFRA_URL", "pover://user@token")
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return AsyncRuntime(Config(), http_client=client)
+
+
+def test_handle_delivers_to_all_direct_channels(monkeypatch):
+    """
+    A message for ntfy-direct and pushover-direct is posted to both providers.
+    """
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200)
+
+    runtime = make_runtime(monkeypatch, handler)
+    body = json.dumps(
+        {
+            "title": "Disk full",
+            "message": "/var is at 99%",
+            "channels": ["ntfy-direct", "pushover-direct"],
+            "ntfy_topic": "ops",
+        }
+    ).encode()
+
+    async def run():
+        try:
+            return await runtime.handle(body)
+        finally:
+            await runtime.close()
+
+    assert asyncio.run(run()).delivered
+    urls = sorted(str(r.url) for r in requests)
+    assert urls == [
+        "https://api.pushover.net/1/messages.json",
+        "https://ntfy.example.com/ops",
+    ]
+
+
+def test_handle_reports_unroutable_channels(monkeypatch):
+    """
+    A channel with no configured notifier makes the message count as failed.
+    """
+    runtime = make_runtime(monkeypatch, lambda request: httpx.Response(200))
+    body = json.dumps({"title": "t", "message": "m", "channels": ["slack"]}).encode()
+
+    async def run():
+        try:
+            return await runtime.handle(body)
+        finally:
+            await runtime.close()
+
+    result = asyncio.run(run())
+    assert result.failed == ["slack"]
+    assert not result.invalid
+
+
+def test_handle_reports_retry_after(monkeypatch):
+    """
+    A throttled provider fails the channel and passes on its Retry-After.
+    """
+    runtime = make_runtime(
+        monkeypatch, lambda request: httpx.Response(429, headers={"Retry-After": "42"})
+    )
+    body = json.dumps(
+        {"title": "t", "message": "m", "channels": ["ntfy-direct"]}
+    ).encode()
+
+    async def run():
+        try:
+            return await runtime.handle(body)
+        finally:
+            await runtime.close()
+
+    result = asyncio.run(run())
+    assert result.failed == ["ntfy-direct"]
+    assert result.retry_after == 42
+
+
+def test_handle_rejects_invalid_json(monkeypatch):
+    """
+    Bodies that are not JSON are reported as invalid instead of raising.
+    """
+    runtime = make_runtime(monkeypatch, lambda request: httpx.Response(200))
+
+    async def run():
+        try:
+            return await runtime.handle(b"not json")
+        finally:
+            await runtime.close()
+
+    assert asyncio.run(run()).invalid
@@ -0,0 +1,102 @@
+import pytest
+
+from src import circuit_breaker
+from src.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakers,
+    CircuitOpenError,
+    endpoint_keys,
+)
+from src.routing import RoutingTable
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Manual monotonic clock for the breakers.
+    """
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_breaker():
+    return CircuitBreaker(
+        "gotify:ops", failure_rate=0.5, min_calls=2, window=60, open_duration=30
+    )
+
+
+def trip(breaker):
+    for _ in range(2):
+        breaker.allow()
+        breaker.record(False)
+
+
+def test_circuit_opens_then_closes_after_a_successful_probe(clock):
+    breaker = make_breaker()
+    trip(breaker)
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.allow()
+    assert raised.value.retry_after == 30
+
+    clock[0] += 30
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    breaker.allow()
+
+
+def test_failed_probe_reopens_the_circuit(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock[0] += 30
+    breaker.allow()
+
+    breaker.record(False)
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    clock[0] += 30
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+
+def test_breakers_are_keyed_by_configured_endpoint():
+    """
+    Message fields never create breakers: every ntfy topic shares the ntfy
+    endpoint's breaker, and an unknown pushover_app uses the default app's.
+    """
+    table = RoutingTable(
+        {}, {"default": "pushover:default", "infra": "pushover:infra"}, {}
+    )
+    breakers = CircuitBreakers(True, 0.5, 2, 60, 30)
+
+    for n in range(50):
+        kwargs = {"ntfy_topic": f"topic-{n}", "pushover_app": f"app-{n}"}
+        breakers.allow(
+            endpoint_keys(
+                ["ntfy-direct", "pushover-direct"], table.pushover_app(kwargs)
+            )
+        )
+    breakers.allow(
+        endpoint_keys(
+            ["pushover-direct"], table.pushover_app({"pushover_app": "infra"})
+        )
+    )
+
+    assert breakers.states() == {
+        "ntfy-direct": CLOSED,
+        "pushover-direct:default": CLOSED,
+        "pushover-direct:infra": CLOSED,
+    }
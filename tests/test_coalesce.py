@@ -0,0 +1,87 @@
+import threading
+
+from src.coalesce import Coalescer
+from src.consumer import WindowedConsumer
+from src.delivery import DeliveryResult
+from src.notification import Notification
+
+
+class Recorder:
+    """
+    Dispatch function that records what it sends.
+    """
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def __call__(self, notification, start_time):
+        with self.lock:
+            self.sent.append(notification)
+        if self.fail:
+            return DeliveryResult(notification.channels, failed=notification.channels)
+        return DeliveryResult(notification.channels)
+
+
+def alert(message):
+    return Notification("Disk full", message, ["ntfy"], {"priority": "high"})
+
+
+def test_burst_is_sent_as_one_digest():
+    """
+    The first message goes out at once; the rest of the window becomes a digest.
+    """
+    dispatch = Recorder()
+    coalescer = Coalescer(dispatch, window=0.2)
+
+    futures = [coalescer.add(alert(m)) for m in ("db-1", "db-2", "db-2", "db-3")]
+
+    assert all(f.result(timeout=2).delivered for f in futures)
+    coalescer.close()
+    first, digest = dispatch.sent
+    assert first.message == "db-1"
+    assert digest.title == "Disk full (×3)"
+    assert digest.message == "2× db-2\ndb-3"
+    assert digest.extra == {"priority": "high"}
+
+
+def test_close_flushes_held_notifications():
+    dispatch = Recorder()
+    coalescer = Coalescer(dispatch, window=60)
+    coalescer.add(alert("db-1"))
+    held = coalescer.add(alert("db-2"))
+
+    coalescer.close()
+
+    assert held.done()
+    assert [n.message for n in dispatch.sent] == ["db-1", "db-2"]
+
+
+def test_failed_digest_nacks_every_message(fake_channel):
+    """
+    Every message merged into a digest that failed is nacked, not just one.
+    """
+    dispatch = Recorder(fail=True)
+    coalescer = Coalescer(dispatch, window=60)
+    added = []
+
+    def handler(body, timestamp, headers):
+        future = coalescer.add(alert(body.decode()))
+        added.append(body)
+        return future
+
+    consumer = WindowedConsumer(
+        fake_channel.connection, fake_channel, handler, workers=4
+    )
+    consumer.start("notifications", prefetch_count=10)
+    for message in ("db-1", "db-2", "db-3"):
+        fake_channel.publish("notifications", message.encode())
+    fake_channel.run_until(lambda: len(added) == 3 and fake_channel.settled)
+
+    coalescer.close()
+    assert fake_channel.run_until(lambda: len(fake_channel.settled) == 3)
+    consumer.stop()
+
+    assert len(dispatch.sent) == 2
+    assert [entry[0] for entry in fake_channel.settled] == ["nack"] * 3
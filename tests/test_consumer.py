@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from src.consumer import WindowedConsumer
+from src.delivery import DeliveryResult
+
+
+def start_consumer(fake_channel, handler, prefetch=2, **kwargs):
+    consumer = WindowedConsumer(
+        fake_channel.connection, fake_channel, handler, workers=4, **kwargs
+    )
+    consumer.start("notifications", prefetch_count=prefetch)
+    return consumer
+
+
+def test_prefetch_limits_messages_in_flight(fake_channel):
+    """
+    With a window of 2, no more than 2 of the 4 workers are ever busy, and
+    every message is acked on the connection thread.
+    """
+    lock = threading.Lock()
+    in_flight = [0]
+    peak = [0]
+
+    def handler(body, timestamp, headers):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return DeliveryResult(["ntfy"])
+
+    consumer = start_consumer(fake_channel, handler, prefetch=2)
+    for _ in range(6):
+        fake_channel.publish("notifications", b"{}")
+
+    assert fake_channel.run_until(lambda: len(fake_channel.settled) == 6)
+    consumer.stop()
+
+    assert peak[0] == 2
+    assert {kind for kind, *_ in fake_channel.settled} == {"ack"}
+    assert {entry[2] for entry in fake_channel.settled} == {threading.current_thread()}
+
+
+@pytest.mark.parametrize("requeue", [False, True])
+def test_failed_delivery_is_nacked(fake_channel, requeue):
+    attempts = []
+
+    def handler(body, timestamp, headers):
+        attempts.append(body)
+        if len(attempts) == 1:
+            return DeliveryResult(["ntfy"], failed=["ntfy"])
+        return DeliveryResult(["ntfy"])
+
+    consumer = start_consumer(fake_channel, handler, requeue_on_failure=requeue)
+    fake_channel.publish("notifications", b"{}")
+
+    assert fake_channel.run_until(lambda: fake_channel.settled)
+    fake_channel.run_until(lambda: len(fake_channel.settled) == 2, timeout=0.2)
+    consumer.stop()
+
+    assert fake_channel.settled[0][0] == "nack"
+    assert fake_channel.settled[0][3] is requeue
+    # A requeued message comes back and is delivered
+    assert len(attempts) == (2 if requeue else 1)
@@ -0,0 +1,93 @@
+from src.dedup import Deduplicator, MemoryDedupStore, RedisDedupStore
+from src.notification import Notification
+
+
+class FakeRedis:
+    """
+    Minimal stand-in for the redis client commands used by RedisDedupStore.
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = (value, ex)
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class BrokenStore:
+    def add(self, key):
+        raise ConnectionError("redis is down")
+
+    def discard(self, key):
+        raise ConnectionError("redis is down")
+
+
+def test_memory_store_suppresses_until_ttl_expires(monkeypatch):
+    """
+    A key is a duplicate until its TTL has passed, then it is accepted again.
+    """
+    now = [1000.0]
+    monkeypatch.setattr("src.dedup.time.monotonic", lambda: now[0])
+    dedup = Deduplicator(MemoryDedupStore(max_size=10, ttl=60))
+
+    assert not dedup.is_duplicate("a")
+    assert dedup.is_duplicate("a")
+    now[0] += 61
+    assert not dedup.is_duplicate("a")
+
+
+def test_memory_store_is_bounded():
+    """
+    The oldest keys are evicted once the store is full.
+    """
+    store = MemoryDedupStore(max_size=2, ttl=60)
+    for key in ("a", "b", "c"):
+        store.add(key)
+
+    assert store.add("a")
+    assert not store.add("c")
+
+
+def test_replicas_share_a_redis_store():
+    """
+    Two replicas with their own Deduplicator see each other's keys through Redis.
+    """
+    client = FakeRedis()
+    replica_a = Deduplicator(RedisDedupStore(ttl=30, client=client))
+    replica_b = Deduplicator(RedisDedupStore(ttl=30, client=client))
+    key = Deduplicator.key(
+        Notification("Disk full", "/var at 99%", ["ntfy"], {"ntfy_topic": "ops"})
+    )
+
+    assert not replica_a.is_duplicate(key)
+    assert replica_b.is_duplicate(key)
+    replica_b.forget(key)
+    assert not replica_a.is_duplicate(key)
+    assert client.data[f"notifiq:dedup:{key}"][1] == 30
+
+
+def test_explicit_dedup_key_wins_over_content():
+    """
+    Messages with the same dedup_key are duplicates even if their content differs.
+    """
+    keyed = Notification("a", "1", ["ntfy"], dedup_key="alert-42")
+    assert Deduplicator.key(keyed) == "alert-42"
+    assert Deduplicator.key(Notification("a", "1", ["ntfy"])) != Deduplicator.key(
+        Notification("a", "2", ["ntfy"])
+    )
+
+
+def test_falls_back_to_local_store_when_shared_store_fails():
+    """
+    A broken shared store does not drop notifications.
+    """
+    dedup = Deduplicator(BrokenStore(), fallback=MemoryDedupStore(10, 60))
+
+    assert not dedup.is_duplicate("a")
+    assert dedup.is_duplicate("a")
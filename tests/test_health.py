@@ -0,0 +1,28 @@
+from src.health import ReadinessCheck, report_consumer_state
+from src.metrics import CONSUMER_HEARTBEAT
+
+
+def test_readiness_follows_consumer_state():
+    """
+    Ready only while the consumer reports a connection and a recent heartbeat.
+    """
+    check = ReadinessCheck(ttl=0, max_staleness=5)
+
+    report_consumer_state(True)
+    assert check()[0] == 200
+    report_consumer_state(False)
+    assert check()[1]["reason"] == "consumer not connected to RabbitMQ"
+    report_consumer_state(True)
+    CONSUMER_HEARTBEAT.set(1)
+    assert check()[0] == 503
+
+
+def test_readiness_is_cached():
+    """
+    Within the TTL, probes reuse the previous result.
+    """
+    check = ReadinessCheck(ttl=60, max_staleness=5)
+    report_consumer_state(True)
+    assert check()[0] == 200
+    report_consumer_state(False)
+    assert check()[0] == 200
@@ -0,0 +1,163 @@
+import shutil
+import ssl
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from src import http_client
+from src.config import Config
+from src.http_client import PROVIDER_EXTENSION, create_http_client
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.peers.append(self.client_address)
+        body = b"ok"
+        self.send_response(int(self.headers.get("X-Status", 200)))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(ssl_context=None):
+    """
+    Start a local HTTP/1.1 server that records the client address of every request.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    if ssl_context is not None:
+        server.socket = ssl_context.wrap_socket(server.socket, server_side=True)
+    server.peers = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def stub_server():
+    server = serve()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def tls_stub_server(tmp_path, monkeypatch):
+    """
+    HTTPS variant of stub_server, with a self-signed certificate the client trusts.
+    """
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is needed to create a test certificate")
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+        + ["-keyout", str(key), "-out", str(cert), "-subj", "/CN=127.0.0.1"]
+        + ["-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True,
+        capture_output=True,
+    )
+    monkeypatch.setenv("SSL_CERT_FILE", str(cert))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server = serve(context)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def sample(name, **labels):
+    labels = {"provider": "ntfy", "host": "127.0.0.1", **labels}
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def make_config(monkeypatch, **env):
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    return Config()
+
+
+def test_client_options_follow_the_configuration(monkeypatch):
+    config = make_config(
+        monkeypatch,
+        HTTP_TIMEOUT="4",
+        HTTP_CONNECT_TIMEOUT="1.5",
+        HTTP_MAX_CONNECTIONS="7",
+        HTTP_MAX_KEEPALIVE_CONNECTIONS="3",
+        HTTP_KEEPALIVE_EXPIRY="12",
+        HTTP2="1",
+    )
+
+    options = http_client._client_options(config)
+
+    assert options["http2"] is True
+    assert options["timeout"] == httpx.Timeout(4, connect=1.5)
+    assert options["limits"] == httpx.Limits(
+        max_connections=7, max_keepalive_connections=3, keepalive_expiry=12
+    )
+
+
+def test_http2_falls_back_without_h2(monkeypatch):
+    config = make_config(monkeypatch, HTTP2="1")
+    monkeypatch.setattr(http_client, "http2_available", lambda: False)
+
+    assert http_client._client_options(config)["http2"] is False
+
+
+def test_connections_are_kept_alive_between_requests(monkeypatch, stub_server):
+    """
+    Repeated sends to the same host reuse one pooled connection.
+    """
+    client = create_http_client(make_config(monkeypatch, HTTP2="0"))
+    url = f"http://127.0.0.1:{stub_server.server_port}/alerts"
+
+    with client:
+        for _ in range(3):
+            client.post(url, content=b"hello").raise_for_status()
+
+    assert len(stub_server.peers) == 3
+    assert len(set(stub_server.peers)) == 1
+
+
+def test_request_phases_are_timed_per_provider(monkeypatch, tls_stub_server):
+    """
+    The TLS connect is timed once per connection; every request gets a time to
+    first byte, a total time and a status class, labelled with the provider
+    the notifier named.
+    """
+    before = {
+        "connect": sample("notifiq_http_connect_seconds_count"),
+        "ttfb": sample("notifiq_http_ttfb_seconds_count"),
+        "total": sample("notifiq_http_request_seconds_count"),
+        "2xx": sample("notifiq_http_responses_total", status_class="2xx"),
+        "5xx": sample("notifiq_http_responses_total", status_class="5xx"),
+        "bytes": sample("notifiq_http_bytes_sent_total"),
+    }
+    client = create_http_client(make_config(monkeypatch, HTTP2="0"))
+    url = f"https://127.0.0.1:{tls_stub_server.server_port}/alerts"
+    extensions = {PROVIDER_EXTENSION: "ntfy"}
+
+    with client:
+        client.post(url, content=b"hello", extensions=extensions)
+        client.post(
+            url, content=b"hello", headers={"X-Status": "503"}, extensions=extensions
+        )
+
+    assert sample("notifiq_http_connect_seconds_count") - before["connect"] == 1
+    assert sample("notifiq_http_connect_seconds_sum") > 0
+    assert sample("notifiq_http_ttfb_seconds_count") - before["ttfb"] == 2
+    assert sample("notifiq_http_request_seconds_count") - before["total"] == 2
+    assert (
+        sample("notifiq_http_responses_total", status_class="2xx") - before["2xx"] == 1
+    )
+    assert (
+        sample("notifiq_http_responses_total", status_class="5xx") - before["5xx"] == 1
+    )
+    assert sample("notifiq_http_bytes_sent_total") - before["bytes"] == 10
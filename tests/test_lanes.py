@@ -0,0 +1,92 @@
+import json
+
+from pika import BasicProperties
+from pika.spec import Basic
+from prometheus_client import REGISTRY
+
+from src.config import Config
+from src.lanes import ENQUEUED_HEADER, LANE_HEADER, PriorityLanes
+from src.rules import RoutingRules, Rule
+
+
+def test_messages_are_classified_into_the_highest_lane_they_reach():
+    """
+    Lanes are ordered highest first; priorities below every lane share the lowest.
+    """
+    lanes = PriorityLanes(
+        "notifications", Config.parse_priority_lanes("normal:2, emergency:16,high:8")
+    )
+
+    def lane_of(message):
+        return lanes.classify(json.dumps(message).encode()).level
+
+    assert [lane.queue for lane in lanes.lanes] == [
+        "notifications.lane.emergency",
+        "notifications.lane.high",
+        "notifications.lane.normal",
+    ]
+    assert lane_of({"priority": "critical"}) == "emergency"
+    assert lane_of({"priority": 1}) == "high"
+    assert lane_of({"priority": "HIGH"}) == "high"
+    assert lane_of({"title": "no priority"}) == "normal"
+    assert lane_of({"priority": "low"}) == "normal"
+    assert lanes.classify(b"not json").level == "normal"
+
+
+def test_lane_headers_keep_existing_headers():
+    lanes = PriorityLanes("notifications", [("high", 8), ("normal", 2)])
+
+    headers = lanes.lane_headers(lanes.lanes[0], {"x-notifiq-attempts": 2})
+
+    assert headers["x-notifiq-attempts"] == 2
+    assert headers[LANE_HEADER] == "high"
+    assert isinstance(headers[ENQUEUED_HEADER], float)
+
+
+def test_rules_can_raise_a_message_to_a_higher_lane():
+    lanes = PriorityLanes("notifications", [("emergency", 16), ("normal", 2)])
+    rule = {
+        "match": {"source": "pager"},
+        "channels": ["pushover-direct"],
+        "extra": {"priority": "emergency"},
+    }
+    rules = RoutingRules([Rule.from_dict(rule, 0)])
+    body = json.dumps({"title": "t", "source": "pager"}).encode()
+
+    assert lanes.classify(body).level == "normal"
+    assert lanes.classify(body, rules).level == "emergency"
+
+
+class PublishingChannel:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.settled = []
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        if self.fail:
+            raise RuntimeError("publish failed")
+
+    def basic_ack(self, delivery_tag):
+        self.settled.append("ack")
+
+    def basic_nack(self, delivery_tag, requeue):
+        self.settled.append("nack")
+
+
+def test_only_published_messages_are_counted():
+    lanes = PriorityLanes("notifications", [("high", 8), ("normal", 2)])
+    body = json.dumps({"title": "t", "priority": "high"}).encode()
+
+    def moved():
+        return (
+            REGISTRY.get_sample_value("notifiq_lane_messages_total", {"lane": "high"})
+            or 0
+        )
+
+    before = moved()
+    for channel in (PublishingChannel(fail=True), PublishingChannel()):
+        lanes.on_ingress(
+            channel, Basic.Deliver(delivery_tag=1), BasicProperties(), body
+        )
+
+    assert moved() - before == 1
@@ -0,0 +1,27 @@
+import logging
+
+from src.logging_config import RateLimitFilter
+
+
+def test_rate_limit_filter_counts_suppressed_records():
+    """
+    Records beyond the burst are dropped; the next one let through reports how many.
+    """
+    log_filter = RateLimitFilter(rate=1, burst=2)
+    records = [
+        logging.LogRecord(
+            "notifiq.messages", logging.INFO, __file__, 1, "m", None, None
+        )
+        for _ in range(5)
+    ]
+
+    assert [log_filter.filter(record) for record in records] == [
+        True,
+        True,
+        False,
+        False,
+        False,
+    ]
+    log_filter.tokens = 1
+    assert log_filter.filter(records[0])
+    assert records[0].suppressed == 3
@@ -0,0 +1,199 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import main as notifiq
+from src.circuit_breaker import CircuitBreakers
+from src.config import Config
+from src.notification import Notification
+from src.notifiers.base import BaseNotifier, NotificationError
+from src.rate_limit import RateLimiter
+from src.routing import RoutingTable
+
+
+def test_run_consumer_retries_when_the_broker_cannot_be_resolved(monkeypatch):
+    """
+    A DNS failure is retried like any other connection error instead of
+    ending the process.
+    """
+    connection = object()
+    attempts = []
+    consumed = []
+
+    def blocking_connection(parameters):
+        attempts.append(parameters)
+        if len(attempts) == 1:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return connection
+
+    def consume(conn):
+        consumed.append(conn)
+        notifiq.shutdown_requested = True
+
+    monkeypatch.setattr(notifiq, "shutdown_requested", False)
+    monkeypatch.setattr(notifiq.signal, "signal", lambda *args: None)
+    monkeypatch.setattr(notifiq.pika, "BlockingConnection", blocking_connection)
+    monkeypatch.setattr(notifiq, "consume", consume)
+    monkeypatch.setattr(notifiq, "wait_unless_shutdown", lambda seconds: None)
+
+    notifiq.run_consumer()
+
+    assert len(attempts) == 2
+    assert consumed == [connection]
+
+
+class SleepyNotifier(BaseNotifier):
+    def __init__(self, delay):
+        self.delay = delay
+        self.sent = []
+
+    def send(self, notification, channels):
+        time.sleep(self.delay)
+        self.sent.append(channels)
+
+
+def use_notifiers(monkeypatch, dispatch_timeout, workers=4, **by_channel):
+    """
+    Route the direct channels to the given notifiers, with a fresh dispatch pool.
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    monkeypatch.setattr(notifiq.config, "dispatch_timeout", dispatch_timeout)
+    monkeypatch.setattr(notifiq, "dispatch_executor", executor)
+    monkeypatch.setattr(notifiq, "rate_limiter", RateLimiter({}))
+    monkeypatch.setattr(notifiq, "circuit_breakers", CircuitBreakers(False, 1, 1, 1, 1))
+    monkeypatch.setattr(notifiq, "routing_table", RoutingTable(by_channel, {}, {}))
+    return executor
+
+
+def test_channels_are_sent_in_parallel(monkeypatch):
+    use_notifiers(
+        monkeypatch,
+        5,
+        mattermost=SleepyNotifier(0.3),
+        **{"ntfy-direct": SleepyNotifier(0.3)},
+    )
+
+    started = time.monotonic()
+    result = notifiq.deliver_notification(
+        Notification("t", "m", ["mattermost", "ntfy-direct"])
+    )
+
+    assert result.delivered
+    assert time.monotonic() - started < 0.55
+
+
+def test_deadline_fails_only_the_slow_channel(monkeypatch):
+    """
+    A channel still sending at DISPATCH_TIMEOUT is failed; the others are delivered.
+    """
+    fast = SleepyNotifier(0)
+    executor = use_notifiers(
+        monkeypatch,
+        0.2,
+        mattermost=SleepyNotifier(1),
+        **{"ntfy-direct": fast},
+    )
+
+    started = time.monotonic()
+    result = notifiq.deliver_notification(
+        Notification("t", "m", ["mattermost", "ntfy-direct"])
+    )
+
+    assert time.monotonic() - started < 0.5
+    assert result.failed == ["mattermost"]
+    assert fast.sent == [["ntfy-direct"]]
+    executor.shutdown(wait=True)
+
+
+def test_http_timeouts_are_capped_at_the_dispatch_timeout(monkeypatch):
+    monkeypatch.setenv("DISPATCH_TIMEOUT", "2")
+    monkeypatch.setenv("HTTP_TIMEOUT", "10")
+    monkeypatch.delenv("HTTP_CONNECT_TIMEOUT", raising=False)
+
+    config = Config()
+
+    assert config.http_timeout == 2
+    assert config.http_connect_timeout == 2
+
+
+class GroupedNotifier(BaseNotifier):
+    """
+    Apprise-like notifier that fails for some channels.
+    """
+
+    def __init__(self, failing):
+        self.failing = failing
+        self.sent = []
+
+    def send(self, notification, channels):
+        if set(channels) & self.failing:
+            raise NotificationError(f"{channels} failed", status_code=503)
+        self.sent.append(channels)
+
+
+def test_apprise_channels_have_their_own_circuit(monkeypatch):
+    """
+    An open circuit on one Apprise channel does not block or trip the others.
+    """
+    apprise = GroupedNotifier({"gotify"})
+    use_notifiers(monkeypatch, 5, apprise=apprise)
+    monkeypatch.setattr(
+        notifiq,
+        "routing_table",
+        RoutingTable(
+            {"apprise": apprise}, {}, {"ntfy": "ntfy://a", "gotify": "gotify://b"}
+        ),
+    )
+    breakers = CircuitBreakers(True, 0.5, 1, 60, 60)
+    monkeypatch.setattr(notifiq, "circuit_breakers", breakers)
+    notification = Notification("t", "m", ["ntfy", "gotify"])
+
+    first = notifiq.deliver_notification(notification)
+    second = notifiq.deliver_notification(notification)
+
+    assert first.failed == second.failed == ["gotify"]
+    assert apprise.sent == [["ntfy"], ["ntfy"]]
+    assert breakers.states() == {"ntfy": "closed", "gotify": "open"}
+
+
+class BlockedNotifier(BaseNotifier):
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def send(self, notification, channels):
+        self.started.set()
+        self.release.wait(5)
+
+
+def test_blocked_shard_does_not_delay_other_channels(monkeypatch):
+    """
+    A sharded channel whose sends hang only uses up its own dispatch pool.
+    """
+    blocked = BlockedNotifier()
+    executor = use_notifiers(
+        monkeypatch,
+        5,
+        workers=1,
+        mattermost=blocked,
+        **{"ntfy-direct": SleepyNotifier(0)},
+    )
+    shard_executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(notifiq, "shard_executors", {"mattermost": shard_executor})
+    stuck = threading.Thread(
+        target=notifiq.deliver_notification,
+        args=(Notification("t", "m", ["mattermost"]),),
+    )
+    stuck.start()
+    assert blocked.started.wait(1)
+
+    started = time.monotonic()
+    result = notifiq.deliver_notification(Notification("t", "m", ["ntfy-direct"]))
+
+    assert result.delivered
+    assert time.monotonic() - started < 1
+    blocked.release.set()
+    stuck.join()
+    shard_executor.shutdown()
+    executor.shutdown()
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from src.notification import InvalidMessage, decode_notification
+
+
+def test_decode_splits_fields_and_normalizes_priority():
+    """
+    Known fields are typed, everything else is kept as extra fields.
+    """
+    notification = decode_notification(
+        b'{"title": "Disk full", "message": "/var at 99%", "channels": "ntfy, mattermost",'
+        b' "priority": 5, "ntfy_topic": "ops", "dedup_key": 42}'
+    )
+
+    assert notification.title == "Disk full"
+    assert notification.channels == ["ntfy", "mattermost"]
+    assert notification.extra == {"priority": "5", "ntfy_topic": "ops"}
+    assert notification.dedup_key == "42"
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"not json",
+        b'["a list"]',
+        b'{"title": ["not", "a", "string"]}',
+        b'{"channels": [1, 2]}',
+        b'{"ntfy_topic": {"nested": true}}',
+        b'{"priority": true}',
+        b'{"dedup_key": false}',
+        b'{"dedup_key": 1.5}',
+    ],
+)
+def test_decode_rejects_invalid_messages(body):
+    """
+    Malformed bodies raise InvalidMessage instead of failing inside a notifier.
+    """
+    with pytest.raises(InvalidMessage):
+        decode_notification(body)
+
+
+@pytest.mark.parametrize(
+    "created_at",
+    ["2024-05-01T12:00:00Z", "2024-05-01T14:00:00+02:00", 1714564800, 1714564800000],
+)
+def test_created_at_takes_precedence_over_the_amqp_timestamp(created_at):
+    notification = decode_notification(
+        json.dumps({"title": "t", "created_at": created_at}).encode(), timestamp=1
+    )
+
+    assert notification.enqueued_at == 1714564800.0
+    assert "created_at" not in notification.extra
+    assert notification.to_dict()["created_at"] == 1714564800.0
+
+
+def test_amqp_timestamp_is_used_without_created_at():
+    assert decode_notification(b'{"title": "t"}', timestamp=1714564800).enqueued_at == (
+        1714564800.0
+    )
+    assert decode_notification(b'{"created_at": "yesterday"}').enqueued_at is None
@@ -0,0 +1,113 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import rate_limit
+from src.rate_limit import (
+    RateLimiter,
+    RateLimitExceeded,
+    TokenBucket,
+    rate_limit_keys,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Manual monotonic clock for the token buckets.
+    """
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_reservations_beyond_the_burst_are_spaced_at_the_rate(clock):
+    bucket = TokenBucket("test", rate=2, capacity=2)
+
+    assert [bucket.try_reserve() for _ in range(4)] == [0, 0, 0.5, 1.0]
+    # Too far out: nothing is reserved
+    assert bucket.try_reserve(max_wait=1.0) is None
+    assert bucket.tokens == -2
+
+
+def test_tokens_refill_up_to_the_capacity(clock):
+    bucket = TokenBucket("test", rate=2, capacity=2)
+    bucket.try_reserve()
+    bucket.try_reserve()
+    bucket.try_reserve()
+
+    clock[0] += 1.0
+    assert bucket.try_reserve() == 0
+    clock[0] += 60
+    bucket.refund()
+    assert bucket.try_reserve() == 0
+    assert bucket.tokens == 1
+
+
+def test_instances_without_a_limit_share_the_provider_bucket(clock):
+    """
+    The provider limit is a ceiling for all of its instances; only instances
+    with a limit of their own get another bucket.
+    """
+    limiter = RateLimiter({"ntfy": (1, 1), "pushover_infra": (1, 2)})
+
+    assert [limiter.reserve([("ntfy", topic)], 0) for topic in "abc"] == [
+        0,
+        None,
+        None,
+    ]
+    assert limiter.bucket("pushover", "infra").name == "pushover:infra"
+    assert limiter.bucket("pushover", "default") is None
+    assert limiter.bucket("mattermost") is None
+
+
+def test_only_configured_limits_are_kept():
+    limiter = RateLimiter({"ntfy": (1, 1)})
+
+    for topic in range(100):
+        limiter.bucket("ntfy", f"topic-{topic}")
+        limiter.bucket("gotify", f"app-{topic}")
+
+    assert list(limiter._buckets) == ["ntfy"]
+
+
+def test_pushover_sends_use_the_resolved_app():
+    """
+    The bucket follows the app the send goes through, not the message field.
+    """
+    limiter = RateLimiter({"pushover_infra": (1, 1)})
+    keys = rate_limit_keys(["pushover-direct"], {}, pushover_app="infra")
+
+    assert keys == [("pushover", "infra")]
+    assert limiter.reserve(keys, 0) == 0
+    assert limiter.reserve(keys, 0) is None
+
+
+def test_throttled_sends_do_not_hold_pool_workers():
+    """
+    While one send waits for its token, the only pool worker serves other providers.
+    """
+    limiter = RateLimiter({"pushover": (5, 1)})
+    executor = ThreadPoolExecutor(max_workers=1)
+    pushover = [("pushover", "default")]
+    finished = {}
+
+    def send(name):
+        finished[name] = time.monotonic()
+        return name
+
+    try:
+        assert limiter.submit(executor, pushover, 5, send, "first").result() == "first"
+        throttled = limiter.submit(executor, pushover, 5, send, "throttled")
+        other = limiter.submit(executor, [("ntfy", "ops")], 5, send, "other")
+
+        assert other.result(timeout=1) == "other"
+        assert not throttled.done()
+        assert throttled.result(timeout=1) == "throttled"
+        assert finished["throttled"] - finished["first"] >= 0.15
+        with pytest.raises(RateLimitExceeded):
+            limiter.submit(executor, pushover, 0.01, send, "late").result()
+    finally:
+        limiter.close()
+        executor.shutdown()
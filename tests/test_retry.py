@@ -0,0 +1,140 @@
+import json
+
+from prometheus_client import REGISTRY
+
+from src.config import Config
+from src.delivery import DeliveryResult
+from src.lag import observe_pickup
+from src.metrics import CONSUMER_LAG
+from src.notification import Notification
+from src.retry import (
+    ATTEMPTS_HEADER,
+    ENQUEUED_AT_HEADER,
+    ERROR_HEADER,
+    RetryPlanner,
+    enqueued_at,
+    retry_attempts,
+)
+from src.rules import RulesLoader
+
+BODY = json.dumps(
+    {"title": "t", "message": "m", "channels": ["ntfy-direct", "mattermost"]}
+).encode()
+
+
+def make_planner(monkeypatch, **env):
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    return RetryPlanner(Config())
+
+
+def test_failed_channels_are_retried_through_a_delay_queue(monkeypatch):
+    """
+    Only the failed channel is retried, no sooner than the provider's Retry-After.
+    """
+    planner = make_planner(monkeypatch, RETRY_MAX_ATTEMPTS="3", RETRY_MAX_DELAY="60")
+    result = DeliveryResult(
+        ["ntfy-direct", "mattermost"], failed=["ntfy-direct"], retry_after=20
+    )
+
+    (retry,) = planner.plan("notifications", BODY, None, result)
+
+    assert retry.kind == "retry"
+    assert retry.queue == "notifications.retry.32s"
+    assert retry.arguments["x-dead-letter-routing-key"] == "notifications"
+    assert 20 <= retry.expiration <= 32
+    assert retry.headers[ATTEMPTS_HEADER] == 1
+    assert json.loads(retry.body)["channels"] == ["ntfy-direct"]
+
+
+def test_exhausted_channels_are_dead_lettered(monkeypatch):
+    """
+    Channels out of attempts go to the dead-letter queue; the rest keep retrying.
+    """
+    planner = make_planner(
+        monkeypatch,
+        RETRY_MAX_ATTEMPTS="3",
+        RETRY_MATTERMOST_MAX_ATTEMPTS="5",
+        RABBITMQ_DEAD_LETTER_QUEUE="notifications.dead",
+    )
+    result = DeliveryResult(
+        ["ntfy-direct", "mattermost"], failed=["ntfy-direct", "mattermost"]
+    )
+
+    retry, dead = planner.plan("notifications", BODY, {ATTEMPTS_HEADER: 2}, result)
+
+    assert retry.kind == "retry"
+    assert retry.channels == ["mattermost"]
+    assert dead.queue == "notifications.dead"
+    assert dead.channels == ["ntfy-direct"]
+    assert dead.headers[ATTEMPTS_HEADER] == 3
+    assert "3 attempt" in dead.headers[ERROR_HEADER]
+
+
+def test_invalid_messages_are_dropped_without_a_dead_letter_queue(monkeypatch):
+    """
+    With no dead-letter queue configured, undecodable messages are not republished.
+    """
+    monkeypatch.delenv("RABBITMQ_DEAD_LETTER_QUEUE", raising=False)
+    planner = make_planner(monkeypatch, RETRY_MAX_ATTEMPTS="3")
+
+    assert (
+        planner.plan("q", b"{", None, DeliveryResult(["unknown"], invalid=True)) == []
+    )
+
+
+def test_retries_keep_the_first_publish_time(monkeypatch):
+    """
+    Lag is measured from the first publish, and retries do not count as queue wait.
+    """
+    planner = make_planner(monkeypatch, RETRY_MAX_ATTEMPTS="3")
+    failed = DeliveryResult(["ntfy-direct"], failed=["ntfy-direct"])
+
+    (first,) = planner.plan("notifications", BODY, None, failed, timestamp=1000)
+    (second,) = planner.plan("notifications", BODY, first.headers, failed, 2000)
+
+    assert second.headers[ENQUEUED_AT_HEADER] == 1000.0
+    assert enqueued_at(second.headers, 2000) == 1000.0
+    assert enqueued_at(None, 2000) == 2000
+    assert retry_attempts(second.headers) == 2
+
+    CONSUMER_LAG.set(0)
+    observe_pickup(
+        Notification("t", "m", ["ntfy-direct"], enqueued_at=1000), 1500, True
+    )
+    assert REGISTRY.get_sample_value("notifiq_consumer_lag_seconds") == 0
+
+
+def test_retries_keep_the_routing_fields_of_rules(monkeypatch, tmp_path):
+    """
+    A rule-routed message is retried with the topic and priority its rule set.
+    """
+    rules_file = tmp_path / "rules.json"
+    rules_file.write_text(
+        json.dumps(
+            {
+                "rules": [
+                    {
+                        "match": {"source": "backup"},
+                        "channels": ["ntfy-direct"],
+                        "extra": {"ntfy_topic": "backups", "priority": "high"},
+                    }
+                ]
+            }
+        )
+    )
+    monkeypatch.setenv("RETRY_MAX_ATTEMPTS", "3")
+    planner = RetryPlanner(Config(), RulesLoader(str(rules_file), []))
+    body = json.dumps({"title": "t", "message": "m", "source": "backup"}).encode()
+    failed = DeliveryResult(["ntfy-direct"], failed=["ntfy-direct"])
+
+    (retry,) = planner.plan("notifications", body, None, failed)
+
+    assert json.loads(retry.body) == {
+        "source": "backup",
+        "ntfy_topic": "backups",
+        "priority": "high",
+        "title": "t",
+        "message": "m",
+        "channels": ["ntfy-direct"],
+    }
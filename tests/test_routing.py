@@ -0,0 +1,71 @@
+from src.routing import RoutingTable
+
+APPRISE_URLS = {
+    "ntfy": "ntfys://ntfy.example.com/alerts",
+    "gotify": "gotify://g/t",
+    "loki": None,
+}
+
+
+def make_table(pushover_apps=("default", "infra")):
+    notifiers = {
+        "apprise": "apprise",
+        "mattermost": "mattermost",
+        "ntfy-direct": "ntfy",
+    }
+    pushover = {app: f"pushover:{app}" for app in pushover_apps}
+    return RoutingTable(notifiers, pushover, APPRISE_URLS)
+
+
+def test_channels_resolve_to_direct_and_apprise_targets():
+    """
+    Direct channels map to their notifier; each Apprise channel is a target of its own.
+    """
+    targets, unroutable = make_table().resolve(
+        ["mattermost", "ntfy", "ntfy-direct", "gotify"], {}
+    )
+
+    assert targets == [
+        ("mattermost", ["mattermost"]),
+        ("apprise", ["ntfy"]),
+        ("ntfy", ["ntfy-direct"]),
+        ("apprise", ["gotify"]),
+    ]
+    assert unroutable == []
+
+
+def test_unknown_and_unconfigured_channels_are_unroutable():
+    targets, unroutable = make_table(pushover_apps=()).resolve(
+        ["loki", "slack", "pushover-direct", "ntfy"], {}
+    )
+
+    assert targets == [("apprise", ["ntfy"])]
+    assert unroutable == ["loki", "slack", "pushover-direct"]
+
+
+def test_pushover_app_is_chosen_per_message():
+    table = make_table()
+
+    def pushover(kwargs):
+        return table.resolve(["pushover-direct"], kwargs)[0]
+
+    assert pushover({"pushover_app": "infra"}) == [
+        ("pushover:infra", ["pushover-direct"])
+    ]
+    # Unknown or missing apps fall back to "default"
+    assert pushover({"pushover_app": "nope"}) == [
+        ("pushover:default", ["pushover-direct"])
+    ]
+    assert pushover({}) == [("pushover:default", ["pushover-direct"])]
+    assert table.pushover_app({"pushover_app": "nope"}) == "default"
+
+
+def test_a_single_pushover_app_is_the_default():
+    """
+    With one app configured, messages without a known pushover_app use it.
+    """
+    table = make_table(pushover_apps=("infra",))
+
+    assert table.pushover_app({}) == "infra"
+    assert table.pushover_app({"pushover_app": "infar"}) == "infra"
+    assert make_table(pushover_apps=()).pushover_app({}) is None
@@ -0,0 +1,86 @@
+import json
+import os
+
+from src.notification import Notification
+from src.rules import RulesLoader
+
+RULES = {
+    "rules": [
+        {
+            "name": "db-critical",
+            "match": {"severity": ["critical", "high"], "tags": "db"},
+            "channels": ["pushover-direct"],
+            "extra": {"pushover_app": "infra"},
+            "stop": True,
+        },
+        {
+            "name": "disk",
+            "match": {"title_regex": "(?i)disk .* full"},
+            "channels": "ntfy-direct",
+            "extra": {"ntfy_topic": "disks"},
+        },
+        {"name": "grafana", "match": {"source": "grafana"}, "channels": ["mattermost"]},
+    ]
+}
+
+
+def write_rules(path, rules):
+    path.write_text(json.dumps(rules))
+    return str(path)
+
+
+def test_rules_select_channels_and_extras(tmp_path):
+    """
+    Matching rules add their channels; message fields override rule extras.
+    """
+    rules = RulesLoader(write_rules(tmp_path / "rules.json", RULES), []).current
+
+    notification = Notification.from_dict(
+        {"title": "Disk /var full", "source": "grafana", "ntfy_topic": "mine"}, rules
+    )
+
+    assert notification.channels == ["ntfy-direct", "mattermost"]
+    assert notification.extra["ntfy_topic"] == "mine"
+
+
+def test_stop_rule_and_list_fields(tmp_path):
+    """
+    Exact values match case-insensitively, tags match any element, and stop ends evaluation.
+    """
+    rules = RulesLoader(write_rules(tmp_path / "rules.json", RULES), []).current
+
+    notification = Notification.from_dict(
+        {"title": "Disk full", "severity": "HIGH", "tags": ["db", "prod"]}, rules
+    )
+
+    assert notification.channels == ["pushover-direct"]
+    assert notification.extra["pushover_app"] == "infra"
+
+
+def test_explicit_channels_and_default(tmp_path):
+    """
+    Messages that list channels ignore the rules; unmatched messages go to ntfy.
+    """
+    rules = RulesLoader(write_rules(tmp_path / "rules.json", RULES), []).current
+
+    explicit = {"source": "grafana", "channels": ["gotify"]}
+    assert Notification.from_dict(explicit, rules).channels == ["gotify"]
+    assert Notification.from_dict({"title": "hello"}, rules).channels == ["ntfy"]
+
+
+def test_reload_keeps_previous_rules_on_error(tmp_path):
+    """
+    A changed file is picked up; a broken one is logged and ignored.
+    """
+    path = write_rules(tmp_path / "rules.json", RULES)
+    loader = RulesLoader(path, [("priority", "low", ["gotify"])])
+    assert len(loader.current) == 4
+
+    write_rules(tmp_path / "rules.json", {"rules": RULES["rules"][:1]})
+    assert loader.reload()
+    assert len(loader.current) == 2
+
+    (tmp_path / "rules.json").write_text("{not json")
+    os.utime(path, (0, 0))
+    assert not loader.reload()
+    assert len(loader.current) == 2
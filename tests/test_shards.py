@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from src.config import Config
+from src.rules import RoutingRules
+from src.shards import ChannelShards
+
+
+def make_shards(value="mattermost:2,ntfy-direct:4:16"):
+    return ChannelShards(
+        "notifications",
+        Config.parse_channel_shards(value),
+        default_workers=4,
+        default_prefetch=8,
+    )
+
+
+def test_messages_are_split_by_channel_shard():
+    """
+    Sharded channels get a part each; the rest share the default shard.
+    """
+    shards = make_shards()
+    body = json.dumps(
+        {
+            "title": "Disk full",
+            "message": "/var is at 99%",
+            "channels": ["mattermost", "ntfy-direct", "gotify", "pushover-direct"],
+            "priority": "high",
+            "dedup_key": "disk-1",
+        }
+    ).encode()
+
+    parts = {shard.queue: json.loads(part) for shard, part in shards.split(body)}
+
+    assert shards.by_channel["ntfy-direct"].prefetch == 16
+    assert shards.by_channel["mattermost"].prefetch == 4
+    assert {queue: part["channels"] for queue, part in parts.items()} == {
+        "notifications.channel.mattermost": ["mattermost"],
+        "notifications.channel.ntfy-direct": ["ntfy-direct"],
+        "notifications.channel.default": ["gotify", "pushover-direct"],
+    }
+    assert parts["notifications.channel.default"]["priority"] == "high"
+    # Otherwise deduplication would drop every part but the first
+    assert parts["notifications.channel.mattermost"]["dedup_key"] == "disk-1#mattermost"
+
+
+def test_routing_rules_are_resolved_before_splitting():
+    shards = make_shards()
+    rules = RoutingRules.from_pairs([("source", "db", ["mattermost"])])
+    body = json.dumps({"title": "t", "message": "m", "source": "db"}).encode()
+
+    ((shard, part),) = shards.split(body, rules)
+
+    assert shard.name == "mattermost"
+    assert json.loads(part)["channels"] == ["mattermost"]
+    assert shards.split(b"not json")[0] == (shards.default, b"not json")
+
+
+def test_a_shard_cannot_share_the_default_queue():
+    with pytest.raises(ValueError, match="reserved"):
+        Config.parse_channel_shards("mattermost:2,default:4")
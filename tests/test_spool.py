@@ -0,0 +1,74 @@
+from src.delivery import DeliveryResult
+from src.notification import Notification
+from src.retry import RetryPolicy
+from src.spool import Spool
+
+
+def make_spool(tmp_path, **kwargs):
+    options = {
+        "max_bytes": 1 << 20,
+        "replay_rate": 0,
+        "max_age": 3600,
+        "lease": 30,
+        "backoff": RetryPolicy(0, 0, 0),
+    }
+    options.update(kwargs)
+    return Spool(str(tmp_path / "spool.db"), **options)
+
+
+def test_failed_channels_are_spooled_and_replayed(tmp_path):
+    """
+    Only the failed channel is kept; it is cleared once a replay delivers it.
+    """
+    spool = make_spool(tmp_path)
+    notification = Notification(
+        "Disk full", "/var is at 99%", ["ntfy", "mattermost"], {"priority": "high"}
+    )
+
+    entry_id = spool.add(notification)
+    result = spool.settle(
+        entry_id,
+        notification,
+        DeliveryResult(["ntfy", "mattermost"], failed=["mattermost"]),
+    )
+
+    assert result.delivered
+    assert spool.depth() == 1
+
+    replayed = []
+
+    def deliver(spooled):
+        replayed.append(spooled)
+        return DeliveryResult(spooled.channels)
+
+    assert spool.replay_due(deliver) == 1
+    assert replayed[0].channels == ["mattermost"]
+    assert replayed[0].extra == {"priority": "high"}
+    assert spool.depth() == 0
+
+
+def test_entries_being_sent_are_not_replayed(tmp_path):
+    """
+    An entry is leased until its first send settles; after a crash it becomes due.
+    """
+    notification = Notification("t", "m", ["ntfy"])
+    spool = make_spool(tmp_path)
+    spool.add(notification)
+
+    assert spool.replay_due(lambda n: DeliveryResult(n.channels)) == 0
+
+    expired = make_spool(tmp_path, lease=-1)
+    expired.add(notification)
+    assert expired.replay_due(lambda n: DeliveryResult(n.channels)) == 1
+    assert expired.depth() == 1
+
+
+def test_full_spool_falls_back_to_the_delivery_result(tmp_path):
+    spool = make_spool(tmp_path, max_bytes=0)
+    notification = Notification("t", "m" * 100_000, ["ntfy"])
+    failed = DeliveryResult(["ntfy"], failed=["ntfy"])
+
+    entry_id = spool.add(notification)
+
+    assert entry_id is None
+    assert spool.settle(entry_id, notification, failed) is failed
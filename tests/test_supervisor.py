@@ -0,0 +1,131 @@
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from src import supervisor
+from src.supervisor import Supervisor
+
+# Workers are spawned, so their targets must be importable module-level functions
+# and get their state from the environment
+
+
+def record_start() -> Path:
+    log = Path(os.environ["SUPERVISOR_TEST_LOG"])
+    with log.open("a") as f:
+        f.write(f"{os.getpid()}\n")
+    return log
+
+
+def crashing_worker() -> None:
+    record_start()
+    sys.exit(3)
+
+
+def graceful_worker() -> None:
+    """
+    Stop on SIGTERM through notifiq's own handler, like run_consumer does.
+    """
+    from src import main as notifiq  # pylint: disable=import-outside-toplevel
+
+    signal.signal(signal.SIGTERM, notifiq.handle_shutdown)
+    log = record_start()
+    while not notifiq.shutdown_requested:
+        time.sleep(0.01)
+    (log.parent / f"stopped-{os.getpid()}").touch()
+
+
+@pytest.fixture
+def worker_log(tmp_path, monkeypatch):
+    log = tmp_path / "starts.log"
+    log.touch()
+    monkeypatch.setenv("SUPERVISOR_TEST_LOG", str(log))
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    dead = []
+    monkeypatch.setattr(supervisor.multiprocess, "mark_process_dead", dead.append)
+    return log, dead
+
+
+def starts(log):
+    return [int(pid) for pid in log.read_text().split()]
+
+
+def until(condition, timeout=30):
+    """
+    should_stop for a supervisor: stop once condition() holds, or at the timeout.
+    """
+    deadline = time.monotonic() + timeout
+    return lambda: condition() or time.monotonic() > deadline
+
+
+def test_crashed_workers_are_restarted(worker_log):
+    log, dead = worker_log
+
+    Supervisor(
+        workers=1,
+        target=crashing_worker,
+        should_stop=until(lambda: len(starts(log)) >= 3),
+        restart_delay=0.01,
+        max_restart_delay=0.05,
+    ).run()
+
+    pids = starts(log)
+    assert len(pids) >= 3
+    assert len(set(pids)) == len(pids)
+    # Every crashed worker's metric files are cleaned up
+    assert set(pids[:2]) <= set(dead)
+
+
+def test_workers_stop_gracefully_on_sigterm(worker_log):
+    """
+    Shutdown forwards SIGTERM, and workers stop through handle_shutdown
+    instead of being killed.
+    """
+    log, dead = worker_log
+    workers = Supervisor(
+        workers=2,
+        target=graceful_worker,
+        should_stop=until(lambda: len(starts(log)) == 2),
+        shutdown_timeout=20,
+    )
+
+    workers.run()
+
+    pids = starts(log)
+    assert len(pids) == 2
+    assert all((log.parent / f"stopped-{pid}").exists() for pid in pids)
+    assert [p.exitcode for p in workers._processes] == [0, 0]
+    assert sorted(dead) == sorted(p.pid for p in workers._processes)
+
+
+class ExitedProcess:
+    pid = 1234
+    exitcode = 1
+
+    def join(self, timeout=None):
+        pass
+
+
+def test_crash_loops_back_off_exponentially(monkeypatch):
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    workers = Supervisor(
+        workers=1,
+        target=crashing_worker,
+        should_stop=lambda: True,
+        restart_delay=1,
+        max_restart_delay=8,
+    )
+
+    delays = []
+    for _ in range(5):
+        workers._started_at[0] = 100.0
+        workers._reap(0, ExitedProcess(), now=101.0)
+        delays.append(workers._restart_at[0] - 101.0)
+
+    assert delays == [1, 2, 4, 8, 8]
+    # A worker that ran for a while before exiting starts over
+    workers._reap(0, ExitedProcess(), now=200.0)
+    assert workers._restart_at[0] - 200.0 == 1